@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+## Dependancies
+#Packages
+import numpy as np
+#Internal
+import lib.spatial
+
+
+###############################################################################
+## Columnar statistics
+###############################################################################
+def normalizeActivityType(activityType):
+    return (activityType or '').lower().replace('_',' ')
+
+
+class ActivityTable():
+    ''' One row of summary metadata per activity, stored as NumPy columns, from
+        which every statistics table is computed with vectorized group-bys.
+        Only activity metadata is read; columns of unloaded activities are not
+        touched. '''
+    columns = ('distance', 'duration', 'movingTime', 'calories')
+
+    def __init__(self, activities, index=None):
+        self.activities = activities
+        self.index      = index if index is not None else lib.spatial.ActivityIndex(activities)
+        self.types      = np.array([normalizeActivityType(activity.getActivityType()) for activity in activities], dtype=object)
+        self.years      = np.array([activity.getStartTime().year for activity in activities], dtype=np.int64)
+        self.months     = np.array([activity.getStartTime().month for activity in activities], dtype=np.int64)
+        self.distance   = np.array([activity.getDistance() for activity in activities], dtype=float)
+        self.duration   = np.array([activity.getDuration().total_seconds() for activity in activities], dtype=float)
+        self.movingTime = np.array([activity.getMovingTime().total_seconds() for activity in activities], dtype=float)
+        self.calories   = np.array([activity.getCalories() for activity in activities], dtype=float)
+        self.positioned = np.array([len(activity) > 0 for activity in activities], dtype=bool)
+
+    def __len__(self):          return len(self.activities)
+
+    def regionMask(self, region):
+        ''' Activities starting inside region (see Region.bindActivities). '''
+        mask = np.zeros(len(self), dtype=bool)
+        mask[self.index.startsWithin(region.latLim, region.longLim)] = True
+        return mask
+
+    def typeMask(self, activityType):
+        return (self.types == normalizeActivityType(activityType)) & self.positioned
+
+    def monthlyCounts(self):
+        ''' Return (years, counts) where counts[i, month-1] is the number of
+            activities in month of years[i]. '''
+        years, rows = np.unique(self.years, return_inverse=True)
+        counts = np.bincount(rows*12+self.months-1, minlength=len(years)*12).reshape(len(years), 12)
+        return years, counts
+
+    def statistics(self, mask=None, percentiles=(50, 90)):
+        ''' Statistics of the activities selected by mask (all by default). '''
+        groups = np.zeros(len(self), dtype=np.int64)
+        if(mask is not None): groups[~np.asarray(mask, dtype=bool)] = -1
+        return self.groupStatistics(groups, 1, percentiles)[0]
+
+    def groupBy(self, keys, mask=None, percentiles=(50, 90)):
+        ''' Statistics of the activities grouped by keys (a column such as
+            self.types or self.years). Returns {key: statistics}. '''
+        values, groups = np.unique(keys, return_inverse=True)
+        if(mask is not None): groups = np.where(mask, groups, -1)
+        results = self.groupStatistics(groups, len(values), percentiles)
+        return {value: results[ix] for ix, value in enumerate(values)}
+
+    def groupStatistics(self, groups, count, percentiles=(50, 90)):
+        ''' Count, sums, means and percentiles of every column for each of the
+            count groups in one pass; rows with group -1 are ignored. '''
+        selected = groups >= 0
+        groups   = groups[selected]
+        number   = np.bincount(groups, minlength=count)
+        results  = [{'count': int(number[ix])} for ix in range(count)]
+        for name in self.columns:
+            values = getattr(self, name)[selected]
+            sums   = np.bincount(groups, weights=values, minlength=count)
+            means  = np.full(count, np.nan)
+            np.divide(sums, number, out=means, where=number > 0)
+            ## Sort by group then value: each group is a contiguous sorted run
+            ranked = values[np.lexsort((values, groups))]
+            starts = np.cumsum(number)-number
+            quantiles = {}
+            for percentile in percentiles:
+                if(len(ranked) == 0):
+                    quantiles[percentile] = np.full(count, np.nan)
+                    continue
+                rank  = starts+percentile/100.0*np.maximum(number-1, 0)
+                low   = np.minimum(np.floor(rank).astype(np.int64), len(ranked)-1)
+                high  = np.minimum(np.ceil(rank).astype(np.int64), len(ranked)-1)
+                quantiles[percentile] = ranked[low]+(ranked[high]-ranked[low])*(rank-np.floor(rank))
+            for ix in range(count):
+                results[ix][name]        = float(sums[ix])
+                results[ix][name+'Mean'] = float(means[ix]) if number[ix] else None
+                for percentile in percentiles:
+                    results[ix][name+'P'+str(percentile)] = float(quantiles[percentile][ix]) if number[ix] else None
+        for result in results:
+            result['speed']       = result['distance']/result['duration'] if result['duration'] > 0 else None
+            result['movingSpeed'] = result['distance']/result['movingTime'] if result['movingTime'] > 0 else None
+        return results
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+
+## Dependancies
+#Packages
+import numpy as np
+
+
+###############################################################################
+## Sensor analytics
+###############################################################################
+## Samples further apart than this (s) are treated as a pause: the earlier
+## sample only counts for maxGap seconds
+maxGap = 10.0
+
+## Default athlete settings; zones are fractions of maxHeartRate and ftp
+athlete = {'maxHeartRate':  190.0,
+           'restHeartRate': 60.0,
+           'ftp':           250.0,
+           'heartRateZones': (0.5, 0.6, 0.7, 0.8, 0.9),
+           'powerZones':     (0.55, 0.75, 0.9, 1.05, 1.2, 1.5),
+           'trimpFactors':   (0.64, 1.92)}
+
+## Width of the heart rate (bpm) and power (W) bins of the sensor summary
+binWidths = {'heartRate': 5.0, 'power': 10.0}
+
+
+def sampleDurations(time, gap=None):
+    ''' Seconds each sample lasts: the time to the next sample, capped at gap
+        (maxGap by default); the last sample lasts 0 s. '''
+    time = np.asarray(time, dtype=float)
+    if(len(time) == 0): return np.zeros(0)
+    durations = np.zeros(len(time))
+    durations[:-1] = np.clip(np.diff(time), 0.0, maxGap if gap is None else gap)
+    return np.nan_to_num(durations)
+
+def cumulativeIntegral(values, time, gap=None):
+    ''' Running integral of values over time, each sample held until the next
+        one (see sampleDurations); missing values count as 0. The result has
+        one more entry than values, starting at 0. '''
+    return np.concatenate([[0.0], np.cumsum(np.nan_to_num(np.asarray(values, dtype=float))*sampleDurations(time, gap))])
+
+def rollingMean(values, time, window=30.0):
+    ''' Mean of values over the window (s) ending at each sample, from the
+        difference of the cumulative integral at both ends of the window. '''
+    time = np.asarray(time, dtype=float)
+    if(len(time) == 0): return np.zeros(0)
+    ## Time axis without pauses, so that windows span recorded time only
+    active    = np.concatenate([[0.0], np.cumsum(sampleDurations(time))])
+    integral  = cumulativeIntegral(values, time)
+    ends      = active[1:]
+    starts    = np.maximum(ends-window, 0.0)
+    spans     = ends-starts
+    means     = np.zeros(len(time))
+    np.divide(integral[1:]-np.interp(starts, active, integral), spans, out=means, where=spans > 0)
+    return means
+
+def timeInZones(values, time, bounds):
+    ''' Seconds spent in each zone delimited by bounds (ascending): zone 0 is
+        below bounds[0], the last zone at or above bounds[-1]. Samples without
+        a value are ignored. '''
+    values    = np.asarray(values, dtype=float)
+    valid     = np.isfinite(values)
+    return secondsInZones(values[valid], sampleDurations(time)[valid], bounds)
+
+def secondsInZones(values, seconds, bounds):
+    ''' Sum of seconds of values falling in each zone (see timeInZones). '''
+    return np.bincount(np.digitize(values, bounds), weights=seconds, minlength=len(bounds)+1)
+
+def timeInBins(values, time, width):
+    ''' Seconds spent in each bin of values width wide, from the first to the
+        last bin reached: 'first' bin index (bin k spans [k, k+1) x width),
+        'width' and 'seconds' (to 0.1 s). Samples without a value are
+        ignored. '''
+    values = np.asarray(values, dtype=float)
+    valid  = np.isfinite(values)
+    if(not valid.any()): return {'first': 0, 'width': width, 'seconds': []}
+    bins   = np.floor(values[valid]/width).astype(np.int64)
+    first  = int(bins.min())
+    return {'first': first, 'width': width, 'seconds': np.round(np.bincount(bins-first, weights=sampleDurations(time)[valid]), 1).tolist()}
+
+def binCentres(bins):
+    ''' Value at the centre of each bin of timeInBins(). '''
+    return (bins['first']+np.arange(len(bins['seconds']))+0.5)*bins['width']
+
+def normalizedPower(power, time, window=30.0):
+    ''' Normalized power: fourth root of the time weighted mean of the fourth
+        power of the rolling mean power. '''
+    durations = sampleDurations(time)
+    if(durations.sum() <= 0): return None
+    rolling = rollingMean(power, time, window)
+    return float((np.sum(rolling**4*durations)/durations.sum())**0.25)
+
+def trainingStress(power, time, ftp, window=30.0):
+    ''' Training stress score of a ride: hours x intensity factor squared x
+        100, the intensity factor being normalized power over ftp. '''
+    norm = normalizedPower(power, time, window)
+    if(norm is None or not ftp): return None
+    return float(sampleDurations(time).sum()/3600.0*(norm/ftp)**2*100.0)
+
+def trimp(heartRate, time, restHeartRate, maxHeartRate, factors=(0.64, 1.92)):
+    ''' Banister training impulse: minutes weighted by the heart rate reserve
+        fraction x a*exp(b x fraction), with (a, b) = factors. '''
+    heartRate = np.asarray(heartRate, dtype=float)
+    valid     = np.isfinite(heartRate)
+    return trainingImpulse(heartRate[valid], sampleDurations(time)[valid], restHeartRate, maxHeartRate, factors)
+
+def trainingImpulse(heartRate, seconds, restHeartRate, maxHeartRate, factors=(0.64, 1.92)):
+    ''' TRIMP of seconds spent at each heart rate (see trimp). '''
+    reserve = np.clip((np.asarray(heartRate, dtype=float)-restHeartRate)/float(maxHeartRate-restHeartRate), 0.0, 1.0)
+    return float(np.sum(np.asarray(seconds, dtype=float)/60.0*reserve*factors[0]*np.exp(factors[1]*reserve)))
+
+
+def summarizeSensors(time, heartRate=None, power=None, cadence=None):
+    ''' Sensor summary of a track that does not depend on the athlete
+        settings, small enough to be kept with the activity metadata. Per
+        recorded channel: its mean and the time in bins of binWidths (see
+        timeInBins), plus for power the normalized power and the recorded
+        time; None for channels not recorded. Zones and TRIMP follow from the
+        bins for any settings, to within a bin (see scoreSensors). '''
+    summary = {'heartRate': None, 'power': None, 'cadence': None}
+    if(heartRate is not None):
+        summary['heartRate'] = dict(timeInBins(heartRate, time, binWidths['heartRate']), mean=float(np.nanmean(heartRate)))
+    if(power is not None):
+        summary['power']     = dict(timeInBins(power, time, binWidths['power']), mean=float(np.nanmean(power)),
+                                    normalizedPower=normalizedPower(power, time), duration=float(sampleDurations(time).sum()))
+    if(cadence is not None):
+        summary['cadence']   = {'mean': float(np.nanmean(cadence))}
+    return summary
+
+def scoreSensors(sensors, settings=None):
+    ''' Sensor summary for the athlete settings from summarizeSensors(), or
+        None for channels not recorded: mean heart rate, time in heart rate
+        zones and TRIMP; mean, normalized power, time in power zones and
+        training stress; mean cadence. Binned time counts at the bin centre. '''
+    settings  = dict(athlete, **(settings or {}))
+    heartRate = sensors.get('heartRate')
+    power     = sensors.get('power')
+    cadence   = sensors.get('cadence')
+    summary   = {'heartRate': None, 'heartRateZones': None, 'trimp': None,
+                 'power': None, 'normalizedPower': None, 'powerZones': None, 'trainingStress': None,
+                 'cadence': None}
+    if(heartRate is not None):
+        summary['heartRate']      = heartRate['mean']
+        summary['heartRateZones'] = secondsInZones(binCentres(heartRate), heartRate['seconds'], np.multiply(settings['heartRateZones'], settings['maxHeartRate']))
+        summary['trimp']          = trainingImpulse(binCentres(heartRate), heartRate['seconds'], settings['restHeartRate'], settings['maxHeartRate'], settings['trimpFactors'])
+    if(power is not None):
+        norm = power['normalizedPower']
+        summary['power']           = power['mean']
+        summary['normalizedPower'] = norm
+        summary['powerZones']      = secondsInZones(binCentres(power), power['seconds'], np.multiply(settings['powerZones'], settings['ftp']))
+        summary['trainingStress']  = float(power['duration']/3600.0*(norm/settings['ftp'])**2*100.0) if norm is not None and settings['ftp'] else None
+    if(cadence is not None):
+        summary['cadence'] = cadence['mean']
+    return summary
+
+def summarizeActivity(activity, settings=None):
+    ''' Sensor summary of an activity for the athlete settings (see
+        scoreSensors), from its metadata only (see
+        Activity.getSensorSummary). '''
+    return scoreSensors(activity.getSensorSummary(), settings)
+
+def combineSummaries(summaries):
+    ''' Totals over a list of summaries (see summarizeActivity): count of
+        activities with each channel, mean of the means, sum of zone times,
+        TRIMP and training stress. '''
+    result = {}
+    for name in ('heartRate', 'power', 'normalizedPower', 'cadence'):
+        values = [summary[name] for summary in summaries if summary[name] is not None]
+        result[name]          = float(np.mean(values)) if values else None
+        result[name+'Count']  = len(values)
+    for name in ('trimp', 'trainingStress'):
+        result[name] = float(sum(summary[name] for summary in summaries if summary[name] is not None))
+    for name in ('heartRateZones', 'powerZones'):
+        zones = [summary[name] for summary in summaries if summary[name] is not None]
+        result[name] = np.sum(zones, axis=0) if zones else None
+    return result
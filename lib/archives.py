@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+## Dependancies
+#Native
+import os, gzip, zipfile
+
+
+###############################################################################
+## Compressed activity files
+###############################################################################
+## Activity files inside a .zip are named <archive>!<member>
+separator = '!'
+
+## Archives opened by this process: {path: (pid, (size, mtime_ns), ZipFile)}.
+## The pid keeps forked workers from sharing the parent's file offset.
+openArchives = {}
+
+def isArchive(filename):
+    return filename.lower().endswith('.zip')
+
+def splitMember(filename):
+    ''' Return (archive, member) of a zip member name, or (filename, None). '''
+    ix = filename.lower().find('.zip'+separator)
+    if(ix < 0): return filename, None
+    return filename[:ix+4], filename[ix+5:]
+
+def memberName(archive, member):
+    return archive+separator+member
+
+def activityExtension(filename):
+    ''' Extension of the activity format of filename, ignoring a trailing .gz
+        ('ride.gpx.gz' is a '.gpx'). '''
+    name = splitMember(filename)[1] or filename
+    root, extension = os.path.splitext(name.lower())
+    if(extension == '.gz'): extension = os.path.splitext(root)[1]
+    return extension
+
+def getArchive(archive):
+    ''' ZipFile of archive, opened once per process and reopened only when
+        the archive changes on disk. '''
+    stat      = os.stat(archive)
+    signature = (stat.st_size, stat.st_mtime_ns)
+    entry     = openArchives.get(archive)
+    if(entry is not None and entry[:2] == (os.getpid(), signature)): return entry[2]
+    if(entry is not None and entry[0] == os.getpid()): entry[2].close()
+    openArchives[archive] = (os.getpid(), signature, zipfile.ZipFile(archive))
+    return openArchives[archive][2]
+
+def listMembers(archive, extensions):
+    ''' Return {member name: (size, CRC)} of the activity files in archive,
+        or {} if it cannot be read. '''
+    try:    infos = getArchive(archive).infolist()
+    except (OSError, zipfile.BadZipFile): return {}
+    return {memberName(archive, info.filename): (info.file_size, info.CRC) for info in infos
+            if(not info.is_dir() and activityExtension(info.filename) in extensions)}
+
+def signature(filename):
+    ''' [size, mtime_ns] of a file, or [size, CRC] of a zip member. '''
+    archive, member = splitMember(filename)
+    if(member is not None):
+        info = getArchive(archive).getinfo(member)
+        return [info.file_size, info.CRC]
+    stat = os.stat(filename)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def openActivity(filename):
+    ''' Binary stream of the activity in filename, decompressed on the fly
+        for .gz files and zip members; nothing is extracted to disk. '''
+    archive, member = splitMember(filename)
+    compressed      = filename.lower().endswith('.gz')
+    if(member is None): return gzip.open(filename, 'rb') if compressed else open(filename, 'rb')
+    stream = getArchive(archive).open(member)
+    return MemberGzipFile(stream) if compressed else stream
+
+class MemberGzipFile(gzip.GzipFile):
+    ''' Decompressed stream of a .gz zip member. Closing it also closes the
+        member stream, which GzipFile leaves open when given a fileobj. '''
+    def __init__(self, stream):
+        gzip.GzipFile.__init__(self, fileobj=stream, mode='rb')
+        self.member = stream
+
+    def close(self):
+        try:     gzip.GzipFile.close(self)
+        finally: self.member.close()
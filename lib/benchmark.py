@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+## Dependancies
+#Native
+import os, time, json, platform
+from datetime import datetime
+#Packages
+import numpy as np
+#Internal
+import lib.tools
+import lib.projection
+import lib.kinematics
+import lib.spatial
+import lib.aggregate
+import lib.synthetic
+import lib.timings
+
+
+###############################################################################
+## Benchmarks
+###############################################################################
+def timeSuite(name, function, repeat=3, points=0, files=0):
+    ''' Run function repeat times and return its timings: best and mean wall
+        time, CPU time of the best run, and points/s and files/s at the best
+        run for the given amount of work. Memory is not measured per suite,
+        see describeRun. '''
+    walls, cpus = [], []
+    for _ in range(repeat):
+        wall, cpu = time.perf_counter(), time.process_time()
+        function()
+        walls.append(time.perf_counter()-wall)
+        cpus.append(time.process_time()-cpu)
+    best = int(np.argmin(walls))
+    return {'name':      name,
+            'repeat':    repeat,
+            'seconds':   walls[best],
+            'mean':      float(np.mean(walls)),
+            'cpu':       cpus[best],
+            'points':    points,
+            'files':     files,
+            'pointsPerSecond': points/walls[best] if points and walls[best] > 0 else None,
+            'filesPerSecond':  files/walls[best] if files and walls[best] > 0 else None}
+
+
+def runSuites(filenames, repeat=3, clicks=100, engines=('iterparse',), seed=0):
+    ''' Time every suite over the activities in filenames and return the list
+        of results (see timeSuite). '''
+    results    = []
+    activities = []
+    points     = 0
+    for engine in engines:
+        def parse():
+            del activities[:]
+            for filename in filenames: activities.append(lib.tools.activityFormats[os.path.splitext(filename)[1]](filename, engine=engine))
+        ## Count the points once, on a first untimed parse
+        if(not points):
+            parse()
+            points = sum(len(activity) for activity in activities)
+        results.append(timeSuite('importXML ('+engine+')', parse, repeat, points, len(filenames)))
+
+    latLong = np.concatenate([activity.getColumn('positionsLatLong') for activity in activities])
+    zone    = activities[0].UTMZone
+    for engine in ('numpy', 'pyproj'):
+        if(engine == 'pyproj' and lib.projection.pyproj is None): continue
+        results.append(timeSuite('UTM conversion ('+engine+')', lambda: lib.projection.fromLatLon(latLong[:,0], latLong[:,1], zone[0], zone[1], engine=engine), repeat, len(latLong)))
+
+    def kinematics():
+        for activity in activities:
+            lib.tools.getCumulativeLength(activity.getPositions())
+            lib.kinematics.speeds(activity.getPositions(), activity.getTimes())
+    results.append(timeSuite('getCumulativeLength/speeds', kinematics, repeat, points, len(activities)))
+
+    bbox   = np.array([activity.getBoundingBox() for activity in activities])
+    region = lib.tools.Region('Benchmark', latLim=[float(np.median(bbox[:,0])), float(bbox[:,1].max())], longLim=[float(bbox[:,2].min()), float(np.median(bbox[:,3]))])
+    results.append(timeSuite('bindActivities', lambda: region.bindActivities(activities), repeat, 0, len(activities)))
+
+    ## Clicks on random track points, nudged off the tracks
+    random    = np.random.RandomState(seed)
+    positions = np.concatenate([activity.getPositions() for activity in activities])
+    queries   = positions[random.randint(0, len(positions), clicks)]+random.normal(0.0, 20.0, (clicks, 2))
+    results.append(timeSuite('findNearestActivity (scan)', lambda: [lib.tools.findNearestActivity(x, y, activities) for x, y in queries], repeat, points*clicks))
+    grid = []
+    results.append(timeSuite('SegmentGrid build', lambda: grid.append(lib.spatial.SegmentGrid(activities)), repeat, points, len(activities)))
+    results.append(timeSuite('findNearestActivity (grid)', lambda: [lib.tools.findNearestActivity(x, y, activities, grid[-1]) for x, y in queries], repeat, points*clicks))
+
+    def statistics():
+        table = lib.aggregate.ActivityTable(activities)
+        table.monthlyCounts()
+        table.statistics()
+        table.groupBy(table.types)
+        table.statistics(table.regionMask(region))
+    results.append(timeSuite('statistics tables', statistics, repeat, 0, len(activities)))
+    return results
+
+
+def describeRun(config, results):
+    ''' JSON document of a run: environment, configuration and results.
+        peakRSS is the peak resident set size (bytes) of the whole process so
+        far: the suites share the process, so it cannot be told apart by
+        suite. '''
+    return {'time':     datetime.now().isoformat(),
+            'python':   platform.python_version(),
+            'numpy':    np.__version__,
+            'platform': platform.platform(),
+            'config':   config,
+            'peakRSS':  lib.timings.peakRSS(),
+            'suites':   results}
+
+def saveRun(filename, run):
+    folder = os.path.dirname(filename)
+    if(folder and not os.path.exists(folder)): os.makedirs(folder)
+    with open(filename, 'w') as stream: json.dump(run, stream, indent=1)
+
+def loadRun(filename):
+    with open(filename, 'r') as stream: return json.load(stream)
+
+def compareRuns(previous, current):
+    ''' Speed-up of each suite of current over previous (previous best time
+        over current best time), by suite name; None for new suites. '''
+    before = {suite['name']: suite['seconds'] for suite in previous['suites']}
+    return {suite['name']: before[suite['name']]/suite['seconds'] if suite['name'] in before and suite['seconds'] > 0 else None for suite in current['suites']}
+
+
+def benchmark(folder, files=20, points=3600, laps=1, sensors=(), repeat=3, clicks=100, engines=('iterparse',), seed=0):
+    ''' Generate the synthetic activities in folder (see
+        lib.synthetic.generateFiles), time every suite over them and return the
+        run (see describeRun). '''
+    config    = {'files': files, 'points': points, 'laps': laps, 'sensors': list(sensors), 'repeat': repeat, 'clicks': clicks, 'engines': list(engines), 'seed': seed}
+    filenames = lib.synthetic.generateFiles(folder, files, points, laps, sensors, seed=seed)
+    return describeRun(config, runSuites(filenames, repeat, clicks, engines, seed))
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+
+## Dependancies
+#Native
+import os, json, hashlib
+from datetime import datetime, timedelta
+#Packages
+import numpy as np
+#Internal
+import lib.parsers
+import lib.archives
+
+
+###############################################################################
+## Parsed activity cache
+###############################################################################
+class ActivityCache():
+    ''' On-disk cache of parsed activities.
+
+        Each activity is stored as one .npz file holding its arrays, while its
+        metadata lives in a JSON manifest keyed by absolute path and validated
+        against the file size and modification time. The whole cache is
+        dropped when lib.parsers.version changes. '''
+    def __init__(self, folder, rebuild=False):
+        self.folder   = folder
+        self.filename = os.path.join(folder, 'manifest.json')
+        self.manifest = None
+        if(not rebuild):
+            try:
+                with open(self.filename, 'r') as stream: manifest = json.load(stream)
+                if(manifest['version'] == lib.parsers.version): self.manifest = manifest
+            except (IOError, OSError, ValueError, KeyError): pass
+        if(not os.path.exists(folder)): os.makedirs(folder)
+        if(self.manifest is None):
+            self.clear()
+
+    def clear(self):
+        ''' Drop every cached activity. '''
+        for filename in os.listdir(self.folder):
+            if(filename.endswith('.npz')): os.remove(os.path.join(self.folder, filename))
+        self.manifest = {'version': lib.parsers.version, 'activities': {}}
+
+    def __len__(self):          return len(self.manifest['activities'])
+
+    def key(self, filename):    return fileKey(filename)
+
+    def signature(self, filename):
+        return lib.archives.signature(filename)
+
+    def lookup(self, filename):
+        ''' Return the manifest entry of filename if it is still up to date. '''
+        entry = self.manifest['activities'].get(self.key(filename))
+        if(entry is None or entry['signature'] != self.signature(filename)): return None
+        return entry
+
+    def getActivityType(self, filename):
+        return self.lookup(filename)['activityType']
+
+    def getMetadata(self, filename):
+        ''' Metadata of a cached activity, or None if only its activity type
+            was cached. '''
+        entry = self.lookup(filename)
+        if(entry is None or entry['metadata'] is None): return None
+        return {key: decode(value) for key, value in entry['metadata'].items()}
+
+    def getArrays(self, filename):
+        ''' Per-point arrays of a cached activity, or None. '''
+        entry = self.lookup(filename)
+        if(entry is None or entry['arrays'] is None): return None
+        with np.load(os.path.join(self.folder, entry['arrays'])) as arrays:
+            return {name: arrays[name] for name in arrays.files}
+
+    def getPayload(self, filename):
+        ''' Rebuild the payload (see Activity.getPayload) of a cached activity,
+            or return None if only its activity type was cached. '''
+        payload = self.getMetadata(filename)
+        if(payload is not None): payload.update(self.getArrays(filename))
+        return payload
+
+    def getDerived(self, filename, name):
+        ''' Arrays derived from a cached activity and stored with putDerived(),
+            or None if missing or if the activity changed since. '''
+        entry = self.lookup(filename)
+        if(entry is None or entry['arrays'] is None): return None
+        derived = os.path.join(self.folder, self.derivedName(entry['arrays'], name))
+        if(not os.path.exists(derived)): return None
+        with np.load(derived) as arrays:
+            if(list(arrays['signature']) != entry['signature']): return None
+            return {key: arrays[key] for key in arrays.files if key != 'signature'}
+
+    def putDerived(self, filename, name, arrays):
+        ''' Store arrays derived from a cached activity (such as simplified
+            tracks) next to its own arrays, stamped with the file signature. '''
+        entry = self.lookup(filename)
+        if(entry is None or entry['arrays'] is None): return False
+        np.savez(os.path.join(self.folder, self.derivedName(entry['arrays'], name)), signature=np.array(entry['signature']), **arrays)
+        return True
+
+    def derivedName(self, arrays, name):
+        return arrays[:-len('.npz')]+'.'+name+'.npz'
+
+    def getError(self, filename):
+        ''' Error (see lib.loader.ErrorReport) of a file quarantined by a batch
+            run, or None. '''
+        return self.lookup(filename).get('error')
+
+    def put(self, filename, activityType, payload=None, error=None):
+        ''' Store a parsed activity. Without payload, only the activity type is
+            kept so that filtered-out files are not parsed again, or the error
+            of a quarantined file. '''
+        entry = {'signature': self.signature(filename), 'activityType': activityType, 'metadata': None, 'arrays': None, 'error': error}
+        if(payload is not None):
+            entry['arrays']   = hashlib.sha1(self.key(filename).encode('utf-8')).hexdigest()+'.npz'
+            entry['metadata'] = {key: encode(value) for key, value in payload.items() if not isinstance(value, np.ndarray)}
+            np.savez(os.path.join(self.folder, entry['arrays']), **{key: value for key, value in payload.items() if isinstance(value, np.ndarray)})
+        self.manifest['activities'][self.key(filename)] = entry
+
+    def save(self):
+        ''' Write the manifest atomically. '''
+        temporary = self.filename+'.tmp'
+        with open(temporary, 'w') as stream: json.dump(self.manifest, stream)
+        os.replace(temporary, self.filename)
+
+
+def fileKey(filename):
+    ''' Absolute path of filename; zip members are keyed individually. '''
+    archive, member = lib.archives.splitMember(filename)
+    if(member is None): return os.path.abspath(filename)
+    return lib.archives.memberName(os.path.abspath(archive), member)
+
+## Key of the dicts standing for the values JSON has no type for (see encode)
+typeTag = '__type__'
+
+def encode(value):
+    ''' Make a metadata value JSON serialisable: datetimes, timedeltas and
+        tuples become {typeTag: type name, 'value': ...}. '''
+    if(isinstance(value, datetime)):   return {typeTag: 'datetime', 'value': value.isoformat()}
+    if(isinstance(value, timedelta)):  return {typeTag: 'timedelta', 'value': value.total_seconds()}
+    if(isinstance(value, tuple)):      return {typeTag: 'tuple', 'value': [encode(item) for item in value]}
+    if(isinstance(value, list)):       return [encode(item) for item in value]
+    if(isinstance(value, dict)):       return {key: encode(item) for key, item in value.items()}
+    if(isinstance(value, np.generic)): return value.item()
+    return value
+
+def decode(value):
+    ''' Inverse of encode(). '''
+    if(isinstance(value, dict)):
+        if(set(value) == {typeTag, 'value'}):
+            kind, item = value[typeTag], value['value']
+            if(kind == 'datetime'):  return datetime.strptime(item, '%Y-%m-%dT%H:%M:%S.%f' if '.' in item else '%Y-%m-%dT%H:%M:%S')
+            if(kind == 'timedelta'): return timedelta(seconds=item)
+            if(kind == 'tuple'):     return tuple(decode(entry) for entry in item)
+        return {key: decode(item) for key, item in value.items()}
+    if(isinstance(value, list)):  return [decode(item) for item in value]
+    return value
@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+
+## Dependancies
+#Native
+import os, json, shutil
+from datetime import timedelta
+#Packages
+import numpy as np
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError: pyarrow = None
+#Internal
+import lib.tools
+import lib.loader
+import lib.cache
+import lib.archives
+import lib.timestamps
+
+
+###############################################################################
+## Columnar datasets
+###############################################################################
+## Dataset engine: 'parquet' (pyarrow) or 'numpy' (raw little-endian column
+## files, readable with np.fromfile or np.memmap)
+engine = 'parquet' if pyarrow is not None else 'numpy'
+
+## One row per activity
+metadataColumns   = (('id', 'int64'), ('filename', 'str'), ('activityType', 'str'), ('startTime', 'datetime64[ms]'),
+                     ('duration', 'float64'), ('distance', 'float64'), ('calories', 'float64'),
+                     ('UTMZoneNumber', 'int64'), ('UTMZoneLetter', 'str'),
+                     ('latMin', 'float64'), ('latMax', 'float64'), ('longMin', 'float64'), ('longMax', 'float64'),
+                     ('startLat', 'float64'), ('startLong', 'float64'),
+                     ('length', 'int64'), ('year', 'int64'), ('offset', 'int64'), ('laps', 'str'), ('pauses', 'str'), ('sensors', 'str'))
+## One row per trackpoint, partitioned by the year of the activity
+trackpointColumns = (('id', 'int64'), ('t', 'float64'), ('lat', 'float64'), ('lon', 'float64'),
+                     ('x', 'float64'), ('y', 'float64'), ('altitude', 'float64'), ('speed', 'float64'),
+                     ('heartRate', 'float32'), ('cadence', 'float32'), ('power', 'float32'), ('sensorSpeed', 'float32'))
+## Coordinate columns read as (n,2) pairs: name, first and second column. The
+## numpy engine writes them interleaved in one name.bin file, so that the
+## tracks of the activities are slices of the mapped file
+coordinatePairs   = (('latLong', 'lat', 'lon'), ('xy', 'x', 'y'))
+
+
+def partitionFolder(folder, year):
+    ''' Folder of the trackpoints of year, or of every trackpoint of a packed
+        dataset (year None). '''
+    return os.path.join(folder, 'trackpoints', 'year='+str(year) if year is not None else 'all')
+
+
+class DatasetWriter():
+    ''' Write activities to a columnar dataset in folder:
+
+            activities.<ext>                    metadata table
+            trackpoints/year=<year>/...         trackpoint table
+
+        Trackpoints are buffered and written in batches of about batchSize
+        rows, so only one batch is ever held in memory. A packed dataset (numpy engine
+        only) keeps every trackpoint in a single trackpoints/all partition,
+        in activity order (see lib.store.TrackpointStore). '''
+    def __init__(self, folder, engine=None, batchSize=1000000, packed=False):
+        self.folder    = folder
+        self.engine    = engine or globals()['engine']
+        self.batchSize = batchSize
+        self.packed    = packed
+        self.metadata  = {name: [] for name, _ in metadataColumns}
+        self.pending   = {}
+        self.rows      = {}
+        self.writers   = {}
+        self.buffered  = 0
+        if(self.engine == 'parquet' and pyarrow is None): raise Exception('The parquet dataset engine requires the pyarrow package.')
+        elif(self.engine not in ('parquet', 'numpy')):   raise Exception('Unknown dataset engine: '+str(self.engine))
+        if(packed and self.engine != 'numpy'):             raise Exception('A packed dataset requires the numpy engine.')
+        ## Only ever replace a previous dataset
+        if(os.path.exists(os.path.join(folder, 'dataset.json'))): shutil.rmtree(folder)
+        elif(os.path.exists(folder) and os.listdir(folder)):       raise Exception('Export folder is not empty and holds no dataset: '+folder)
+        os.makedirs(os.path.join(folder, 'trackpoints'), exist_ok=True)
+
+    def __len__(self):          return len(self.metadata['id'])
+
+    def add(self, activity):
+        ''' Append one activity to the dataset. '''
+        with activity.loadedColumns():
+            year     = activity.getStartTime().year
+            key      = None if self.packed else year   ## Partition
+            zone     = activity.UTMZone or (None, None)
+            bbox     = activity.getBoundingBox() or (np.nan,)*4
+            start    = activity.getStartPoint() or (np.nan,)*2
+            row      = {'id': len(self), 'filename': activity.getName(), 'activityType': activity.getActivityType() or '',
+                        'startTime': np.datetime64(activity.getStartTime(), 'ms'), 'duration': activity.getDuration().total_seconds(),
+                        'distance': activity.getDistance() or 0.0, 'calories': activity.getCalories() or 0.0,
+                        'UTMZoneNumber': zone[0] if zone[0] is not None else -1, 'UTMZoneLetter': zone[1] or '',
+                        'latMin': bbox[0], 'latMax': bbox[1], 'longMin': bbox[2], 'longMax': bbox[3],
+                        'startLat': start[0], 'startLong': start[1],
+                        'length': len(activity), 'year': year, 'offset': self.rows.get(key, 0),
+                        'laps': json.dumps(lib.cache.encode(activity.laps)) if activity.laps else '',
+                        'pauses': json.dumps(lib.cache.encode(activity.getPauses())),
+                        'sensors': json.dumps(lib.cache.encode(activity.getSensorSummary()))}
+            for name, _ in metadataColumns: self.metadata[name].append(row[name])
+
+            if(len(activity)):
+                latLong   = activity.getColumn('positionsLatLong')
+                positions = activity.getPositions()
+                columns   = {'id': np.full(len(activity), row['id'], dtype=np.int64), 't': activity.getTimes(),
+                             'lat': latLong[:,0], 'lon': latLong[:,1], 'x': positions[:,0], 'y': positions[:,1],
+                             'altitude': activity.getPositionsAlt(), 'speed': activity.getSpeeds()}
+                for name, _ in lib.tools.Activity.sensorNames:
+                    sensor = activity.getSensor(name)
+                    columns[name] = sensor if sensor is not None else np.full(len(activity), np.nan, dtype=np.float32)
+                self.pending.setdefault(key, []).append(columns)
+                self.rows[key] = self.rows.get(key, 0)+len(activity)
+                self.buffered  += len(activity)
+        if(self.buffered >= self.batchSize): self.flush()
+
+    def flush(self):
+        ''' Write the buffered trackpoints, one batch per year (or a single
+            one when packed). '''
+        for year in sorted(self.pending, key=str):
+            batch = {name: np.concatenate([columns[name] for columns in self.pending[year]]).astype(dtype) for name, dtype in trackpointColumns}
+            if(self.engine == 'parquet'): self.writeParquet(year, batch)
+            else:                         self.writeNumpy(year, batch)
+        self.pending  = {}
+        self.buffered = 0
+
+    def writeParquet(self, year, batch):
+        table = pyarrow.table({name: batch[name] for name, _ in trackpointColumns})
+        if(year not in self.writers):
+            os.makedirs(partitionFolder(self.folder, year))
+            self.writers[year] = pyarrow.parquet.ParquetWriter(os.path.join(partitionFolder(self.folder, year), 'part-0.parquet'), table.schema)
+        self.writers[year].write_table(table)
+
+    def writeNumpy(self, year, batch):
+        folder = partitionFolder(self.folder, year)
+        paired = [name for _, first, second in coordinatePairs for name in (first, second)]
+        if(not os.path.exists(folder)): os.makedirs(folder)
+        for name, dtype in trackpointColumns:
+            if(name in paired): continue
+            with open(os.path.join(folder, name+'.bin'), 'ab') as stream: batch[name].astype(np.dtype(dtype).newbyteorder('<')).tofile(stream)
+        for name, first, second in coordinatePairs:
+            with open(os.path.join(folder, name+'.bin'), 'ab') as stream: np.stack([batch[first], batch[second]], axis=1).astype(np.dtype('float64').newbyteorder('<')).tofile(stream)
+
+    def close(self):
+        ''' Write the remaining trackpoints and the metadata table. '''
+        self.flush()
+        for writer in self.writers.values(): writer.close()
+        metadata = {name: np.array(self.metadata[name], dtype=object if dtype == 'str' else dtype) for name, dtype in metadataColumns}
+        if(self.engine == 'parquet'):
+            pyarrow.parquet.write_table(pyarrow.table({name: (list(values) if values.dtype == object else values) for name, values in metadata.items()}),
+                                        os.path.join(self.folder, 'activities.parquet'))
+        else:
+            np.savez(os.path.join(self.folder, 'activities.npz'), **{name: (values.astype(str) if values.dtype == object else values) for name, values in metadata.items()})
+        with open(os.path.join(self.folder, 'dataset.json'), 'w') as stream:
+            json.dump({'engine': self.engine, 'activities': len(self), 'packed': self.packed, 'points': sum(self.rows.values()),
+                       'years': {str(year): rows for year, rows in sorted(self.rows.items()) if year is not None},
+                       'metadata': [list(column) for column in metadataColumns], 'trackpoints': [list(column) for column in trackpointColumns],
+                       'pairs': [list(pair) for pair in coordinatePairs]}, stream, indent=1)
+
+
+def exportActivities(activities, folder, engine=None, batchSize=1000000, packed=False):
+    ''' Write activities to a dataset in folder (see DatasetWriter). '''
+    writer = DatasetWriter(folder, engine=engine, batchSize=batchSize, packed=packed)
+    for activity in activities: writer.add(activity)
+    writer.close()
+    return len(writer)
+
+
+class Dataset():
+    ''' A dataset written by DatasetWriter. Activities are rebuilt from the
+        metadata table (laps are stored as JSON); their columns are read from the year partitions, which
+        are memory mapped (numpy) or read once and kept (parquet). Works as
+        the source of unloaded activities (see Activity.unloadColumns). '''
+    def __init__(self, folder):
+        self.folder = folder
+        with open(os.path.join(folder, 'dataset.json'), 'r') as stream: self.description = json.load(stream)
+        self.engine = self.description['engine']
+        self.packed = self.description.get('packed', False)
+        if(self.engine == 'parquet'):
+            if(pyarrow is None): raise Exception('The parquet dataset engine requires the pyarrow package.')
+            table = pyarrow.parquet.read_table(os.path.join(folder, 'activities.parquet'))
+            self.metadata = {name: table.column(name).to_numpy() for name in table.column_names}
+        else:
+            with np.load(os.path.join(folder, 'activities.npz')) as arrays: self.metadata = {name: arrays[name] for name in arrays.files}
+        self.rows       = {filename: ix for ix, filename in enumerate(self.metadata['filename'])}
+        self.partitions = {}
+
+    def __len__(self):          return len(self.metadata['id'])
+
+    def getPartition(self, year):
+        ''' Trackpoint columns of a partition, plus the (n,2) coordinate pairs
+            (see coordinatePairs) of which the coordinate columns are views. '''
+        if(year not in self.partitions):
+            folder  = partitionFolder(self.folder, year)
+            columns = {}
+            if(self.engine == 'parquet'):
+                table   = pyarrow.parquet.read_table(os.path.join(folder, 'part-0.parquet'))
+                columns = {name: table.column(name).to_numpy() for name, _ in trackpointColumns}
+            else:
+                for name, dtype in trackpointColumns:
+                    filename = os.path.join(folder, name+'.bin')
+                    if(os.path.exists(filename)): columns[name] = np.memmap(filename, dtype=np.dtype(dtype).newbyteorder('<'), mode='r')
+                for name, _, _ in coordinatePairs:
+                    filename = os.path.join(folder, name+'.bin')
+                    if(os.path.exists(filename)): columns[name] = np.memmap(filename, dtype=np.dtype('float64').newbyteorder('<'), mode='r').reshape(-1, 2)
+            for name, first, second in coordinatePairs:
+                ## Parquet partitions (and numpy ones written before the pairs)
+                ## are paired once here
+                if(name not in columns): columns[name] = np.stack([columns[first], columns[second]], axis=1)
+                columns[first], columns[second] = columns[name][:,0], columns[name][:,1]
+            self.partitions[year] = columns
+        return self.partitions[year]
+
+    def getRows(self, ix):
+        ''' (partition, rows) of the trackpoints of row ix. '''
+        offset, length = int(self.metadata['offset'][ix]), int(self.metadata['length'][ix])
+        return self.getPartition(None if self.packed else int(self.metadata['year'][ix])), slice(offset, offset+length)
+
+    def getColumn(self, ix, name):
+        ''' Trackpoint column or coordinate pair name of row ix, as a slice
+            of the partition (no copy). '''
+        partition, rows = self.getRows(ix)
+        return partition[name][rows]
+
+    def getMetadata(self, ix):
+        ''' Activity metadata (see Activity.metadataNames) of row ix. '''
+        column = lambda name: self.metadata[name][ix]
+        length = int(column('length'))
+        return {'filename':     str(column('filename')),
+                'activityType': str(column('activityType')) or None,
+                'calories':     float(column('calories')),
+                'startTime':    lib.timestamps.toDatetime(np.datetime64(column('startTime'), 'ms').astype(np.int64)/1000.0),
+                'duration':     timedelta(seconds=float(column('duration'))),
+                'distance':     float(column('distance')),
+                'length':       length,
+                'UTMZone':      (int(column('UTMZoneNumber')), str(column('UTMZoneLetter'))) if length else (None, None),
+                'bbox':         tuple(float(column(name)) for name in ('latMin', 'latMax', 'longMin', 'longMax')) if length else None,
+                'startPoint':   (float(column('startLat')), float(column('startLong'))) if length else None,
+                'laps':         json.loads(str(column('laps'))) if str(column('laps')) else None,
+                'pauses':       json.loads(str(column('pauses'))) if 'pauses' in self.metadata else None,
+                'sensors':      json.loads(str(column('sensors'))) if 'sensors' in self.metadata else None,
+                'activities':   []}
+
+    def getArrays(self, filename):
+        ''' Columns of an activity (see Activity.columnNames), or None if
+            filename is not in the dataset. The columns are read-only slices
+            of the partition (see getColumn): nothing is copied. '''
+        ix = self.rows.get(filename)
+        if(ix is None): return None
+        if(int(self.metadata['length'][ix]) == 0):
+            return {'positionsLatLong': np.zeros((0, 2)), 'positions': np.zeros((0, 2)), 'altitude': np.zeros(0), 'time': np.zeros(0), 'speeds': np.zeros(0)}
+        partition, rows = self.getRows(ix)
+        columns = {'positionsLatLong': partition['latLong'][rows],
+                   'positions':        partition['xy'][rows],
+                   'altitude':         partition['altitude'][rows],
+                   'time':             partition['t'][rows],
+                   'speeds':           partition['speed'][rows]}
+        for name, _ in lib.tools.Activity.sensorNames:
+            if(name in partition and np.isfinite(partition[name][rows]).any()): columns[name] = partition[name][rows]
+        return columns
+
+    def getDerived(self, filename, name):   return None
+    def putDerived(self, filename, name, arrays): return False
+
+    def getActivity(self, ix, lazy=True, payload=None):
+        ''' Rebuild the activity of row ix. A lazy activity reads its columns
+            on first use. '''
+        payload  = payload or self.getMetadata(ix)
+        activity = lib.tools.activityFormats[lib.archives.activityExtension(payload['filename'])].fromPayload(payload)
+        if(lazy): activity.unloadColumns(self)
+        else:     activity.columns = self.getArrays(payload['filename'])
+        return activity
+
+    def loadActivities(self, activityTypes=None, lazy=True, subset=None):
+        ''' Rebuild the activities of the dataset, optionally keeping only
+            activityTypes and the rows in subset. '''
+        activities = []
+        for ix in (range(len(self)) if subset is None else subset):
+            payload = self.getMetadata(ix)
+            if(activityTypes is not None and not lib.loader.acceptActivityType(payload['activityType'], activityTypes)): continue
+            activities.append(self.getActivity(ix, lazy, payload))
+        return activities
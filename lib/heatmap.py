@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+
+## Dependancies
+#Native
+import os, json, shutil, hashlib
+#Packages
+import numpy as np
+import matplotlib.pyplot as plt
+#Internal
+import lib.render
+import lib.archives
+
+
+###############################################################################
+## Density rasters
+###############################################################################
+def histogram(points, x0, y0, cellSize, shape):
+    ''' Point counts of an (ny, nx) grid of cellSize cells whose lower left
+        corner is (x0, y0); row 0 is the bottom row. Points outside are
+        ignored. '''
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    cols   = np.floor((points[:,0]-x0)/cellSize).astype(np.int64)
+    rows   = np.floor((points[:,1]-y0)/cellSize).astype(np.int64)
+    inside = (cols >= 0) & (cols < shape[1]) & (rows >= 0) & (rows < shape[0])
+    counts = np.bincount(rows[inside]*shape[1]+cols[inside], minlength=shape[0]*shape[1])
+    return counts.reshape(shape).astype(np.uint32)
+
+
+def fileSignature(filename):
+    ''' Signature of an activity file (see lib.archives.signature), or None
+        if it cannot be read. '''
+    try:                                 return lib.archives.signature(filename)
+    except (IOError, OSError, KeyError): return None
+
+
+class TilePyramid():
+    ''' Multi-resolution point density tiles of a list of activities.
+
+        The pyramid covers a square of side size from origin: level k is split
+        into 2**k x 2**k tiles of tileSize x tileSize cells. Tiles are computed
+        on first request from the UTM positions sorted by x, and kept in
+        memory and, with a folder, on disk under a key derived from the
+        activity files (see lib.archives.signature) and the settings. The
+        folder holds the tiles of a single pyramid: those of other keys are
+        removed. Positions are only read when a tile is missing. '''
+    def __init__(self, activities, tileSize=256, minCellSize=2.0, maxLevel=12, folder=None):
+        self.activities  = activities
+        self.tileSize    = int(tileSize)
+        self.minCellSize = float(minCellSize)
+        self.points      = None
+        self.tiles       = {}
+        self.folder      = None
+        geometry         = None
+        if(folder is not None):
+            key = hashlib.sha1(repr((self.tileSize, self.minCellSize, maxLevel,
+                                     [(activity.getName(), fileSignature(activity.getName()), len(activity)) for activity in activities])).encode('utf-8')).hexdigest()
+            self.folder = os.path.join(folder, key)
+            if(os.path.exists(folder)):
+                for name in os.listdir(folder):
+                    if(name != key and os.path.isdir(os.path.join(folder, name))): shutil.rmtree(os.path.join(folder, name))
+            if(not os.path.exists(self.folder)): os.makedirs(self.folder)
+            try:
+                with open(os.path.join(self.folder, 'pyramid.json'), 'r') as stream: geometry = json.load(stream)
+            except (IOError, OSError, ValueError): pass
+        if(geometry is None):
+            self.loadPoints()
+            origin = self.points.min(axis=0) if len(self.points) else np.zeros(2)
+            span   = np.ptp(self.points, axis=0).max() if len(self.points) else 0.0
+            ## Pad so that the points on the far edge fall inside the last cell
+            size   = max(span*(1.0+1e-9)+self.minCellSize, self.tileSize*self.minCellSize)
+            geometry = {'origin':   origin.tolist(),
+                        'size':     float(size),
+                        'maxLevel': int(min(maxLevel, max(0, np.ceil(np.log2(size/(self.tileSize*self.minCellSize))))))}
+            if(self.folder):
+                with open(os.path.join(self.folder, 'pyramid.json'), 'w') as stream: json.dump(geometry, stream)
+        self.origin   = np.array(geometry['origin'], dtype=float)
+        self.size     = geometry['size']
+        self.maxLevel = geometry['maxLevel']
+
+    def loadPoints(self):
+        ''' Read the UTM positions of the activities, sorted by x. '''
+        if(self.points is not None): return self.points
+        tracks = []
+        for activity in self.activities:
+            with activity.loadedColumns(): tracks.append(np.asarray(activity.getPositions(), dtype=float).reshape(-1, 2))
+        points      = np.concatenate(tracks) if tracks else np.zeros((0, 2))
+        self.points = points[np.argsort(points[:,0], kind='stable')]
+        return self.points
+
+    def getExtent(self):
+        ''' (xMin, xMax, yMin, yMax) covered by the pyramid. '''
+        return (self.origin[0], self.origin[0]+self.size, self.origin[1], self.origin[1]+self.size)
+
+    def getCellSize(self, level):
+        return self.size/(2**level*self.tileSize)
+
+    def selectLevel(self, resolution):
+        ''' Coarsest level whose cells are no larger than resolution (m per
+            pixel), or the finest level. '''
+        for level in range(self.maxLevel+1):
+            if(self.getCellSize(level) <= resolution): return level
+        return self.maxLevel
+
+    def getTile(self, level, tx, ty):
+        ''' (tileSize, tileSize) counts of tile (tx, ty) of level. '''
+        key = (level, tx, ty)
+        if(key in self.tiles): return self.tiles[key]
+        filename = os.path.join(self.folder, str(level)+'_'+str(tx)+'_'+str(ty)+'.npy') if self.folder else None
+        if(filename and os.path.exists(filename)): tile = np.load(filename)
+        else:
+            span   = self.size/2**level
+            x0     = self.origin[0]+tx*span
+            y0     = self.origin[1]+ty*span
+            points = self.loadPoints()
+            start  = np.searchsorted(points[:,0], x0, side='left')
+            stop   = np.searchsorted(points[:,0], x0+span, side='left')
+            tile   = histogram(points[start:stop], x0, y0, self.getCellSize(level), (self.tileSize, self.tileSize))
+            if(filename): np.save(filename, tile)
+        self.tiles[key] = tile
+        return tile
+
+    def render(self, xlim, ylim, resolution):
+        ''' Return (image, extent) of the tiles covering the limits at the level
+            matching resolution (m per pixel); image row 0 is the bottom. '''
+        level  = self.selectLevel(resolution)
+        span   = self.size/2**level
+        count  = 2**level
+        txs    = np.clip(np.floor((np.sort(xlim)-self.origin[0])/span).astype(int), 0, count-1)
+        tys    = np.clip(np.floor((np.sort(ylim)-self.origin[1])/span).astype(int), 0, count-1)
+        image  = np.zeros(((tys[1]-tys[0]+1)*self.tileSize, (txs[1]-txs[0]+1)*self.tileSize), dtype=np.uint32)
+        for ty in range(tys[0], tys[1]+1):
+            for tx in range(txs[0], txs[1]+1):
+                row, col = (ty-tys[0])*self.tileSize, (tx-txs[0])*self.tileSize
+                image[row:row+self.tileSize, col:col+self.tileSize] = self.getTile(level, tx, ty)
+        extent = (self.origin[0]+txs[0]*span, self.origin[0]+(txs[1]+1)*span,
+                  self.origin[1]+tys[0]*span, self.origin[1]+(tys[1]+1)*span)
+        return image, extent
+
+
+class DensityMap(lib.render.Map):
+    ''' Map whose image is the point density of the activities of a region,
+        rendered from a TilePyramid for the current view rather than loaded
+        from a file. With a folder, the tiles of each region are kept in a
+        subfolder named after it. '''
+    def __init__(self, region, folder=None, tileSize=256, cmap='inferno'):
+        self.filename = None
+        self.region   = region
+        self.scale    = 1.0
+        self.cmap     = cmap
+        self.image    = None
+        self.view     = None
+        self.pyramid  = TilePyramid(region.activities, tileSize=tileSize, folder=os.path.join(folder, region.name) if folder else None)
+
+    def load(self):             pass
+    def getExtent(self):        return list(self.pyramid.getExtent())
+
+    def plot(self, ax=None):
+        ''' Draw the density of the current view of ax and return the image. '''
+        if(ax is None): ax = plt.gca()
+        self.image = None
+        self.view  = None
+        self.update(ax)
+        return self.image
+
+    def update(self, ax):
+        ''' Render the tiles of the current view of ax (see TilePyramid.render);
+            the image is only replaced when the set of tiles changes. '''
+        resolution = abs(ax.get_xlim()[1]-ax.get_xlim()[0])/max(ax.bbox.width, 1.0)
+        image, extent = self.pyramid.render(ax.get_xlim(), ax.get_ylim(), resolution)
+        if(self.view == (image.shape, extent)): return False
+        self.view = (image.shape, extent)
+        density   = np.log1p(image)
+        if(self.image is None):
+            ax.set_autoscale_on(False)
+            self.image = ax.imshow(density, extent=extent, origin='lower', cmap=self.cmap, interpolation='nearest', zorder=0)
+        else:
+            self.image.set_data(density)
+            self.image.set_extent(extent)
+            self.image.set_clim(0, max(density.max(), 1.0))
+        return True
@@ -5,12 +5,17 @@
 ##################
 ## Native
 ## Dependancies
-import Tkinter           as tk
+try:    import tkinter   as tk
+except ImportError:
+        import Tkinter   as tk
 import tkinter.ttk as ttk
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
 #Internal
 import lib.tools
+import lib.render
+import lib.heatmap
 
 ##################
 # Setup localisation
@@ -73,9 +78,18 @@ class Interface():
         self.frame_selection['values'] = [label for label in regions if regions[label].plot]
         self.frame_selection.current(0)
         self.frame_selection.bind("<<ComboboxSelected>>", self.drawMap)
+        self.frame_mode_value = tk.StringVar()
+        self.frame_mode = ttk.Combobox(self.frame_selection.master, textvariable=self.frame_mode_value, state='readonly')
+        self.frame_mode.pack(side=tk.LEFT)
+        self.frame_mode['values'] = RegionView.modes
+        self.frame_mode.current(0)
+        self.frame_mode.bind("<<ComboboxSelected>>", self.drawMap)
 
-        ## Prepare canvas
-        self.drawMap(**kwargs)
+        ## Prepare canvas, one figure per region drawn on first selection
+        self.mapOptions = kwargs
+        self.views      = {}
+        self.view       = None
+        self.drawMap()
 
 
         ## Navigation
@@ -93,27 +107,16 @@ class Interface():
     ###########################################################################
     ## Draw Map
     ###########################################################################
-    def drawMap(self, event='', **kwargs):
-        try:
-            self.canvas.get_tk_widget().pack_forget()
-            self.canvas._tkcanvas.pack_forget()
-            self.canvas = None
-            self.toolbar = None
-        except: pass
-        fig = plt.figure('1')
-        print self.frame_selection_value.get()
-        for activity in self.regions[self.frame_selection_value.get()].activities:
-            activity.plot, = plt.plot(activity.getPositionsUTMX(), activity.getPositionsUTMY(), color='C0', **kwargs)
-        activeElements = lib.tools.Persistant()
-        plt.axis('equal')
-        self.canvas = FigureCanvasTkAgg(fig, self.frame_data)
-        self.canvas.draw()
-        self.toolbar = NavigationToolbar2Tk(self.canvas, self.frame_data)
-        self.toolbar.update()
-        self.canvas.get_tk_widget().pack(side=tk.BOTTOM, fill=tk.BOTH, expand=True)
-        self.canvas._tkcanvas.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
-        self.canvas.mpl_connect('button_press_event', lambda event: lib.tools.mapClickCallback(event, self.canvas, self.toolbar, self.regions[self.frame_selection_value.get()].activities, activeElements, kwargs['linewidth']))
-        self.canvas.mpl_connect('scroll_event', lambda event: lib.tools.mapZoom(event, self.canvas))
+    def drawMap(self, event=''):
+        ''' Show the map of the selected region. Each region is drawn once
+            into its own figure and canvas; switching back to a region only
+            repacks its frame. '''
+        if(self.view is not None): self.view.frame.pack_forget()
+        name = self.frame_selection_value.get()
+        mode = self.frame_mode_value.get()
+        if((name, mode) not in self.views): self.views[(name, mode)] = RegionView(self.frame_data, self.regions[name], mode=mode, **self.mapOptions)
+        self.view = self.views[(name, mode)]
+        self.view.frame.pack(side=tk.BOTTOM, fill=tk.BOTH, expand=True)
 
 
 
@@ -129,6 +132,58 @@ class Interface():
 
 
 
+##################
+## Region map
+##################
+class RegionView():
+    ''' Figure, canvas and toolbar of one region, drawn either as tracks (a
+        single lib.render.TrackCollection) or as a point density raster
+        (lib.heatmap.DensityMap), with the clicked track highlighted by
+        blitting (lib.render.Highlight). '''
+    modes = ('Tracks', 'Density')
+
+    def __init__(self, master, region, mode='Tracks', tileFolder=None, linewidth=1, **kwargs):
+        self.region = region
+        self.frame  = tk.Frame(master)
+        self.figure = Figure()
+        self.ax     = self.figure.add_subplot(111)
+        self.canvas = FigureCanvasTkAgg(self.figure, self.frame)
+
+        ## Tracks or density
+        if(mode == 'Density'):
+            self.layer = lib.heatmap.DensityMap(region, folder=tileFolder)
+            xMin, xMax, yMin, yMax = self.layer.getExtent()
+        else:
+            self.layer = lib.render.TrackCollection(region.activities, colors='C0', linewidths=linewidth, **kwargs)
+            self.ax.add_collection(self.layer.collection)
+            xMin, xMax, yMin, yMax = self.layer.getExtent()
+        self.ax.set_xlim(xMin, xMax)
+        self.ax.set_ylim(yMin, yMax)
+        self.ax.set_aspect('equal', adjustable='datalim')
+        if(mode == 'Density'):
+            self.layer.plot(self.ax)
+            self.ax.callbacks.connect('ylim_changed', self.layer.update)
+        self.ax.callbacks.connect('xlim_changed', self.layer.update)
+        self.highlight = lib.render.Highlight(self.ax)
+
+        ## Widgets
+        self.toolbar = NavigationToolbar2Tk(self.canvas, self.frame)
+        self.toolbar.update()
+        self.canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        self.canvas.mpl_connect('button_press_event', self.click)
+        self.canvas.mpl_connect('scroll_event', lambda event: lib.render.mapZoom(event, self.canvas, ax=self.ax))
+        self.canvas.draw()
+
+    def click(self, event):
+        ''' Highlight the track nearest to a left click. '''
+        if(self.toolbar.mode or event.button != 1 or event.inaxes is not self.ax): return False
+        aIx = lib.tools.findNearestActivity(event.xdata, event.ydata, self.region.activities, self.region.getSegmentIndex())
+        if(aIx is None): return False
+        self.highlight.show(self.region.activities[aIx].getPositions(), self.region.activities[aIx].getName())
+        return True
+
+
+
 ##################
 ## Style
 ##################
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+
+## Dependancies
+#Packages
+import numpy as np
+
+
+###############################################################################
+## Vectorized kinematics
+###############################################################################
+def segmentLengths(positions):
+    ''' Length of each of the n-1 segments of an (n,2) track. '''
+    positions = np.asarray(positions, dtype=float)
+    if(len(positions) < 2): return np.zeros(0)
+    deltas = np.diff(positions[:,:2], axis=0)
+    return np.hypot(deltas[:,0], deltas[:,1])
+
+def cumulativeLength(positions):
+    ''' Distance travelled at each of the n points of a track, from 0. '''
+    lengths = np.zeros(max(len(positions), 1))
+    np.cumsum(segmentLengths(positions), out=lengths[1:])
+    return lengths[:len(positions)]
+
+def totalLength(positions):
+    return float(segmentLengths(positions).sum())
+
+def speeds(positions, time):
+    ''' Speed (m/s) over each segment, with segments of zero or negative
+        duration set to 0. The last speed is repeated so that there is one
+        value per point. '''
+    lengths = segmentLengths(positions)
+    if(len(lengths) == 0): return np.zeros(len(positions))
+    dt = np.diff(np.asarray(time, dtype=float))
+    values = np.zeros(len(lengths)+1)
+    np.divide(lengths, dt, out=values[:-1], where=dt > 0)
+    values[-1] = values[-2]
+    return values
+
+def paces(speeds):
+    ''' Pace (s/km) from speeds (m/s); NaN where not moving. '''
+    speeds = np.asarray(speeds, dtype=float)
+    values = np.full(len(speeds), np.nan)
+    np.divide(1000.0, speeds, out=values, where=speeds > 0)
+    return values
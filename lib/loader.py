@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+
+## Dependancies
+#Native
+import os, sys, time, json, zipfile, warnings
+from datetime import datetime
+from xml.etree.ElementTree import ParseError
+from xml.parsers.expat import ExpatError
+from concurrent.futures import ProcessPoolExecutor, as_completed
+#Internal
+import lib.tools
+import lib.archives
+import lib.timings
+
+
+###############################################################################
+## Activity loading
+###############################################################################
+def acceptActivityType(activityType, activityTypes):
+    ''' Check an activity type against the configured list of types. '''
+    return activityType is not None and activityType.lower().replace('_',' ') in activityTypes
+
+def loadPayload(filename, activityTypes, batch=False, maxFileSize=0):
+    ''' Worker: parse one file and return its activity type, compact payload,
+        error and timings. The payload is None if the activity type is
+        filtered out, so that rejected activities never leave the worker.
+
+        In batch mode, files that are larger than maxFileSize (bytes, 0 for no
+        limit), malformed, without positions or without times are not raised
+        but returned as an error (see ErrorReport.describe).
+
+        The timings (see lib.timings.measure) also hold the point count, the
+        worker pid and the time spent in each lib.timings section. '''
+    record = {'pid': os.getpid(), 'points': 0}
+    lib.timings.resetSections()
+    with lib.timings.measure(record):
+        try:
+            if(maxFileSize and lib.archives.signature(filename)[0] > maxFileSize):
+                raise lib.tools.ActivityError('oversized', 'File larger than '+str(maxFileSize)+' bytes')
+            activity = lib.tools.activityFormats[lib.archives.activityExtension(filename)](filename)
+            record['points'] = len(activity)
+            if(not acceptActivityType(activity.getActivityType(), activityTypes)): result = activity.getActivityType(), None, None
+            elif(batch and len(activity) == 0): raise lib.tools.ActivityError('empty', 'No trackpoint with a position')
+            elif(batch and activity.getStartTime() is None): raise lib.tools.ActivityError('untimed', 'No trackpoint with a time')
+            else:                               result = activity.getActivityType(), activity.getPayload(), None
+        except Exception as e:
+            if(not batch): raise
+            result = None, None, e
+    record['sections'] = dict(lib.timings.sections)
+    if(result[2] is not None): result = result[:2]+(ErrorReport.describe(result[2], record['wall']),)
+    return result+(record,)
+
+
+class ErrorReport():
+    ''' Files quarantined by a batch run, with the reason and the time spent
+        on each. save() writes the report as JSON and appends a summary line
+        to a history file, to follow failure rates across runs. '''
+    def __init__(self):
+        self.entries = []
+        self.files   = 0
+        self.loaded  = 0
+        self.start   = time.time()
+
+    def __len__(self):          return len(self.entries)
+
+    @staticmethod
+    def describe(error, seconds=0.0):
+        ''' Error entry {code, reason, seconds} of an exception. '''
+        if(isinstance(error, lib.tools.ActivityError)):                 code, reason = error.code, error.reason
+        elif(isinstance(error, (ParseError, ExpatError))):                code, reason = 'malformed', 'XML error: '+str(error)
+        elif(isinstance(error, (OSError, EOFError, zipfile.BadZipFile))): code, reason = 'unreadable', type(error).__name__+': '+str(error)
+        else:                                                             code, reason = 'error', type(error).__name__+': '+str(error)
+        return {'code': code, 'reason': reason, 'seconds': round(seconds, 4)}
+
+    def add(self, filename, error, cached=False):
+        self.entries.append(dict(error, file=filename, cached=cached))
+
+    def getSummary(self):
+        codes = {}
+        for entry in self.entries: codes[entry['code']] = codes.get(entry['code'], 0)+1
+        return {'time':        datetime.now().isoformat(),
+                'files':       self.files,
+                'loaded':      self.loaded,
+                'quarantined': len(self),
+                'failureRate': round(len(self)/float(self.files), 6) if self.files else 0.0,
+                'codes':       codes,
+                'seconds':     round(time.time()-self.start, 3)}
+
+    def save(self, folder, name='ingest-report.json', history='ingest-history.jsonl'):
+        ''' Write the report to folder/name and append its summary to
+            folder/history (one JSON object per line). '''
+        if(not os.path.exists(folder)): os.makedirs(folder)
+        summary = self.getSummary()
+        with open(os.path.join(folder, name), 'w') as stream: json.dump({'summary': summary, 'quarantined': self.entries}, stream, indent=1)
+        with open(os.path.join(folder, history), 'a') as stream: stream.write(json.dumps(summary)+'\n')
+        return summary
+
+
+class Progress():
+    ''' Rewrite a single status line with the parse rate and remaining time. '''
+    def __init__(self, total, label='Parsed', stream=sys.stdout):
+        self.total  = total
+        self.label  = label
+        self.stream = stream
+        self.done   = 0
+        self.start  = time.time()
+
+    def update(self, done=1):
+        self.done += done
+        elapsed = time.time()-self.start
+        rate    = self.done/elapsed if elapsed > 0 else 0.0
+        line    = '    '+self.label+' '+str(self.done)+'/'+str(self.total)+' files ('+str(round(rate, 1))+' files/s'
+        if(rate > 0): line += ', '+str(int((self.total-self.done)/rate))+' s remaining'
+        self.stream.write('\r'+line+')   ')
+        self.stream.flush()
+
+    def close(self):
+        self.stream.write('\n')
+        self.stream.flush()
+
+
+def loadActivities(filenames, activityTypes, jobs=1, limit=0, progress=True, cache=None, lazy=False, report=None, maxFileSize=0, timings=None):
+    ''' Load the activities in filenames, keeping those of activityTypes.
+
+        jobs    Number of worker processes (1 parses in this process, 0 uses
+                every CPU).
+        limit   Keep the activities of the first limit accepted files, in
+                filename order (0 for no limit); later files are not read.
+        cache   Optional lib.cache.ActivityCache. Unchanged files are loaded
+                from it and newly parsed files are added to it.
+        lazy    Keep only the summary metadata of each activity in memory; the
+                per-point columns are reloaded when a getter needs them.
+        report  Optional ErrorReport, for batch mode: files that fail are
+                quarantined into it (and into the cache) instead of stopping
+                the run, as are files over maxFileSize bytes or without
+                positions or times. Otherwise files with positions but without
+                times are skipped with a warning.
+        timings Optional lib.timings.Timings, to which the timings of each
+                parsed file are added.
+        '''
+    activities = []
+    batch      = report is not None
+    bar        = None
+    considered = 0
+    while(considered < len(filenames) and not (limit and len(activities) >= limit)):
+        ## With a limit, only as many files as activities are still missing are
+        ## considered at a time: the activities kept are those of the first
+        ## accepted files in filename order, whatever order workers finish in
+        chunk       = filenames[considered:considered+limit-len(activities)] if limit else filenames[considered:]
+        considered += len(chunk)
+        pending     = []
+        for filename in chunk:
+            if(cache is None or cache.lookup(filename) is None):
+                pending.append(filename)
+            elif(cache.getError(filename) is not None):
+                if(batch): report.add(filename, cache.getError(filename), cached=True)
+                else:      pending.append(filename)
+            elif(acceptActivityType(cache.getActivityType(filename), activityTypes)):
+                payload = cache.getMetadata(filename) if lazy else cache.getPayload(filename)
+                ## Parsed with another trimIdle setting (see Activity.findRemoveExessivePauses)
+                if(payload is None or (payload.get('pauses') or {}).get('trimmed') != lib.tools.trimIdle): pending.append(filename)
+                else:                                                                                     keepActivity(activities, rebuildActivity(filename, payload, lazy, cache))
+
+        if(progress and pending):
+            if(bar is None): bar = Progress(0)
+            bar.total += len(pending)
+        for filename, activityType, payload, error, record in parsePayloads(pending, activityTypes, jobs, batch, maxFileSize):
+            if(timings is not None): timings.addFile(filename, record)
+            if(cache is not None): cache.put(filename, activityType, payload, error)
+            if(error is not None):     report.add(filename, error)
+            elif(payload is not None): keepActivity(activities, rebuildActivity(filename, payload, lazy, cache))
+            if(bar): bar.update()
+    if(bar): bar.close()
+    if(cache is not None): cache.save()
+    if(batch):
+        report.files  += considered
+        report.loaded += len(activities)
+
+    ## Keep the order of filenames whatever the source of each activity
+    order = {filename: ix for ix, filename in enumerate(filenames)}
+    activities.sort(key=lambda activity: order[activity.getName()])
+    return activities
+
+def keepActivity(activities, activity):
+    ''' Append activity to activities unless it has positions but no start
+        time, which statistics and tables cannot place (batch mode quarantines
+        these in loadPayload). '''
+    if(len(activity) and activity.getStartTime() is None):
+        warnings.warn('Skipping '+activity.getName()+': no trackpoint with a time')
+    else:
+        activities.append(activity)
+
+def parsePayloads(filenames, activityTypes, jobs=1, batch=False, maxFileSize=0):
+    ''' Yield (filename, activityType, payload, error, timings) for each
+        file, in completion order, parsing over a pool of jobs processes. '''
+    if(jobs == 1):
+        for filename in filenames:
+            yield (filename,)+loadPayload(filename, activityTypes, batch, maxFileSize)
+        return
+    with ProcessPoolExecutor(max_workers=jobs or None) as executor:
+        futures = {executor.submit(loadPayload, filename, activityTypes, batch, maxFileSize): filename for filename in filenames}
+        try:
+            for future in as_completed(futures):
+                yield (futures[future],)+future.result()
+        finally:
+            for future in futures: future.cancel()
+
+def rebuildActivity(filename, payload, lazy=False, cache=None):
+    activity = lib.tools.activityFormats[lib.archives.activityExtension(filename)].fromPayload(payload)
+    activity.filename = filename
+    if(lazy): activity.unloadColumns(cache)
+    return activity
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+
+## Dependancies
+#Native
+from xml.etree.ElementTree import iterparse
+#Packages
+import numpy as np
+#Internal
+import lib.timestamps
+
+## Bump whenever the parsed output changes, so that cached activities are
+## parsed again (see lib.cache).
+version = 10
+
+
+###############################################################################
+## Streaming XML parsers
+###############################################################################
+class TrackBuffer():
+    ''' Preallocated NumPy columns filled one trackpoint at a time. Missing
+        values stay NaN. Capacity doubles whenever the buffer is full. '''
+    def __init__(self, columns, capacity=4096):
+        self.columns  = {name: np.full(capacity, np.nan) for name in columns}
+        self.capacity = capacity
+        self.size     = 0
+        self.row      = {}
+
+    def __len__(self):          return self.size
+
+    def set(self, name, value):
+        self.row[name] = value
+
+    def commit(self):
+        ''' Push the current row into the columns. '''
+        if(self.size == self.capacity):
+            self.capacity *= 2
+            for name in self.columns:
+                column = np.full(self.capacity, np.nan)
+                column[:self.size] = self.columns[name][:self.size]
+                self.columns[name] = column
+        for name in self.row:
+            self.columns[name][self.size] = self.row[name]
+        self.size += 1
+        self.row = {}
+
+    def finalize(self):
+        ''' Return the filled part of each column, trimmed to size. '''
+        return {name: self.columns[name][:self.size].copy() for name in self.columns}
+
+
+class TimeColumn():
+    ''' Raw timestamps of a TrackBuffer, decoded in one batch once parsed. '''
+    def __init__(self):
+        self.rows  = []
+        self.texts = []
+
+    def set(self, row, text):
+        self.rows.append(row)
+        self.texts.append(text.strip())
+
+    def finalize(self, size, start=None):
+        ''' Seconds since start (by default the first timestamp) for each of
+            size rows, and the start in epoch seconds. '''
+        column = np.full(size, np.nan)
+        values = lib.timestamps.parseTimestamps(self.texts)
+        if(start is None): start = values[0] if len(values) else 0.0
+        column[self.rows] = values-start
+        return column, start
+
+
+def localName(tag):
+    ''' Strip the '{namespace}' prefix from an ElementTree tag. '''
+    return tag[tag.find('}')+1:]
+
+def iterElements(source):
+    ''' Walk source with iterparse, yielding (event, element, parent).
+        Trackpoint-level elements are detached from their parent by the
+        callers once read, so memory stays bounded by a single trackpoint. '''
+    stack = []
+    for event, elem in iterparse(source, events=('start', 'end')):
+        if(event == 'start'):
+            stack.append(elem)
+            yield event, elem, stack[-2] if len(stack) > 1 else None
+        else:
+            stack.pop()
+            yield event, elem, stack[-1] if stack else None
+
+def childText(elem, name):
+    ''' Return the text of the first descendant of elem with local name. '''
+    for child in elem.iter():
+        if(localName(child.tag) == name): return child.text
+    return None
+
+def childTexts(elem):
+    ''' Return {local name: text} of the first descendant of elem with each
+        local name, in a single walk of the trackpoint. '''
+    texts = {}
+    for child in elem.iter():
+        name = localName(child.tag)
+        if(name not in texts): texts[name] = child.text
+    return texts
+
+## Optional sensor channels: parser column and the trackpoint elements (local
+## names, first match wins) it is read from
+tcxSensors = (('hr', ('Value',)), ('cadence', ('Cadence', 'RunCadence')), ('power', ('Watts',)), ('speed', ('Speed',)))
+gpxSensors = (('hr', ('hr',)), ('cadence', ('cad', 'cadence')), ('power', ('power', 'PowerInWatts')), ('speed', ('speed',)))
+
+def setSensors(track, texts, sensors):
+    ''' Set the sensor channels found in texts (see childTexts). '''
+    for column, names in sensors:
+        for name in names:
+            if(texts.get(name) is not None):
+                track.set(column, float(texts[name]))
+                break
+
+
+def parseTCX(source):
+    ''' Parse every lap of the first activity of a TCX file in one pass.
+
+        Returns a dictionary of activity metadata (totals over all laps) plus
+        'lat', 'lon', 'alt', 'time' (seconds since the first lap start) and
+        sensor ('hr', 'cadence', 'power', 'speed', NaN where missing) columns
+        holding the trackpoints of all laps back to back, and
+        'laps' (see Activity.getLaps): the offsets of each lap into these
+        columns and its own start, duration, distance and calories.
+        Trackpoints without a position are skipped. '''
+    track  = TrackBuffer(['lat', 'lon', 'alt', 'hr', 'cadence', 'power', 'speed'])
+    times  = TimeColumn()
+    laps   = {'offsets': [], 'startTime': [], 'duration': [], 'distance': [], 'calories': []}
+    result = {'activityType': None, 'calories': 0, 'startTime': None, 'duration': 0, 'distance': 0}
+    activities = 0
+    for event, elem, parent in iterElements(source):
+        tag = localName(elem.tag)
+        if(event == 'start'):
+            if(tag == 'Activity'):
+                activities += 1
+                if(activities == 1): result['activityType'] = elem.attrib.get('Sport')
+            elif(tag == 'Lap' and activities == 1):
+                laps['offsets'].append(len(track))
+                laps['startTime'].append(lib.timestamps.parseTimestamp(elem.attrib['StartTime']))
+                for name in ('duration', 'distance', 'calories'): laps[name].append(0)
+            continue
+        if(activities != 1 or not laps['offsets']):
+            if(tag == 'Trackpoint'): parent.remove(elem)
+            continue
+        if(tag == 'Trackpoint'):
+            texts = childTexts(elem)
+            if(texts.get('LatitudeDegrees') is not None and texts.get('LongitudeDegrees') is not None):
+                track.set('lat', float(texts['LatitudeDegrees']))
+                track.set('lon', float(texts['LongitudeDegrees']))
+                if(texts.get('AltitudeMeters') is not None): track.set('alt', float(texts['AltitudeMeters']))
+                if(texts.get('Time') is not None): times.set(len(track), texts['Time'])
+                setSensors(track, texts, tcxSensors)
+                track.commit()
+            parent.remove(elem)
+        elif(parent is not None and localName(parent.tag) == 'Lap'):
+            if(tag == 'Calories'):           laps['calories'][-1] = int(elem.text)
+            elif(tag == 'TotalTimeSeconds'): laps['duration'][-1] = float(elem.text)
+            elif(tag == 'DistanceMeters'):   laps['distance'][-1] = float(elem.text)
+    start = laps['startTime'][0] if laps['offsets'] else None
+    result.update(track.finalize())
+    result['time'], start = times.finalize(len(track), start)
+    result['startTime']   = lib.timestamps.toDatetime(start)
+    result['calories']    = sum(laps['calories'])
+    result['duration']    = int(sum(laps['duration']))
+    result['distance']    = int(sum(laps['distance']))
+    laps['offsets'].append(len(track))
+    laps['startTime']     = [float(lapStart-start) for lapStart in laps['startTime']]
+    result['laps']        = laps
+    return result
+
+
+def parseGPX(source):
+    ''' Parse every trkpt of a GPX file in one pass.
+
+        Returns a dictionary with 'startTime', 'duration' and 'lat', 'lon',
+        'alt', 'time' (seconds since first point) and sensor columns holding the
+        points of all tracks back to back, and 'laps' with the offsets of each
+        track segment into these columns. '''
+    track   = TrackBuffer(['lat', 'lon', 'alt', 'hr', 'cadence', 'power', 'speed'])
+    times   = TimeColumn()
+    offsets = []
+    result  = {'startTime': None, 'duration': 0}
+    for event, elem, parent in iterElements(source):
+        if(localName(elem.tag) == 'trkseg'):
+            if(event == 'start'): offsets.append(len(track))
+            continue
+        if(event != 'end' or localName(elem.tag) != 'trkpt'): continue
+        track.set('lat', float(elem.attrib['lat']))
+        track.set('lon', float(elem.attrib['lon']))
+        texts = childTexts(elem)
+        if(texts.get('ele') is not None): track.set('alt', float(texts['ele']))
+        if(texts.get('time') is not None): times.set(len(track), texts['time'])
+        setSensors(track, texts, gpxSensors)
+        track.commit()
+        parent.remove(elem)
+    result.update(track.finalize())
+    result['time'], start = times.finalize(len(track))
+    if(times.rows):
+        result['startTime'] = lib.timestamps.toDatetime(start)
+        result['duration']  = int(result['time'][times.rows[-1]])
+    ## Drop empty segments; points outside any segment form one of their own
+    offsets = sorted(set([0]+[offset for offset in offsets if offset < len(track)]))
+    result['laps'] = {'offsets': offsets+[len(track)]}
+    return result
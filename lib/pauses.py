@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+## Dependancies
+#Packages
+import numpy as np
+
+
+###############################################################################
+## Pause detection
+###############################################################################
+## A stretch is stationary when the straight line distance covered over at
+## least minDwell seconds is below minSpeed (m/s), which ignores GPS jitter
+## around a standing point. Gaps between samples longer than maxGap seconds
+## (auto-pause, lost signal) are pauses whatever the distance.
+minSpeed = 0.5
+minDwell = 20.0
+maxGap   = 30.0
+
+
+def findPauses(positions, time, speed=None, dwell=None, gap=None):
+    ''' Boolean mask of the n-1 segments of an (n,2) track spent paused:
+        within a stationary stretch or across a gap (see minSpeed, minDwell
+        and maxGap for the defaults). '''
+    positions = np.asarray(positions, dtype=float)
+    time      = np.asarray(time, dtype=float)
+    speed     = minSpeed if speed is None else speed
+    dwell     = minDwell if dwell is None else dwell
+    gap       = maxGap if gap is None else gap
+    if(len(time) < 2): return np.zeros(max(len(time)-1, 0), dtype=bool)
+    dt        = np.maximum(np.diff(time), 0.0)
+    ## Time axis with gaps capped, so that windows do not span long gaps
+    active    = np.concatenate([[0.0], np.cumsum(np.minimum(dt, gap))])
+    ## Window from each point to the first point dwell seconds later
+    starts    = np.arange(len(time))
+    ends      = np.searchsorted(active, active+dwell, side='left')
+    valid     = ends < len(time)
+    starts, ends = starts[valid], ends[valid]
+    deltas    = positions[ends,:2]-positions[starts,:2]
+    still     = np.hypot(deltas[:,0], deltas[:,1]) < speed*(active[ends]-active[starts])
+    ## Mark the segments covered by every still window: +1 at its first
+    ## segment, -1 past its last one
+    marks     = np.bincount(starts[still], minlength=len(time))-np.bincount(ends[still], minlength=len(time))
+    return (np.cumsum(marks)[:-1] > 0) | (dt > gap)
+
+def pauseIntervals(paused):
+    ''' Return (starts, stops), the point indices at which each run of paused
+        segments begins and ends. '''
+    edges = np.diff(np.concatenate([[0], np.asarray(paused, dtype=np.int8), [0]]))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+def movingRange(paused):
+    ''' Point indices (first, last) of the track without its leading and
+        trailing paused segments; (0, 0) if never moving. '''
+    moving = np.flatnonzero(~np.asarray(paused, dtype=bool))
+    if(len(moving) == 0): return 0, 0
+    return int(moving[0]), int(moving[-1])+1
+
+def summarizePauses(positions, time, speed=None, dwell=None, gap=None):
+    ''' Pause summary of a track (see Activity.getPauses): elapsed and moving
+        time, number of pauses and time paused, idle time at both ends and the
+        (first, last) points of the track without them. '''
+    time    = np.asarray(time, dtype=float)
+    paused  = findPauses(positions, time, speed, dwell, gap)
+    dt      = np.maximum(np.diff(time), 0.0) if len(time) > 1 else np.zeros(0)
+    starts, stops = pauseIntervals(paused)
+    first, last   = movingRange(paused)
+    elapsed = float(time[-1]-time[0]) if len(time) else 0.0
+    moving  = float(dt[~paused].sum())
+    return {'elapsedTime': elapsed,
+            'movingTime':  moving,
+            'pausedTime':  elapsed-moving,
+            'count':       len(starts),
+            'idleStart':   float(time[first]-time[0]) if len(time) else 0.0,
+            'idleEnd':     float(time[-1]-time[last]) if len(time) else 0.0,
+            'first':       first,
+            'last':        last}
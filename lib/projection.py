@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+
+## Dependancies
+#Native
+import time
+#Packages
+import numpy as np
+try:    import pyproj
+except ImportError: pyproj = None
+
+
+###############################################################################
+## Vectorized UTM projection
+###############################################################################
+## Projection engine: 'numpy' (same series as the utm package) or 'pyproj'
+engine = 'numpy'
+
+## WGS84 ellipsoid and UTM constants, as used by utm.from_latlon
+ZONE_LETTERS = 'CDEFGHJKLMNPQRSTUVWXX'
+K0   = 0.9996
+E    = 0.00669438
+E2   = E*E
+E3   = E2*E
+E_P2 = E/(1.0-E)
+M1   = (1-E/4-3*E2/64-5*E3/256)
+M2   = (3*E/8+3*E2/32+45*E3/1024)
+M3   = (15*E2/256+45*E3/1024)
+M4   = (35*E3/3072)
+R    = 6378137
+
+
+def getZone(lat, lon):
+    ''' UTM zone (number, letter) of a single point, as utm.from_latlon,
+        including the Norway and Svalbard exceptions. '''
+    lat, lon = float(lat), (float(lon) % 360+540) % 360-180
+    if(56 <= lat < 64 and 3 <= lon < 12):  number = 32
+    elif(72 <= lat <= 84 and 0 <= lon < 42): number = 31+2*int((lon+3)/12)
+    else:                                    number = int((lon+180)/6)+1
+    return number, ZONE_LETTERS[int(lat+80) >> 3] if -80 <= lat <= 84 else None
+
+def fromLatLon(lat, lon, zoneNumber=None, zoneLetter=None, engine=None):
+    ''' Project whole arrays of latitudes and longitudes to UTM.
+
+        All points are projected in the same zone, by default the zone of the
+        first point. Returns an (n,2) array of easting and northing. '''
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    if(len(lat) == 0): return np.zeros((0, 2))
+    if(zoneNumber is None): zoneNumber, zoneLetter = getZone(lat[0], lon[0])
+    northern = zoneLetter is None or zoneLetter.upper() >= 'N'
+    if(engine is None): engine = globals()['engine']
+    if(engine == 'pyproj'): return fromLatLonPyproj(lat, lon, zoneNumber, northern)
+    elif(engine == 'numpy'): return fromLatLonNumpy(lat, lon, zoneNumber, northern)
+    else: raise Exception('Unknown projection engine: '+str(engine))
+
+def fromLatLonNumpy(lat, lon, zoneNumber, northern=True):
+    latRad = np.radians(lat)
+    latSin = np.sin(latRad)
+    latCos = np.cos(latRad)
+    latTan = latSin/latCos
+    latTan2 = latTan*latTan
+    latTan4 = latTan2*latTan2
+
+    centralLon = np.radians((zoneNumber-1)*6-180+3)
+    n  = R/np.sqrt(1-E*latSin**2)
+    c  = E_P2*latCos**2
+    a  = latCos*((np.radians(lon)-centralLon+np.pi) % (2*np.pi)-np.pi)
+    a2 = a*a
+    a3 = a2*a
+    a4 = a3*a
+    a5 = a4*a
+    a6 = a5*a
+    m  = R*(M1*latRad-M2*np.sin(2*latRad)+M3*np.sin(4*latRad)-M4*np.sin(6*latRad))
+
+    positions = np.empty((len(latRad), 2))
+    positions[:,0] = K0*n*(a+a3/6*(1-latTan2+c)+a5/120*(5-18*latTan2+latTan4+72*c-58*E_P2))+500000
+    positions[:,1] = K0*(m+n*latTan*(a2/2+a4/24*(5-latTan2+9*c+4*c**2)+a6/720*(61-58*latTan2+latTan4+600*c-330*E_P2)))
+    if(not northern): positions[:,1] += 10000000
+    return positions
+
+def fromLatLonPyproj(lat, lon, zoneNumber, northern=True):
+    if(pyproj is None): raise Exception('The pyproj projection engine requires the pyproj package.')
+    proj = pyproj.Proj(proj='utm', zone=zoneNumber, ellps='WGS84', south=not northern)
+    positions = np.empty((len(lat), 2))
+    positions[:,0], positions[:,1] = proj(lon, lat)
+    return positions
+
+
+def benchmark(points=100000, repeat=3):
+    ''' Print the projection rate (points/s) of the scalar utm path and of
+        each available vectorized engine. '''
+    lat = 45.5+np.random.random(points)*0.1
+    lon = -73.6+np.random.random(points)*0.1
+    import utm
+    engines = ['numpy']+(['pyproj'] if pyproj is not None else [])
+    start = time.time()
+    for ix in range(min(points, 10000)): utm.from_latlon(lat[ix], lon[ix])
+    print('scalar utm: '+str(int(min(points, 10000)/(time.time()-start)))+' points/s')
+    for name in engines:
+        best = None
+        for _ in range(repeat):
+            start = time.time()
+            fromLatLon(lat, lon, engine=name)
+            elapsed = time.time()-start
+            if(best is None or elapsed < best): best = elapsed
+        print(name+': '+str(int(points/best))+' points/s')
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+## Dependancies
+#Packages
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from PIL import Image
+#Internal
+import lib.tools
+import lib.projection
+
+
+###############################################################################
+## Map rendering
+###############################################################################
+class TrackCollection():
+    ''' The UTM tracks of a list of activities drawn as a single LineCollection.
+
+        Every track is copied once into one contiguous (n,2) buffer indexed by
+        offsets; the segments handed to the collection are views into that
+        buffer, or into a gather of it for the coarser levels of detail. '''
+    def __init__(self, activities, **kwargs):
+        self.activities = activities
+        tracks, self.levels = [], []
+        for activity in activities:
+            with activity.loadedColumns():
+                tracks.append(np.asarray(activity.getPositions(), dtype=float).reshape(-1, 2))
+                self.levels.append(activity.getLevels())
+        self.offsets = np.concatenate([[0], np.cumsum([len(track) for track in tracks])]).astype(np.int64)
+        self.buffer  = np.concatenate(tracks) if tracks else np.zeros((0, 2))
+        self.buffers = {}
+        self.key     = None
+        self.collection = LineCollection(self.getSegments(), **kwargs)
+
+    def __len__(self):          return len(self.activities)
+
+    def getTrack(self, ix):
+        ''' Full detail positions of activity ix (a view into the buffer). '''
+        return self.buffer[self.offsets[ix]:self.offsets[ix+1]]
+
+    def getExtent(self):
+        ''' (xMin, xMax, yMin, yMax) of all tracks. '''
+        if(len(self.buffer) == 0): return (0.0, 1.0, 0.0, 1.0)
+        low, high = self.buffer.min(axis=0), self.buffer.max(axis=0)
+        return (low[0], high[0], low[1], high[1])
+
+    def getSegments(self, resolution=None):
+        ''' One (n,2) view per track at resolution (m per pixel), full detail
+            by default. Gathered buffers are kept per selection of levels. '''
+        key = tuple(levels.select(resolution) for levels in self.levels) if resolution is not None else None
+        self.key = key
+        if(key is None or all(level is None for level in key)): buffer, offsets = self.buffer, self.offsets
+        else:
+            if(key not in self.buffers):
+                indices = [self.offsets[ix]+(np.arange(self.offsets[ix+1]-self.offsets[ix]) if level is None else self.levels[ix].indices[level]) for ix, level in enumerate(key)]
+                self.buffers[key] = (self.buffer[np.concatenate(indices)] if indices else np.zeros((0, 2)),
+                                     np.concatenate([[0], np.cumsum([len(ix) for ix in indices])]).astype(np.int64))
+            buffer, offsets = self.buffers[key]
+        return [buffer[offsets[ix]:offsets[ix+1]] for ix in range(len(offsets)-1)]
+
+    def update(self, ax):
+        ''' Switch the collection to the level of detail of the axes extent
+            (one level per pixel). Return True if the segments changed. '''
+        resolution = abs(ax.get_xlim()[1]-ax.get_xlim()[0])/max(ax.bbox.width, 1.0)
+        key = tuple(levels.select(resolution) for levels in self.levels)
+        if(key == self.key): return False
+        self.collection.set_segments(self.getSegments(resolution))
+        return True
+
+
+class Highlight():
+    ''' One track and its label overlaid on the axes with blitting.
+
+        The axes background is cached on every full draw, so showing another
+        track only restores that background and draws the two animated
+        artists, instead of redrawing the whole figure. '''
+    def __init__(self, ax, color='#eb3c15', fontsize=12, **kwargs):
+        self.ax         = ax
+        self.canvas     = ax.figure.canvas
+        self.background = None
+        self.line,      = ax.plot([], [], color=color, zorder=100, animated=True, visible=False, **kwargs)
+        self.label      = ax.text(0, 0, '', fontsize=fontsize, zorder=101, animated=True, visible=False)
+        self.canvas.mpl_connect('draw_event', self.onDraw)
+
+    def onDraw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.drawArtists()
+
+    def drawArtists(self):
+        self.ax.draw_artist(self.line)
+        self.ax.draw_artist(self.label)
+
+    def show(self, positions, name):
+        ''' Highlight the (n,2) positions of one track, labelled name at its
+            first point. '''
+        self.line.set_data(positions[:,0], positions[:,1])
+        if(len(positions)): self.label.set_position((positions[0,0], positions[0,1]))
+        self.label.set_text(name)
+        self.line.set_visible(True)
+        self.label.set_visible(len(positions) > 0)
+        self.blit()
+
+    def hide(self):
+        self.line.set_visible(False)
+        self.label.set_visible(False)
+        self.blit()
+
+    def blit(self):
+        ## Without a cached background, a full draw caches one (see onDraw)
+        if(self.background is None): return self.canvas.draw()
+        self.canvas.restore_region(self.background)
+        self.drawArtists()
+        self.canvas.blit(self.ax.bbox)
+
+
+###############################################################################
+## Background maps and interaction
+###############################################################################
+class Map():
+    def __init__(self, filename, originLat, originLong, scale, region):
+        self.filename   = filename
+        self.originLat  = originLat
+        self.originLong = originLong
+        self.scale      = scale          ## px/m
+        self.region     = region
+        self.load()
+
+    def load(self):
+        self.img = Image.open(self.filename)
+        self.img = self.img.resize((int(self.img.size[0]/self.scale),int(self.img.size[1]/self.scale)), Image.LANCZOS)
+
+    def getExtent(self):
+        ''' UTM extent [xMin, xMax, yMin, yMax] of the image. '''
+        x,y = lib.projection.fromLatLon([self.originLat],[self.originLong])[0]
+        return [x,x+self.img.size[0],y,y+self.img.size[1]]
+
+    def plot(self, ax=None):
+        if(ax is None): ax = plt.gca()
+        return ax.imshow(self.img, extent=self.getExtent(), interpolation='bicubic')
+
+
+def mapZoom(event, canvas, base_scale=2., ax=None):
+    ''' https://stackoverflow.com/questions/11551049/matplotlib-plot-zooming-with-scroll-wheel. '''
+    if(ax is None): ax = plt.gca()
+    if(event.xdata is None): return False
+    # get the current x and y limits
+    cur_xlim = ax.get_xlim()
+    cur_ylim = ax.get_ylim()
+    cur_xrange = (cur_xlim[1] - cur_xlim[0])*.5
+    cur_yrange = (cur_ylim[1] - cur_ylim[0])*.5
+    xdata = event.xdata # get event x location
+    ydata = event.ydata # get event y location
+    if event.button == 'up':
+        # deal with zoom in
+        scale_factor = 1/base_scale
+    elif event.button == 'down':
+        # deal with zoom out
+        scale_factor = base_scale
+    else:
+        # deal with something that should never happen
+        scale_factor = 1
+        print(event.button)
+    # set new limits
+    ax.set_xlim([xdata - cur_xrange*scale_factor,
+                 xdata + cur_xrange*scale_factor])
+    ax.set_ylim([ydata - cur_yrange*scale_factor,
+                 ydata + cur_yrange*scale_factor])
+    canvas.draw()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+
+## Dependancies
+#Packages
+import numpy as np
+#Internal
+import lib.kinematics
+import lib.projection
+import lib.spatial
+
+
+###############################################################################
+## Route and segment matching
+###############################################################################
+## Activities whose tracks stay within threshold metres of each other (see
+## trackDistance) follow the same route. Tracks are compared resampled every
+## spacing metres, with at most maxPoints points (longer tracks use a larger
+## spacing), so that comparisons cost the same whatever the sampling rate.
+threshold = 50.0
+spacing   = 25.0
+maxPoints = 1000
+## Candidate routes must have a length within this fraction of the activity's
+lengthTolerance = 0.15
+## Points of a track checked against a candidate before the full distance
+probes    = 16
+
+
+def resample(positions, time, spacing=None, maxPoints=None):
+    ''' Points (k,2) and times (k) every spacing metres along an (n,2) track,
+        interpolated on the cumulative distance; the last point is kept. '''
+    spacing   = globals()['spacing'] if spacing is None else spacing
+    maxPoints = globals()['maxPoints'] if maxPoints is None else maxPoints
+    positions = np.asarray(positions, dtype=float)
+    if(len(positions) < 2): return positions[:,:2].copy(), np.asarray(time, dtype=float).copy()
+    cumulative = lib.kinematics.cumulativeLength(positions)
+    spacing    = max(spacing, cumulative[-1]/max(maxPoints-1, 1))
+    targets    = np.arange(0.0, cumulative[-1], spacing) if cumulative[-1] > 0 else np.zeros(1)
+    targets    = np.append(targets, cumulative[-1])
+    points     = np.stack([np.interp(targets, cumulative, positions[:,0]), np.interp(targets, cumulative, positions[:,1])], axis=1)
+    return points, np.interp(targets, cumulative, np.asarray(time, dtype=float))
+
+def resampleActivity(activity, spacing=None, maxPoints=None):
+    ''' Resampled track of an activity (see resample), read from the cache the
+        activity was loaded from, if any, or computed and stored there. '''
+    spacing   = globals()['spacing'] if spacing is None else spacing
+    maxPoints = globals()['maxPoints'] if maxPoints is None else maxPoints
+    arrays    = activity.source.getDerived(activity.getName(), 'resampled') if activity.source is not None else None
+    if(arrays is not None and list(arrays['settings']) == [spacing, maxPoints]): return arrays['points'], arrays['times']
+    with activity.loadedColumns(): points, times = resample(activity.getPositions(), activity.getTimes(), spacing, maxPoints)
+    if(activity.source is not None): activity.source.putDerived(activity.getName(), 'resampled', {'points': points, 'times': times, 'settings': np.array([spacing, maxPoints], dtype=float)})
+    return points, times
+
+
+def pairwiseDistances(a, b):
+    ''' (n,m) distances between the points of a and b. '''
+    deltas = a[:,np.newaxis,:2]-b[np.newaxis,:,:2]
+    return np.hypot(deltas[...,0], deltas[...,1])
+
+## Points of a compared at a time by hausdorff(), between limit checks
+hausdorffBlock = 64
+
+def hausdorff(a, b, limit=None):
+    ''' Symmetric Hausdorff distance between the points of a and b, a block
+        of points of a at a time. With limit, stops as soon as a point of a is
+        further than it from b and returns a lower bound. '''
+    nearest = np.full(len(b), np.inf)
+    result  = 0.0
+    for start in range(0, len(a), hausdorffBlock):
+        distances = pairwiseDistances(a[start:start+hausdorffBlock], b)
+        result    = max(result, distances.min(axis=1).max())
+        nearest   = np.minimum(nearest, distances.min(axis=0))
+        if(limit is not None and result > limit): return float(result)
+    return float(max(result, nearest.max()))
+
+def frechet(a, b, limit=None):
+    ''' Discrete Frechet distance between the point sequences a and b, one
+        anti-diagonal of the coupling table at a time. With limit, stops as
+        soon as every coupling exceeds it and returns a lower bound. '''
+    distances = pairwiseDistances(a, b)
+    n, m      = distances.shape
+    coupling  = np.full((n, m), np.inf)
+    coupling[0,0] = distances[0,0]
+    for k in range(1, n+m-1):
+        i    = np.arange(max(0, k-m+1), min(n, k+1))
+        j    = k-i
+        best = np.full(len(i), np.inf)
+        up, left, diagonal = i > 0, j > 0, (i > 0) & (j > 0)
+        best[up]       = coupling[i[up]-1, j[up]]
+        best[left]     = np.minimum(best[left], coupling[i[left], j[left]-1])
+        best[diagonal] = np.minimum(best[diagonal], coupling[i[diagonal]-1, j[diagonal]-1])
+        coupling[i,j]  = np.maximum(distances[i,j], best)
+        if(limit is not None and coupling[i,j].min() > limit): return float(coupling[i,j].min())
+    return float(coupling[-1,-1])
+
+metrics = {'frechet': frechet, 'hausdorff': hausdorff}
+
+def trackDistance(a, b, metric='frechet', limit=None):
+    ''' Distance between two resampled tracks, or a lower bound above limit
+        when cheaper checks already exceed it: the start and end points (for
+        Frechet) and a few probe points of each track. '''
+    if(limit is not None):
+        if(metric == 'frechet' and max(np.hypot(*(a[0]-b[0])), np.hypot(*(a[-1]-b[-1]))) > limit): return np.inf
+        for first, second in ((a, b), (b, a)):
+            probe = first[np.linspace(0, len(first)-1, min(probes, len(first))).astype(np.int64)]
+            if(pairwiseDistances(probe, second).min(axis=1).max() > limit): return np.inf
+    return metrics[metric](a, b, limit)
+
+
+class Route():
+    ''' Activities following the same track as the first one (the reference). '''
+    def __init__(self, reference, points, zone):
+        self.reference = reference
+        self.points    = points
+        self.zone      = zone
+        self.length    = float(lib.kinematics.totalLength(points))
+        self.members   = [reference]
+
+    def __len__(self):          return len(self.members)
+
+    def getStatistics(self, activities):
+        ''' Count, reference distance, best and mean duration and moving time
+            of the activities of the route, and the index of the fastest. '''
+        durations = np.array([activities[ix].getDuration().total_seconds() for ix in self.members])
+        moving    = np.array([activities[ix].getMovingTime().total_seconds() for ix in self.members])
+        return {'count':      len(self),
+                'distance':   self.length,
+                'best':       float(durations.min()),
+                'mean':       float(durations.mean()),
+                'bestMoving': float(moving.min()),
+                'meanMoving': float(moving.mean()),
+                'fastest':    self.members[int(np.argmin(durations))]}
+
+
+class RouteIndex():
+    ''' Groups activities into routes as they are added. Each activity is only
+        compared with the reference of the routes starting within threshold
+        of its start (found on a grid of threshold sized cells, in the same
+        UTM zone) whose length is close to its own, so that the cost grows with
+        the number of routes nearby rather than the number of activities. '''
+    def __init__(self, threshold=None, metric='frechet', spacing=None, maxPoints=None):
+        self.threshold = globals()['threshold'] if threshold is None else threshold
+        self.metric    = metric
+        self.spacing   = spacing
+        self.maxPoints = maxPoints
+        self.routes    = []
+        self.cells     = {}
+        self.compared  = 0
+
+    def __len__(self):          return len(self.routes)
+
+    def cellOf(self, point, zone):
+        return (zone, int(np.floor(point[0]/self.threshold)), int(np.floor(point[1]/self.threshold)))
+
+    def candidates(self, points, zone):
+        ''' Routes that may hold the track points, nearest start first. '''
+        zoneKey, cx, cy = self.cellOf(points[0], zone)
+        length = lib.kinematics.totalLength(points)
+        found  = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for route in self.cells.get((zoneKey, cx+dx, cy+dy), []):
+                    if(abs(route.length-length) <= lengthTolerance*max(route.length, length)+self.threshold): found.append(route)
+        found.sort(key=lambda route: np.hypot(*(route.points[0]-points[0])))
+        return found
+
+    def add(self, ix, points, zone):
+        ''' File activity ix with resampled track points under the closest
+            matching route, or start a new route. Returns the route. '''
+        best, bestDistance = None, np.inf
+        for route in self.candidates(points, zone):
+            self.compared += 1
+            distance = trackDistance(points, route.points, self.metric, min(self.threshold, bestDistance))
+            if(distance <= self.threshold and distance < bestDistance): best, bestDistance = route, distance
+        if(best is not None):
+            best.members.append(ix)
+            return best
+        route = Route(ix, points, zone)
+        self.routes.append(route)
+        self.cells.setdefault(self.cellOf(points[0], zone), []).append(route)
+        return route
+
+    def addActivities(self, activities):
+        for ix, activity in enumerate(activities):
+            if(len(activity) < 2): continue
+            self.add(ix, resampleActivity(activity, self.spacing, self.maxPoints)[0], tuple(activity.UTMZone))
+        return self
+
+def findRoutes(activities, threshold=None, metric='frechet', minCount=2):
+    ''' Routes followed by at least minCount activities, most frequent first. '''
+    routes = RouteIndex(threshold, metric).addActivities(activities).routes
+    return sorted([route for route in routes if len(route) >= minCount], key=lambda route: -len(route))
+
+
+class Segment():
+    ''' User-defined segment from a start to an end point (lat, long). An
+        effort starts at the closest point of a pass within radius metres of
+        the start and ends at the closest point of the next pass near the end.
+        '''
+    def __init__(self, name, start, end, radius=25.0):
+        self.name   = name
+        self.start  = (float(start[0]), float(start[1]))
+        self.end    = (float(end[0]), float(end[1]))
+        self.radius = radius
+
+    def passes(self, positions, point):
+        ''' Index of the closest point of each pass within radius of point. '''
+        distances = np.hypot(positions[:,0]-point[0], positions[:,1]-point[1])
+        near      = distances <= self.radius
+        edges     = np.diff(np.concatenate([[0], near.astype(np.int8), [0]]))
+        starts, stops = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+        if(len(starts) == 0): return starts
+        ## Closest point of each run: offset of the minimum within the run
+        runs   = np.repeat(np.arange(len(starts)), stops-starts)
+        order  = np.lexsort((distances[near], runs))
+        firsts = np.cumsum(stops-starts)-(stops-starts)
+        return np.flatnonzero(near)[order[firsts]]
+
+    def findEfforts(self, activity):
+        ''' Efforts of an activity as a list of (seconds, metres, start offset
+            in seconds): from each pass near the end back to the last pass near
+            the start before it. '''
+        if(len(activity) < 2): return []
+        zone      = activity.UTMZone
+        start     = lib.projection.fromLatLon([self.start[0]], [self.start[1]], zone[0], zone[1])[0]
+        end       = lib.projection.fromLatLon([self.end[0]], [self.end[1]], zone[0], zone[1])[0]
+        positions = activity.getPositions()
+        starts    = self.passes(positions, start)
+        ends      = self.passes(positions, end)
+        if(len(starts) == 0 or len(ends) == 0): return []
+        previous  = np.searchsorted(starts, ends, side='left')-1
+        valid     = previous >= 0
+        starts, ends = starts[previous[valid]], ends[valid]
+        ## Keep a single effort per start pass: the first end reached
+        starts, first = np.unique(starts, return_index=True)
+        ends          = ends[first]
+        time      = activity.getTimes()
+        distance  = activity.getCumulativeDistance()
+        return [(float(time[stop]-time[begin]), float(distance[stop]-distance[begin]), float(time[begin])) for begin, stop in zip(starts, ends)]
+
+    def getStatistics(self, activities, index=None):
+        ''' Efforts over activities, only loading those whose bounding box
+            reaches both ends of the segment: count, best and mean time, and
+            the index of the activity with the best effort. '''
+        if(index is None): index = lib.spatial.ActivityIndex(activities)
+        near = lambda point: index.intersecting([point[0]-self.radius/111320.0, point[0]+self.radius/111320.0],
+                                                [point[1]-self.radius/(111320.0*np.cos(np.radians(point[0]))), point[1]+self.radius/(111320.0*np.cos(np.radians(point[0])))])
+        candidates = np.intersect1d(near(self.start), near(self.end))
+        efforts = []
+        for ix in candidates:
+            activity = activities[ix]
+            with activity.loadedColumns(): efforts += [(seconds, metres, ix) for seconds, metres, _ in self.findEfforts(activity)]
+        if(not efforts): return {'count': 0, 'best': None, 'mean': None, 'distance': None, 'fastest': None}
+        seconds = np.array([effort[0] for effort in efforts])
+        best    = int(np.argmin(seconds))
+        return {'count':    len(efforts),
+                'best':     float(seconds[best]),
+                'mean':     float(seconds.mean()),
+                'distance': float(np.median([effort[1] for effort in efforts])),
+                'fastest':  int(efforts[best][2])}
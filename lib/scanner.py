@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+## Dependancies
+#Native
+import os, json
+#Internal
+import lib.archives
+
+
+###############################################################################
+## Activity file scanning
+###############################################################################
+def scanFiles(path, extensions):
+    ''' Return {filename: (size, mtime_ns)} of the files under path (searched
+        recursively) whose extension is in extensions, in one os.scandir
+        pass. Gzipped files count by their inner extension, and the members
+        of .zip archives are listed as '<archive>!<member>': (size, CRC). '''
+    files   = {}
+    folders = [path]
+    while(folders):
+        try:              entries = os.scandir(folders.pop())
+        except OSError:   continue
+        with entries:
+            for entry in entries:
+                if(entry.is_dir(follow_symlinks=False)): folders.append(entry.path)
+                elif(lib.archives.isArchive(entry.name)): files.update(lib.archives.listMembers(entry.path, extensions))
+                elif(lib.archives.activityExtension(entry.name) in extensions):
+                    stat = entry.stat()
+                    files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+class FileManifest():
+    ''' The (size, mtime_ns) of every scanned activity file, as of the last
+        update(), optionally kept in a JSON file between runs. '''
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.files    = {}
+        if(filename is not None):
+            try:
+                with open(filename, 'r') as stream: self.files = {name: tuple(signature) for name, signature in json.load(stream).items()}
+            except (IOError, OSError, ValueError, AttributeError): pass
+
+    def __len__(self):          return len(self.files)
+
+    def diff(self, files):
+        ''' Return (added, changed, removed) filenames of files (see scanFiles)
+            relative to the manifest, sorted. '''
+        added   = sorted(name for name in files if name not in self.files)
+        changed = sorted(name for name in files if name in self.files and tuple(files[name]) != self.files[name])
+        removed = sorted(name for name in self.files if name not in files)
+        return added, changed, removed
+
+    def update(self, files):
+        ''' Record files as the current state and save the manifest. '''
+        self.files = {name: tuple(signature) for name, signature in files.items()}
+        if(self.filename is None): return
+        folder = os.path.dirname(self.filename)
+        if(folder and not os.path.exists(folder)): os.makedirs(folder)
+        with open(self.filename+'.tmp', 'w') as stream: json.dump(self.files, stream)
+        os.replace(self.filename+'.tmp', self.filename)
@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+
+## Dependancies
+#Native
+import json, asyncio, hashlib, logging, threading
+from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs, unquote
+#Packages
+import numpy as np
+#Internal
+import lib.tools
+import lib.projection
+import lib.spatial
+import lib.aggregate
+import lib.cache
+
+
+###############################################################################
+## Local query server
+###############################################################################
+## Activities whose detail arrays are kept in memory, least recently used out
+detailCacheSize = 32
+## Columns served by /activities/<id>/arrays when none are requested
+detailColumns   = ('time', 'positionsLatLong', 'altitude', 'speeds')
+## Only ever listen on the local interface
+host = '127.0.0.1'
+port = 8765
+## Threads answering requests, off the event loop
+queryThreads = 4
+
+statusLines = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+class QueryError(Exception):
+    ''' A request that cannot be answered: args[0] is [status, reason]. '''
+    def __init__(self, status, reason):
+        Exception.__init__(self, [status, reason])
+        self.status = status
+        self.reason = reason
+
+
+def activityId(activity):
+    ''' Id of an activity in the queries: a hash of its file (see
+        lib.cache.fileKey), the same across refreshes. '''
+    return hashlib.sha1(lib.cache.fileKey(activity.getName()).encode('utf-8')).hexdigest()[:16]
+
+
+class DetailCache():
+    ''' Per-point columns of the most recently requested activities, at most
+        maxSize of them. Entries are keyed by filename and dropped when the
+        activity object changes (the file was parsed again), or on refresh
+        (see invalidate). '''
+    def __init__(self, maxSize=None):
+        self.maxSize = globals()['detailCacheSize'] if maxSize is None else maxSize
+        self.entries = OrderedDict()
+        self.hits    = 0
+        self.misses  = 0
+        self.lock    = threading.Lock()
+
+    def __len__(self):          return len(self.entries)
+
+    def get(self, activity):
+        ''' Columns of activity (requests are answered in several threads). '''
+        with self.lock: return self.getUnlocked(activity)
+
+    def getUnlocked(self, activity):
+        entry = self.entries.get(activity.getName())
+        if(entry is not None and entry[0] is activity):
+            self.entries.move_to_end(activity.getName())
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        with activity.loadedColumns():
+            arrays = {name: np.array(activity.getColumn(name)) for name in lib.tools.Activity.columnNames}
+            for name, _ in lib.tools.Activity.sensorNames:
+                sensor = activity.getSensor(name)
+                if(sensor is not None): arrays[name] = np.array(sensor)
+        self.entries[activity.getName()] = (activity, arrays)
+        self.entries.move_to_end(activity.getName())
+        while(len(self.entries) > self.maxSize): self.entries.popitem(last=False)
+        return arrays
+
+    def invalidate(self, activities):
+        ''' Drop the entries of activities no longer in activities. '''
+        current = set(id(activity) for activity in activities)
+        with self.lock:
+            for name in [name for name, entry in self.entries.items() if id(entry[0]) not in current]: del self.entries[name]
+
+    def getStatus(self):
+        return {'size': len(self), 'maxSize': self.maxSize, 'hits': self.hits, 'misses': self.misses}
+
+
+class Snapshot():
+    ''' Activities with their aggregates (see lib.aggregate.ActivityTable)
+        and spatial indexes, built once and then only read by the request
+        handlers. Activities are found by id (see activityId) and tracks
+        are indexed by a lib.spatial.SegmentGrid per UTM zone.
+
+        Built from a previous snapshot, the grids of the zones whose
+        activities are all unchanged (the same activity objects: refresh only
+        replaces those of new or modified files) are kept as they are, and the
+        other grids reuse the projected tracks of the unchanged activities;
+        only the tracks of new or modified activities are read. The
+        metadata aggregates are always recomputed. '''
+    def __init__(self, activities, regions=None, previous=None):
+        self.activities = activities
+        self.regions    = regions or {}
+        self.time       = datetime.now()
+        self.ids        = [activityId(activity) for activity in activities]
+        self.positions  = {key: ix for ix, key in enumerate(self.ids)}
+        self.index      = lib.spatial.ActivityIndex(activities)
+        self.table      = lib.aggregate.ActivityTable(activities, self.index)
+        years, counts   = self.table.monthlyCounts()
+        self.stats      = {'all':     self.table.statistics(),
+                           'types':   {str(key): value for key, value in self.table.groupBy(self.table.types).items()},
+                           'years':   {str(key): value for key, value in self.table.groupBy(self.table.years).items()},
+                           'regions': {label: self.table.statistics(self.table.regionMask(region)) for label, region in self.regions.items()},
+                           'monthly': {str(year): counts[ix].tolist() for ix, year in enumerate(years)}}
+        zones = {}
+        for ix, activity in enumerate(activities):
+            if(len(activity) > 0): zones.setdefault(tuple(activity.UTMZone), []).append(ix)
+        ## Tracks held by the previous grids, by activity object
+        known = {}
+        for _, grid in (previous.grids.values() if previous is not None else []):
+            for ix, activity in enumerate(grid.activities): known[id(activity)] = (activity, grid, ix)
+        self.grids  = {}
+        self.loaded = 0
+        for zone, indices in zones.items():
+            members = [activities[ix] for ix in indices]
+            grid    = previous.grids[zone][1] if previous is not None and zone in previous.grids else None
+            if(grid is None or len(grid.activities) != len(members) or any(old is not new for old, new in zip(grid.activities, members))):
+                tracks = [known[id(activity)][1].getTrack(known[id(activity)][2]) if id(activity) in known and known[id(activity)][0] is activity else None for activity in members]
+                self.loaded += sum(track is None for track in tracks)
+                grid = lib.spatial.SegmentGrid(members, tracks=tracks)
+            self.grids[zone] = (np.array(indices), grid)
+
+    def __len__(self):          return len(self.activities)
+
+    def find(self, key):
+        ''' Index of the activity of id key. '''
+        if(key not in self.positions): raise QueryError(404, 'Unknown activity: '+key)
+        return self.positions[key]
+
+    def mask(self, query):
+        ''' Activities selected by the region, type and year parameters. '''
+        mask = np.ones(len(self), dtype=bool)
+        if('region' in query):
+            if(query['region'] not in self.regions): raise QueryError(404, 'Unknown region: '+query['region'])
+            mask &= self.table.regionMask(self.regions[query['region']])
+        if('type' in query): mask &= self.table.typeMask(query['type'])
+        if('year' in query): mask &= self.table.years == getNumber(query, 'year', int)
+        return mask
+
+    def nearest(self, lat, lon):
+        ''' (activity index, distance in m) of the track nearest to a point,
+            or (None, inf). The grid of each zone is searched in the order of
+            its bounding box distance, and skipped once that distance exceeds
+            the best track found. '''
+        queries = []
+        for zone, (indices, grid) in self.grids.items():
+            x, y = lib.projection.fromLatLon([lat], [lon], zone[0], zone[1])[0]
+            queries.append((grid.boundDistance(x, y), x, y, indices, grid))
+        best, bestDistance = None, np.inf
+        for bound, x, y, indices, grid in sorted(queries, key=lambda query: query[0]):
+            if(bound >= bestDistance): break
+            ix, distance = grid.nearest(x, y, bestDistance)
+            if(ix is not None and distance < bestDistance): best, bestDistance = int(indices[ix]), distance
+        return best, bestDistance
+
+
+def describeActivity(key, activity):
+    ''' JSON summary of the activity of id key. '''
+    return lib.cache.encode({'id':           key,
+                             'name':         activity.getName(),
+                             'activityType': activity.getActivityType(),
+                             'startTime':    activity.getStartTime().isoformat(),
+                             'duration':     activity.getDuration().total_seconds(),
+                             'movingTime':   activity.getMovingTime().total_seconds(),
+                             'distance':     activity.getDistance(),
+                             'calories':     activity.getCalories(),
+                             'points':       len(activity),
+                             'boundingBox':  list(activity.getBoundingBox()) if len(activity) else None})
+
+def getNumber(query, name, cast=float):
+    try:    return cast(query[name])
+    except (KeyError, ValueError): raise QueryError(400, 'Missing or invalid parameter: '+name)
+
+
+class Server():
+    ''' asyncio HTTP server answering JSON queries from a Snapshot of the
+        activities, on the local interface only:
+
+            GET /status                      activities, update and cache state
+            GET /stats?region=&type=&year=   statistics (all tables without parameters)
+            GET /activities?region=&type=&year=
+            GET /activities/<id>             summary, laps and pauses
+            GET /activities/<id>/arrays?columns=time,positions
+            GET /nearest?lat=&lon=           nearest track (see findNearestActivity)
+
+        With refresh, a function of the current activities returning the
+        updated list (or None when nothing changed), new files are loaded
+        every interval seconds in a background thread; the snapshot is
+        rebuilt there too and swapped in once complete. Requests are answered
+        by queryThreads threads, off the event loop. '''
+    def __init__(self, activities, regions=None, refresh=None, interval=10.0, detailCacheSize=None):
+        self.regions  = regions or {}
+        self.snapshot = Snapshot(activities, self.regions)
+        self.details  = DetailCache(detailCacheSize)
+        self.refresh  = refresh
+        self.interval = interval
+        self.loading  = False
+        self.error    = None
+        self.routes   = {'status': self.getStatus, 'stats': self.getStats, 'activities': self.getActivities, 'nearest': self.getNearest}
+
+    def respond(self, path, query):
+        ''' (status, payload) of a GET request. '''
+        parts = [unquote(part) for part in path.strip('/').split('/') if part]
+        if(not parts or parts[0] not in self.routes): raise QueryError(404, 'Unknown endpoint: '+path)
+        return 200, self.routes[parts[0]](parts[1:], query)
+
+    def getStatus(self, parts, query):
+        snapshot = self.snapshot
+        return {'activities': len(snapshot), 'points': int(sum(len(activity) for activity in snapshot.activities)),
+                'updated': snapshot.time.isoformat(), 'tracksLoaded': snapshot.loaded, 'loading': self.loading, 'error': self.error,
+                'regions': sorted(self.regions), 'detailCache': self.details.getStatus()}
+
+    def getStats(self, parts, query):
+        snapshot = self.snapshot
+        if(not query): return snapshot.stats
+        return snapshot.table.statistics(snapshot.mask(query))
+
+    def getActivities(self, parts, query):
+        snapshot = self.snapshot
+        if(not parts): return [describeActivity(snapshot.ids[ix], snapshot.activities[ix]) for ix in np.flatnonzero(snapshot.mask(query))]
+        ix       = snapshot.find(parts[0])
+        activity = snapshot.activities[ix]
+        if(len(parts) == 1):
+            return dict(describeActivity(snapshot.ids[ix], activity), laps=lib.cache.encode(activity.laps), pauses=lib.cache.encode(activity.getPauses()))
+        if(parts[1:] != ['arrays']): raise QueryError(404, 'Unknown endpoint: /activities/'+'/'.join(parts))
+        arrays  = self.details.get(activity)
+        columns = query['columns'].split(',') if query.get('columns') else [name for name in detailColumns if name in arrays]
+        missing = [name for name in columns if name not in arrays]
+        if(missing): raise QueryError(404, 'Unknown columns: '+', '.join(missing))
+        return dict({name: arrays[name].tolist() for name in columns}, id=snapshot.ids[ix], name=activity.getName())
+
+    def getNearest(self, parts, query):
+        snapshot     = self.snapshot
+        ix, distance = snapshot.nearest(getNumber(query, 'lat'), getNumber(query, 'lon'))
+        if(ix is None): return {'id': None, 'name': None, 'distance': None}
+        return {'id': snapshot.ids[ix], 'name': snapshot.activities[ix].getName(), 'distance': distance}
+
+    def answer(self, request):
+        ''' HTTP response (bytes) to a request line split in words. Runs in
+            the query threads, so that a slow query never holds up the event
+            loop. '''
+        try:
+            if(len(request) < 2):        raise QueryError(400, 'Malformed request')
+            if(request[0] != 'GET'):     raise QueryError(405, 'Only GET is supported')
+            url = urlsplit(request[1])
+            status, payload = self.respond(url.path, {key: values[-1] for key, values in parse_qs(url.query).items()})
+        except QueryError as e:
+            status, payload = e.status, {'error': e.reason}
+        except Exception as e:
+            logging.exception(e)
+            status, payload = 500, {'error': str(e)}
+        body = json.dumps(payload).encode('utf-8')
+        return ('HTTP/1.1 '+str(status)+' '+statusLines[status]+'\r\nContent-Type: application/json\r\nContent-Length: '+str(len(body))+'\r\nConnection: close\r\n\r\n').encode('latin-1')+body
+
+    async def handle(self, reader, writer):
+        ''' Answer one HTTP/1.1 request and close the connection. '''
+        try:
+            request = (await reader.readline()).decode('latin-1').split()
+            while((await reader.readline()) not in (b'\r\n', b'\n', b'')): pass
+            writer.write(await asyncio.get_running_loop().run_in_executor(self.queries, self.answer, request))
+            await writer.drain()
+        finally:
+            writer.close()
+
+    def update(self):
+        ''' Run refresh and build the new snapshot (in the background thread). '''
+        activities = self.refresh(list(self.snapshot.activities))
+        return Snapshot(activities, self.regions, self.snapshot) if activities is not None else None
+
+    def swap(self, snapshot):
+        ''' Answer from snapshot from now on; the detail arrays of the
+            activities it replaced are dropped. '''
+        self.snapshot = snapshot
+        self.details.invalidate(snapshot.activities)
+
+    async def watch(self):
+        loop = asyncio.get_running_loop()
+        while(True):
+            await asyncio.sleep(self.interval)
+            self.loading = True
+            try:
+                snapshot   = await loop.run_in_executor(self.executor, self.update)
+                self.error = None
+                if(snapshot is not None): self.swap(snapshot)
+            except Exception as e:
+                logging.exception(e)
+                self.error = str(e)
+            finally:
+                self.loading = False
+
+    async def start(self, host=None, port=None):
+        ''' Start listening (port 0 picks a free port) and watching. '''
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.queries  = ThreadPoolExecutor(max_workers=queryThreads)
+        self.server   = await asyncio.start_server(self.handle, host or globals()['host'], globals()['port'] if port is None else port)
+        self.port     = self.server.sockets[0].getsockname()[1]
+        self.watcher  = asyncio.ensure_future(self.watch()) if self.refresh is not None else None
+        return self
+
+    async def stop(self):
+        if(self.watcher is not None): self.watcher.cancel()
+        self.server.close()
+        await self.server.wait_closed()
+        self.executor.shutdown(wait=False)
+        self.queries.shutdown(wait=False)
+
+    async def serve(self, host=None, port=None):
+        await self.start(host, port)
+        try:     await self.server.serve_forever()
+        finally: await self.stop()
+
+    def run(self, host=None, port=None):
+        ''' Serve until interrupted. '''
+        asyncio.run(self.serve(host, port))
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+
+## Dependancies
+#Packages
+import numpy as np
+
+
+###############################################################################
+## Track simplification
+###############################################################################
+## Level of detail tolerances (m), finest first
+tolerances = (2.0, 10.0, 50.0, 250.0)
+
+def segmentDistances(points, a, b):
+    ''' Distance from each of points to the segment [a, b]. '''
+    ab   = b-a
+    ap   = points-a
+    norm = np.dot(ab, ab)
+    if(norm > 0): t = np.clip(ap.dot(ab)/norm, 0.0, 1.0)
+    else:         t = np.zeros(len(points))
+    return np.hypot(*(ap-t[:,None]*ab).T)
+
+def douglasPeucker(points, tolerance):
+    ''' Indices of the points of an (n,2) track kept by the Douglas-Peucker
+        algorithm, so that no dropped point lies further than tolerance from
+        the simplified line. Distances of each span are computed with NumPy. '''
+    points = np.asarray(points, dtype=float)
+    if(len(points) < 3): return np.arange(len(points))
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(points)-1)]
+    while(stack):
+        start, end = stack.pop()
+        if(end-start < 2): continue
+        distances = segmentDistances(points[start+1:end], points[start], points[end])
+        ix = int(np.argmax(distances))
+        if(distances[ix] > tolerance):
+            middle = start+1+ix
+            keep[middle] = True
+            stack.append((start, middle))
+            stack.append((middle, end))
+    return np.flatnonzero(keep)
+
+
+class TrackLevels():
+    ''' Precomputed levels of detail of one track: for each tolerance (m), the
+        indices of the points kept by douglasPeucker(). '''
+    def __init__(self, positions=None, tolerances=tolerances):
+        self.tolerances = np.asarray(tolerances, dtype=float)
+        if(positions is None): self.indices = [np.zeros(0, dtype=np.int64) for _ in tolerances]
+        else:                  self.indices = [douglasPeucker(positions, tolerance) for tolerance in tolerances]
+
+    def select(self, resolution):
+        ''' Index of the coarsest level whose tolerance does not exceed
+            resolution (m per pixel), or None for the full track. '''
+        levels = np.flatnonzero(self.tolerances <= resolution)
+        if(len(levels) == 0): return None
+        return int(levels[np.argmax(self.tolerances[levels])])
+
+    def getPositions(self, positions, resolution):
+        ''' The points of positions to draw at resolution (m per pixel). '''
+        level = self.select(resolution)
+        if(level is None): return positions
+        return positions[self.indices[level]]
+
+    def toArrays(self):
+        ''' Flat arrays suitable for np.savez (see fromArrays). '''
+        return {'tolerances': self.tolerances,
+                'indices':    np.concatenate(self.indices) if self.indices else np.zeros(0, dtype=np.int64),
+                'offsets':    np.cumsum([0]+[len(indices) for indices in self.indices])}
+
+    @classmethod
+    def fromArrays(cls, arrays):
+        levels = cls(tolerances=arrays['tolerances'])
+        offsets = arrays['offsets']
+        levels.indices = [arrays['indices'][offsets[ix]:offsets[ix+1]] for ix in range(len(offsets)-1)]
+        return levels
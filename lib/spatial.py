@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+
+## Dependancies
+#Packages
+import numpy as np
+
+
+###############################################################################
+## Spatial indexes
+###############################################################################
+class ActivityIndex():
+    ''' Start points and bounding boxes (lat/long) of a list of activities, for
+        vectorized region queries. Only the activity metadata is read, so
+        unloaded activities stay unloaded. Activities without positions never
+        match. starts (n,2) and bboxes (n,4) may be given directly instead,
+        such as from the metadata of a lib.store.TrackpointStore. '''
+    def __init__(self, activities, starts=None, bboxes=None):
+        self.activities = activities
+        self.starts     = np.full((len(activities), 2), np.nan) if starts is None else np.asarray(starts, dtype=float)
+        self.bboxes     = np.full((len(activities), 4), np.nan) if bboxes is None else np.asarray(bboxes, dtype=float)
+        if(starts is not None and bboxes is not None): return
+        for ix, activity in enumerate(activities):
+            if(len(activity) == 0): continue
+            self.starts[ix] = activity.getStartPoint()
+            self.bboxes[ix] = activity.getBoundingBox()
+
+    def __len__(self):          return len(self.activities)
+
+    def startsWithin(self, latLim, longLim):
+        ''' Indices of the activities starting strictly inside the limits. '''
+        with np.errstate(invalid='ignore'):
+            mask = ((self.starts[:,0] > latLim[0])  & (self.starts[:,0] < latLim[1]) &
+                    (self.starts[:,1] > longLim[0]) & (self.starts[:,1] < longLim[1]))
+        return np.flatnonzero(mask)
+
+    def intersecting(self, latLim, longLim):
+        ''' Indices of the activities whose bounding box overlaps the limits. '''
+        with np.errstate(invalid='ignore'):
+            mask = ((self.bboxes[:,0] <= latLim[1])  & (self.bboxes[:,1] >= latLim[0]) &
+                    (self.bboxes[:,2] <= longLim[1]) & (self.bboxes[:,3] >= longLim[0]))
+        return np.flatnonzero(mask)
+
+
+class SegmentGrid():
+    ''' Uniform grid over the UTM track segments of a list of activities.
+
+        Every segment is filed under the cell of its first point; segments
+        longer than a cell are kept aside and always checked. A query visits
+        rings of cells around the query point until no unvisited cell can hold
+        a closer segment. tracks optionally holds the (n,2) track of some activities already (see
+        getTrack), None for those to read. '''
+    def __init__(self, activities, cellSize=None, tracks=None):
+        self.activities = activities
+        tracks = list(tracks) if tracks is not None else [None]*len(activities)
+        for ix, activity in enumerate(activities):
+            if(tracks[ix] is not None): continue
+            with activity.loadedColumns(): tracks[ix] = np.asarray(activity.getPositions(), dtype=float).reshape(-1, 2)
+        self.points  = np.concatenate(tracks) if tracks else np.zeros((0, 2))
+        self.owners  = np.repeat(np.arange(len(tracks), dtype=np.int32), [len(track) for track in tracks])
+        self.offsets = np.concatenate([[0], np.cumsum([len(track) for track in tracks])]).astype(np.int64)
+
+        ## Segment ix joins points ix and ix+1 of the same activity; single
+        ## point tracks are indexed as zero-length segments
+        sizes     = np.array([len(track) for track in tracks], dtype=int)
+        ends      = np.cumsum(sizes)-1
+        isStart   = np.ones(len(self.points), dtype=bool)
+        isStart[ends[sizes > 1]] = False
+        segments  = np.flatnonzero(isStart)
+        self.segmentEnds = np.arange(1, len(self.points)+1)
+        self.segmentEnds[ends] = ends
+        lengths   = np.hypot(*(self.points[self.segmentEnds[segments]]-self.points[segments]).T) if len(segments) else np.zeros(0)
+
+        if(cellSize is None):
+            extent   = np.ptp(self.points, axis=0).max() if len(self.points) else 1.0
+            cellSize = max(np.percentile(lengths, 95) if len(lengths) else 0.0, extent/1024.0, 1.0)
+        self.cellSize = float(cellSize)
+        self.longSegments = segments[lengths > self.cellSize]
+        segments  = segments[lengths <= self.cellSize]
+
+        self.origin = self.points.min(axis=0) if len(self.points) else np.zeros(2)
+        self.corner = self.points.max(axis=0) if len(self.points) else np.zeros(2)
+        cells       = self.cellOf(self.points[segments])
+        self.shape  = (cells.max(axis=0)+1) if len(cells) else np.ones(2, dtype=np.int64)
+        keys        = cells[:,0]*self.shape[1]+cells[:,1]
+        order       = np.argsort(keys, kind='stable')
+        self.keys     = keys[order]
+        self.segments = segments[order]
+
+    def getTrack(self, ix):
+        ''' Track of activity ix (a view into the points). '''
+        return self.points[self.offsets[ix]:self.offsets[ix+1]]
+
+    def cellOf(self, points):
+        return np.floor((np.asarray(points, dtype=float).reshape(-1, 2)-self.origin)/self.cellSize).astype(np.int64)
+
+    def segmentsInCells(self, cells):
+        ''' Segments filed under any of the (n,2) cells inside the grid. '''
+        inside = np.all((cells >= 0) & (cells < self.shape), axis=1)
+        keys   = cells[inside,0]*self.shape[1]+cells[inside,1]
+        starts = np.searchsorted(self.keys, keys, side='left')
+        stops  = np.searchsorted(self.keys, keys, side='right')
+        if(not np.any(stops > starts)): return np.zeros(0, dtype=int)
+        return np.concatenate([self.segments[start:stop] for start, stop in zip(starts, stops) if stop > start])
+
+    def distances(self, x, y, segments):
+        ''' Distance from (x,y) to each of segments. '''
+        a  = self.points[segments]
+        ab = self.points[self.segmentEnds[segments]]-a
+        aq = np.array([x, y])-a
+        norm = np.einsum('ij,ij->i', ab, ab)
+        t    = np.zeros(len(segments))
+        np.divide(np.einsum('ij,ij->i', aq, ab), norm, out=t, where=norm > 0)
+        t    = np.clip(t, 0.0, 1.0)
+        return np.hypot(*(aq-ab*t[:,None]).T)
+
+    def boundDistance(self, x, y):
+        ''' Distance from (x,y) to the bounding box of every track point: no
+            track of the grid is closer. '''
+        if(len(self.points) == 0): return np.inf
+        dx = max(self.origin[0]-x, 0.0, x-self.corner[0])
+        dy = max(self.origin[1]-y, 0.0, y-self.corner[1])
+        return float(np.hypot(dx, dy))
+
+    def nearest(self, x, y, limit=np.inf):
+        ''' Return (activity index, distance) of the track nearest to (x,y),
+            or (None, inf) if the grid is empty or holds no track closer than
+            limit. '''
+        best, bestDistance = None, limit
+        if(self.boundDistance(x, y) >= limit): return None, np.inf
+        if(len(self.longSegments)):
+            distances = self.distances(x, y, self.longSegments)
+            ix = np.argmin(distances)
+            if(distances[ix] < bestDistance): best, bestDistance = self.longSegments[ix], distances[ix]
+        if(len(self.keys)):
+            cx, cy  = self.cellOf((x, y))[0]
+            ## Rings needed to reach and to cover the whole grid from the query
+            ## cell (queries far outside the grid skip the empty rings)
+            minRing = max(0, -cx, -cy, cx-(self.shape[0]-1), cy-(self.shape[1]-1))
+            maxRing = max(abs(cx), abs(cy), abs(self.shape[0]-1-cx), abs(self.shape[1]-1-cy))
+            for ring in range(int(minRing), int(maxRing)+1):
+                ## Segments first filed in ring k are at least (k-2) cells away
+                if(bestDistance <= (ring-2)*self.cellSize): break
+                segments = self.segmentsInCells(ringCells(cx, cy, ring, self.shape))
+                if(len(segments) == 0): continue
+                distances = self.distances(x, y, segments)
+                ix = np.argmin(distances)
+                if(distances[ix] < bestDistance): best, bestDistance = segments[ix], distances[ix]
+        if(best is None): return None, np.inf
+        return int(self.owners[best]), float(bestDistance)
+
+
+def ringCells(cx, cy, ring, shape=None):
+    ''' (n,2) cells at Chebyshev distance ring from cell (cx, cy), only those
+        inside a grid of shape cells if given, so that a ring costs no more
+        than the side of the grid however far the query is. '''
+    if(ring == 0): return np.array([[cx, cy]])
+    low  = (cx-ring, cy-ring)
+    high = (cx+ring, cy+ring)
+    if(shape is not None): low, high = (max(low[0], 0), max(low[1], 0)), (min(high[0], shape[0]-1), min(high[1], shape[1]-1))
+    xs, ys = np.arange(low[0], high[0]+1), np.arange(max(low[1], cy-ring+1), min(high[1], cy+ring-1)+1)
+    rows = [np.stack([xs, np.full(len(xs), y)], axis=1) for y in (cy-ring, cy+ring) if low[1] <= y <= high[1]]
+    cols = [np.stack([np.full(len(ys), x), ys], axis=1) for x in (cx-ring, cx+ring) if low[0] <= x <= high[0]]
+    cells = rows+cols
+    return np.concatenate(cells).astype(np.int64) if cells else np.zeros((0, 2), dtype=np.int64)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+## Dependancies
+#Packages
+import numpy as np
+#Internal
+import lib.export
+import lib.spatial
+
+
+###############################################################################
+## Packed trackpoint store
+###############################################################################
+## Trackpoints scanned at a time by the point queries, which bounds the size of
+## their temporary masks whatever the length of the activities
+chunkSize = 1000000
+
+
+def createStore(activities, folder, batchSize=1000000):
+    ''' Write activities to a packed trackpoint store in folder (a numpy
+        dataset with a single partition, see lib.export.DatasetWriter). '''
+    return lib.export.exportActivities(activities, folder, engine='numpy', batchSize=batchSize, packed=True)
+
+def toMilliseconds(value):
+    ''' datetime64[ms] of a datetime (naive UTC), date string or datetime64. '''
+    return np.datetime64(value, 'ms')
+
+
+class TrackpointStore(lib.export.Dataset):
+    ''' Packed trackpoint store written by createStore.
+
+        Each trackpoint column of the whole archive is one contiguous file,
+        memory mapped read-only, and activity ix owns the rows
+        offsets[ix]:offsets[ix+1]. Region, time window and point queries only
+        read the metadata table and slices of the mapped columns: no activity
+        is built and the pages read belong to the OS page cache, so memory
+        stays flat whatever the size of the archive. Indexing the store
+        (store[ix]) rebuilds a lazy activity reading its columns from here. '''
+    def __init__(self, folder):
+        lib.export.Dataset.__init__(self, folder)
+        if(self.engine != 'numpy' or not self.packed): raise Exception('Not a packed trackpoint store: '+folder)
+        lengths      = self.metadata['length'].astype(np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        self.starts  = self.metadata['startTime'].astype('datetime64[ms]')
+        self.ends    = self.starts+np.round(self.metadata['duration'].astype(float)*1000.0).astype('timedelta64[ms]')
+        positioned   = (lengths > 0)[:,np.newaxis]
+        self.index   = lib.spatial.ActivityIndex(self,
+                                                 np.where(positioned, np.stack([self.metadata['startLat'], self.metadata['startLong']], axis=1), np.nan),
+                                                 np.where(positioned, np.stack([self.metadata[name] for name in ('latMin', 'latMax', 'longMin', 'longMax')], axis=1), np.nan))
+        ## np.memmap cannot map empty files
+        if(not self.offsets[-1]):
+            self.partitions[None] = {name: np.zeros(0, dtype=dtype) for name, dtype in lib.export.trackpointColumns}
+            self.partitions[None].update({name: np.zeros((0, 2)) for name, _, _ in lib.export.coordinatePairs})
+        self.columns = self.getPartition(None)
+
+    def __getitem__(self, ix):  return self.getActivity(int(ix))
+
+    def getPositions(self, ix):
+        ''' UTM track (n,2) of activity ix, a view into the mapped file. '''
+        return self.getColumn(ix, 'xy')
+
+    def window(self, start=None, end=None):
+        ''' Indices of the activities overlapping the time window [start, end)
+            (datetimes in UTC or ISO dates; either end may be open). '''
+        mask = np.ones(len(self), dtype=bool)
+        if(start is not None): mask &= self.ends >= toMilliseconds(start)
+        if(end is not None):   mask &= self.starts < toMilliseconds(end)
+        return np.flatnonzero(mask)
+
+    def select(self, latLim=None, longLim=None, start=None, end=None):
+        ''' Indices of the positioned activities whose bounding box overlaps the
+            limits and that overlap the time window. '''
+        latLim  = latLim or (-90.0, 90.0)
+        longLim = longLim or (-180.0, 180.0)
+        return np.intersect1d(self.index.intersecting(latLim, longLim), self.window(start, end))
+
+    def bindRegion(self, region, start=None, end=None):
+        ''' Bind region to the activities starting inside it within the time
+            window (see Region.bindActivities); only those are rebuilt. '''
+        return region.bindActivities(self, self.index, self.window(start, end) if start is not None or end is not None else None)
+
+    def iterPoints(self, latLim=None, longLim=None, start=None, end=None):
+        ''' Yield (ix, rows) for every activity with points inside the limits
+            and the time window, rows being the indices of those points within
+            the activity (see getColumn). Only the activities selected by
+            their metadata are scanned, chunkSize points at a time. '''
+        start = toMilliseconds(start) if start is not None else None
+        end   = toMilliseconds(end) if end is not None else None
+        for ix in self.select(latLim, longLim, start, end):
+            first, stop = int(self.offsets[ix]), int(self.offsets[ix+1])
+            found = []
+            for begin in range(first, stop, chunkSize):
+                rows = slice(begin, min(begin+chunkSize, stop))
+                mask = np.ones(rows.stop-rows.start, dtype=bool)
+                if(latLim is not None):  mask &= (self.columns['lat'][rows] >= latLim[0]) & (self.columns['lat'][rows] <= latLim[1])
+                if(longLim is not None): mask &= (self.columns['lon'][rows] >= longLim[0]) & (self.columns['lon'][rows] <= longLim[1])
+                if(start is not None or end is not None):
+                    ## Milliseconds of each point from the start of the activity
+                    elapsed = self.columns['t'][rows]*1000.0
+                    if(start is not None): mask &= elapsed >= (start-self.starts[ix]).astype(np.int64)
+                    if(end is not None):   mask &= elapsed < (end-self.starts[ix]).astype(np.int64)
+                found.append(np.flatnonzero(mask)+(begin-first))
+            rows = np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+            if(len(rows)): yield int(ix), rows
+
+    def countPoints(self, latLim=None, longLim=None, start=None, end=None):
+        ''' Number of points inside the limits and the time window. '''
+        return sum(len(rows) for _, rows in self.iterPoints(latLim, longLim, start, end))
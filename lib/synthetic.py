@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+## Dependancies
+#Native
+import os
+from datetime import datetime, timedelta
+#Packages
+import numpy as np
+
+
+###############################################################################
+## Synthetic activities
+###############################################################################
+## Metres per degree of latitude
+metresPerDegree = 111320.0
+sensorChannels  = ('hr', 'cadence', 'power', 'speed')
+
+
+def makeTrack(points, sensors=(), origin=(45.5, -73.6), start=datetime(2018, 5, 1, 10), interval=1.0, speed=3.0, seed=0):
+    ''' Random walk of points trackpoints from origin (lat, long) at about
+        speed (m/s), one every interval seconds from start. Returns the
+        columns 'lat', 'lon', 'alt', 'time' (seconds since start), 'steps'
+        (metres from the previous point) and the requested sensors (see
+        sensorChannels), plus 'start'. '''
+    random  = np.random.RandomState(seed)
+    heading = np.cumsum(random.normal(0.0, 0.1, points))+random.uniform(0, 2*np.pi)
+    steps   = np.maximum(random.normal(speed, 0.3*speed, points), 0.0)*interval
+    steps[0] = 0.0
+    x       = np.cumsum(steps*np.cos(heading))
+    y       = np.cumsum(steps*np.sin(heading))
+    time    = np.arange(points)*float(interval)
+    track   = {'start': start,
+               'lat':   origin[0]+y/metresPerDegree,
+               'lon':   origin[1]+x/(metresPerDegree*np.cos(np.radians(origin[0]))),
+               'alt':   50.0+10.0*np.sin(time/300.0)+random.normal(0.0, 0.5, points),
+               'time':  time,
+               'steps': steps}
+    if('hr' in sensors):      track['hr']      = np.round(140.0+15.0*np.sin(time/600.0)+random.normal(0.0, 2.0, points))
+    if('cadence' in sensors): track['cadence'] = np.round(85.0+random.normal(0.0, 3.0, points))
+    if('speed' in sensors):   track['speed']   = np.round(np.concatenate([steps[1:2], steps[1:]])/interval, 2)
+    if('power' in sensors):   track['power']   = np.round(np.maximum(220.0+40.0*np.sin(time/120.0)+random.normal(0.0, 20.0, points), 0.0))
+    return track
+
+def timestamps(track):
+    ''' ISO 8601 UTC timestamps of the points of a track. '''
+    start = np.datetime64(track['start'], 'ms')
+    return np.datetime_as_string(start+np.round(track['time']*1000.0).astype('timedelta64[ms]'), unit='ms')
+
+def lapOffsets(points, laps):
+    ''' Offsets of laps (or segments) of about equal size, ending with points. '''
+    return [int(offset) for offset in np.linspace(0, points, laps+1)]
+
+def formatTCX(track, laps=1, sport='Running'):
+    ''' TCX document of track, split into laps. '''
+    times   = timestamps(track)
+    offsets = lapOffsets(len(times), laps)
+    lines   = ['<?xml version="1.0" encoding="UTF-8"?>',
+               '<TrainingCenterDatabase xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2" xmlns:ns3="http://www.garmin.com/xmlschemas/ActivityExtension/v2">',
+               '<Activities><Activity Sport="'+sport+'"><Id>'+times[0]+'Z</Id>']
+    for start, stop in zip(offsets[:-1], offsets[1:]):
+        if(stop == start): continue
+        lines.append('<Lap StartTime="'+times[start]+'Z"><TotalTimeSeconds>'+str(float(track['time'][stop-1]-track['time'][start]))+'</TotalTimeSeconds>'
+                     '<DistanceMeters>'+str(round(float(track['steps'][start+1:stop].sum()), 1))+'</DistanceMeters><Calories>'+str((stop-start)//10)+'</Calories><Track>')
+        for ix in range(start, stop):
+            point = '<Trackpoint><Time>'+times[ix]+'Z</Time><Position><LatitudeDegrees>'+repr(float(track['lat'][ix]))+'</LatitudeDegrees>' \
+                    '<LongitudeDegrees>'+repr(float(track['lon'][ix]))+'</LongitudeDegrees></Position><AltitudeMeters>'+str(round(float(track['alt'][ix]), 2))+'</AltitudeMeters>'
+            if('hr' in track):      point += '<HeartRateBpm><Value>'+str(int(track['hr'][ix]))+'</Value></HeartRateBpm>'
+            if('cadence' in track): point += '<Cadence>'+str(int(track['cadence'][ix]))+'</Cadence>'
+            extensions = ''
+            if('speed' in track):   extensions += '<ns3:Speed>'+str(float(track['speed'][ix]))+'</ns3:Speed>'
+            if('power' in track):   extensions += '<ns3:Watts>'+str(int(track['power'][ix]))+'</ns3:Watts>'
+            if(extensions):         point += '<Extensions><ns3:TPX>'+extensions+'</ns3:TPX></Extensions>'
+            lines.append(point+'</Trackpoint>')
+        lines.append('</Track></Lap>')
+    lines.append('</Activity></Activities></TrainingCenterDatabase>')
+    return '\n'.join(lines)+'\n'
+
+def formatGPX(track, segments=1):
+    ''' GPX document of track, split into track segments. '''
+    times   = timestamps(track)
+    offsets = lapOffsets(len(times), segments)
+    lines   = ['<?xml version="1.0" encoding="UTF-8"?>',
+               '<gpx version="1.1" creator="lib.synthetic" xmlns="http://www.topografix.com/GPX/1/1" xmlns:gpxtpx="http://www.garmin.com/xmlschemas/TrackPointExtension/v1">',
+               '<trk>']
+    for start, stop in zip(offsets[:-1], offsets[1:]):
+        if(stop == start): continue
+        lines.append('<trkseg>')
+        for ix in range(start, stop):
+            point = '<trkpt lat="'+repr(float(track['lat'][ix]))+'" lon="'+repr(float(track['lon'][ix]))+'"><ele>'+str(round(float(track['alt'][ix]), 2))+'</ele><time>'+times[ix]+'Z</time>'
+            extensions = ''
+            if('hr' in track):      extensions += '<gpxtpx:hr>'+str(int(track['hr'][ix]))+'</gpxtpx:hr>'
+            if('cadence' in track): extensions += '<gpxtpx:cad>'+str(int(track['cadence'][ix]))+'</gpxtpx:cad>'
+            if(extensions):         extensions  = '<gpxtpx:TrackPointExtension>'+extensions+'</gpxtpx:TrackPointExtension>'
+            if('power' in track):   extensions += '<power>'+str(int(track['power'][ix]))+'</power>'
+            if('speed' in track):   extensions += '<speed>'+str(float(track['speed'][ix]))+'</speed>'
+            if(extensions):         point += '<extensions>'+extensions+'</extensions>'
+            lines.append(point+'</trkpt>')
+        lines.append('</trkseg>')
+    lines.append('</trk></gpx>')
+    return '\n'.join(lines)+'\n'
+
+def generateFiles(folder, files=10, points=3600, laps=1, sensors=(), formats=('.tcx', '.gpx'), spread=0.2, seed=0):
+    ''' Write files synthetic activities of points trackpoints each to folder,
+        alternating formats, one day apart and starting at random within
+        spread degrees of the origin. Returns the filenames. '''
+    if(not os.path.exists(folder)): os.makedirs(folder)
+    random    = np.random.RandomState(seed)
+    filenames = []
+    for ix in range(files):
+        extension = formats[ix % len(formats)]
+        origin    = (45.5+random.uniform(-spread, spread), -73.6+random.uniform(-spread, spread))
+        track     = makeTrack(points, sensors, origin, datetime(2018, 1, 1, 8)+timedelta(days=ix), seed=seed+ix)
+        filename  = os.path.join(folder, 'activity-'+str(ix).zfill(5)+('-running' if extension == '.gpx' else '')+extension)
+        with open(filename, 'w') as stream: stream.write(formatTCX(track, laps) if extension == '.tcx' else formatGPX(track, laps))
+        filenames.append(filename)
+    return filenames
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+import unittest
+import os, site
+from datetime import datetime, timedelta
+import numpy as np
+site.addsitedir(os.path.join(os.getcwd(), os.pardir, os.pardir))
+from lib import aggregate
+
+class Summary():
+    def __init__(self, activityType, start, distance, duration):
+        self.activityType = activityType
+        self.start        = start
+        self.distance     = distance
+        self.duration     = duration
+    def __len__(self):          return 1
+    def getActivityType(self):  return self.activityType
+    def getStartTime(self):     return self.start
+    def getDistance(self):      return self.distance
+    def getDuration(self):      return timedelta(seconds=self.duration)
+    def getMovingTime(self):    return timedelta(seconds=self.duration*0.9)
+    def getCalories(self):      return 10
+    def getStartPoint(self):    return (45.5, -73.6)
+    def getBoundingBox(self):   return (45.5, 45.5, -73.6, -73.6)
+
+class Tests_for_aggregate(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.RandomState(0)
+        self.activities = [Summary(['Running', 'cycling', 'paddle_boating'][ix % 3], datetime(2016+ix % 2, 1+ix % 12, 1), random.uniform(1000, 50000), random.uniform(600, 7200)) for ix in range(100)]
+        self.table = aggregate.ActivityTable(self.activities)
+
+    def test_group_by_type(self):
+        groups = self.table.groupBy(self.table.types)
+        self.assertEqual(sorted(groups), ['cycling', 'paddle boating', 'running'])
+        distances = [activity.distance for activity in self.activities if activity.activityType == 'cycling']
+        self.assertEqual(groups['cycling']['count'], len(distances))
+        self.assertAlmostEqual(groups['cycling']['distance'], sum(distances))
+        self.assertAlmostEqual(groups['cycling']['distanceP90'], np.percentile(distances, 90))
+        self.assertEqual(self.table.statistics(self.table.typeMask('running'))['count'], 34)
+
+    def test_monthly_counts(self):
+        years, counts = self.table.monthlyCounts()
+        self.assertEqual(list(years), [2016, 2017])
+        self.assertEqual(counts.sum(), 100)
+        self.assertEqual(counts[0, 0], len([ix for ix in range(100) if ix % 2 == 0 and ix % 12 == 0]))
+        self.assertIsNone(self.table.statistics(np.zeros(100, dtype=bool))['speed'])
+
+    def test_moving_speed(self):
+        stats = self.table.statistics()
+        self.assertAlmostEqual(stats['movingTime']/stats['duration'], 0.9)
+        self.assertAlmostEqual(stats['movingSpeed'], stats['speed']/0.9)
+
+
+
+unittest.main(exit=False)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+import unittest
+import os, site
+import numpy as np
+site.addsitedir(os.path.join(os.getcwd(), os.pardir, os.pardir))
+from lib import analytics
+
+class Tests_for_analytics(unittest.TestCase):
+
+    def test_durations_and_zones(self):
+        time = np.array([0.0, 1.0, 2.0, 100.0, 101.0])
+        self.assertEqual(list(analytics.sampleDurations(time)), [1.0, 1.0, 10.0, 1.0, 0.0])
+        zones = analytics.timeInZones([100, 150, np.nan, 170, 190], time, [120, 160])
+        self.assertEqual(list(zones), [1.0, 1.0, 1.0])
+
+    def test_rolling_mean(self):
+        time   = np.arange(120.0)
+        values = np.where(time < 60, 100.0, 300.0)
+        means  = analytics.rollingMean(values, time, window=30.0)
+        self.assertAlmostEqual(means[40], 100.0)
+        self.assertAlmostEqual(means[100], 300.0)
+        self.assertAlmostEqual(means[74], 200.0)
+        ## Irregular sampling gives the same means
+        sparse = np.arange(0, 120, 2)
+        self.assertAlmostEqual(analytics.rollingMean(values[sparse], time[sparse], window=30.0)[50], 300.0)
+
+    def test_power_and_heart_rate(self):
+        time  = np.arange(3600.0)
+        power = np.full(3600, 250.0)
+        self.assertAlmostEqual(analytics.normalizedPower(power, time), 250.0)
+        self.assertAlmostEqual(analytics.trainingStress(power, time, 250.0), 100.0*3599/3600)
+        ## Variable power normalizes above its mean
+        surges = np.where((time // 60) % 2 == 0, 150.0, 350.0)
+        self.assertTrue(analytics.normalizedPower(surges, time) > 250.0)
+        heartRate = np.full(3600, 125.0)
+        self.assertAlmostEqual(analytics.trimp(heartRate, time, 60.0, 190.0), 3599/60.0*0.5*0.64*np.exp(1.92*0.5))
+        self.assertEqual(analytics.trimp([np.nan, np.nan], [0.0, 1.0], 60.0, 190.0), 0.0)
+
+    def test_sensor_summary(self):
+        ## Scores from the stored bins match those of the columns, whatever
+        ## the athlete settings, for values away from the zone bounds
+        time      = np.concatenate([np.arange(1800.0), 1830.0+np.arange(1800.0)])
+        heartRate = np.where((time // 90) % 3 == 0, 148.0, 122.0)
+        heartRate[::50] = np.nan
+        power     = np.where((time // 60) % 2 == 0, 150.0, 290.0)
+        sensors   = analytics.summarizeSensors(time, heartRate, power)
+        self.assertIsNone(sensors['cadence'])
+        self.assertEqual((sensors['heartRate']['first'], len(sensors['heartRate']['seconds'])), (24, 6))
+        self.assertEqual(len(sensors['power']['seconds']), 15)
+        for settings in (None, {'maxHeartRate': 180.0, 'ftp': 300.0}):
+            settings = dict(analytics.athlete, **(settings or {}))
+            summary  = analytics.scoreSensors(sensors, settings)
+            self.assertTrue(np.allclose(summary['heartRateZones'], analytics.timeInZones(heartRate, time, np.multiply(settings['heartRateZones'], settings['maxHeartRate'])), atol=0.1))
+            self.assertTrue(np.allclose(summary['powerZones'], analytics.timeInZones(power, time, np.multiply(settings['powerZones'], settings['ftp'])), atol=0.1))
+            self.assertAlmostEqual(summary['trimp']/analytics.trimp(heartRate, time, settings['restHeartRate'], settings['maxHeartRate']), 1.0, delta=0.02)
+            self.assertAlmostEqual(summary['trainingStress'], analytics.trainingStress(power, time, settings['ftp']))
+        self.assertEqual(analytics.timeInBins([np.nan], [0.0], 5.0)['seconds'], [])
+
+
+unittest.main(exit=False)
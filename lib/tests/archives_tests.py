@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+import unittest
+import os, site, gzip, shutil, tempfile, zipfile
+import numpy as np
+site.addsitedir(os.path.join(os.getcwd(), os.pardir, os.pardir))
+from lib import archives, scanner, cache, loader, tools
+
+TCX = '''<?xml version="1.0" encoding="UTF-8"?>
+<TrainingCenterDatabase xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2">
+ <Activities><Activity Sport="Running"><Lap StartTime="2018-05-01T10:00:00.000Z">
+  <TotalTimeSeconds>10</TotalTimeSeconds><DistanceMeters>15</DistanceMeters><Calories>2</Calories>
+  <Track>
+   <Trackpoint><Time>2018-05-01T10:00:00.000Z</Time><Position><LatitudeDegrees>45.5000</LatitudeDegrees><LongitudeDegrees>-73.6000</LongitudeDegrees></Position><AltitudeMeters>30.0</AltitudeMeters></Trackpoint>
+   <Trackpoint><Time>2018-05-01T10:00:10.000Z</Time><Position><LatitudeDegrees>45.5001</LatitudeDegrees><LongitudeDegrees>-73.6001</LongitudeDegrees></Position><AltitudeMeters>31.0</AltitudeMeters></Trackpoint>
+  </Track>
+ </Lap></Activity></Activities>
+</TrainingCenterDatabase>
+'''
+
+GPX = '''<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>
+ <trkpt lat="45.5000" lon="-73.6000"><ele>30.0</ele><time>2018-05-01T10:00:00Z</time></trkpt>
+ <trkpt lat="45.5001" lon="-73.6001"><ele>31.0</ele><time>2018-05-01T10:00:10Z</time></trkpt>
+ <trkpt lat="45.5003" lon="-73.6002"><ele>32.5</ele><time>2018-05-01T10:00:20Z</time></trkpt>
+</trkseg></trk></gpx>
+'''
+
+class Tests_for_archives(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        with open(os.path.join(self.folder, 'run.tcx'), 'w') as stream: stream.write(TCX)
+        with gzip.open(os.path.join(self.folder, 'run2.tcx.gz'), 'wt') as stream: stream.write(TCX)
+        with zipfile.ZipFile(os.path.join(self.folder, 'export.zip'), 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('activities/running.gpx', GPX)
+            archive.writestr('activities/run3.tcx.gz', gzip.compress(TCX.encode('utf-8')))
+            archive.writestr('notes.txt', 'not an activity')
+
+    def tearDown(self):
+        archives.openArchives.clear()
+        shutil.rmtree(self.folder)
+
+    def test_names(self):
+        self.assertEqual(archives.activityExtension('a/ride.GPX.gz'), '.gpx')
+        self.assertEqual(archives.activityExtension('x.zip!b/run.tcx'), '.tcx')
+        self.assertEqual(archives.splitMember('x.zip!b/run.tcx'), ('x.zip', 'b/run.tcx'))
+        self.assertEqual(archives.splitMember('run.tcx'), ('run.tcx', None))
+
+    def test_close_member(self):
+        ## Closing a .gz member also closes the zip member stream
+        with archives.openActivity(os.path.join(self.folder, 'export.zip!activities/run3.tcx.gz')) as stream:
+            self.assertEqual(stream.read().decode('utf-8'), TCX)
+        self.assertTrue(stream.member.closed)
+
+    def test_scan_and_load(self):
+        files = scanner.scanFiles(self.folder, tools.activityFormats)
+        names = sorted(os.path.relpath(name, self.folder) for name in files)
+        self.assertEqual(names, ['export.zip!activities/run3.tcx.gz', 'export.zip!activities/running.gpx', 'run.tcx', 'run2.tcx.gz'])
+        activityCache = cache.ActivityCache(os.path.join(self.folder, 'cache'))
+        activities = loader.loadActivities(sorted(files), ['running'], cache=activityCache, progress=False, lazy=True)
+        self.assertEqual(len(activities), 4)
+        for activity in activities:
+            self.assertEqual(len(activity.getPositions()), 3 if activity.getName().endswith('.gpx') else 2)
+        self.assertEqual(len(activityCache), 4)
+        self.assertIsNotNone(activityCache.lookup(os.path.join(self.folder, 'export.zip!activities/running.gpx')))
+
+
+
+unittest.main(exit=False)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+import unittest
+import os, site, json, shutil, tempfile
+import numpy as np
+from datetime import datetime, timedelta
+site.addsitedir(os.path.join(os.getcwd(), os.pardir, os.pardir))
+from lib import cache, loader, parsers
+
+GPX = '''<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>
+ <trkpt lat="45.5000" lon="-73.6000"><ele>30.0</ele><time>2018-05-01T10:00:00Z</time></trkpt>
+ <trkpt lat="45.5001" lon="-73.6001"><ele>31.0</ele><time>2018-05-01T10:00:10Z</time></trkpt>
+ <trkpt lat="45.5003" lon="-73.6002"><ele>32.5</ele><time>2018-05-01T10:00:20Z</time></trkpt>
+</trkseg></trk></gpx>
+'''
+
+class Tests_for_cache(unittest.TestCase):
+
+    def setUp(self):
+        self.folder   = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder, 'ride.gpx')
+        with open(self.filename, 'w') as stream: stream.write(GPX)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_roundtrip(self):
+        store  = cache.ActivityCache(os.path.join(self.folder, 'cache'))
+        parsed = loader.loadActivities([self.filename], ['running'], progress=False, cache=store)[0]
+        store  = cache.ActivityCache(os.path.join(self.folder, 'cache'))
+        self.assertIsNotNone(store.lookup(self.filename))
+        cached = loader.loadActivities([self.filename], ['running'], progress=False, cache=store)[0]
+        self.assertEqual(cached.getStartTime(), parsed.getStartTime())
+        self.assertEqual(cached.getDuration(), parsed.getDuration())
+        self.assertEqual(cached.UTMZone, parsed.UTMZone)
+        self.assertTrue(np.array_equal(cached.getTimes(), parsed.getTimes()))
+        self.assertTrue(np.array_equal(cached.getPositions(), parsed.getPositions()))
+
+    def test_lazy_columns(self):
+        store  = cache.ActivityCache(os.path.join(self.folder, 'cache'))
+        parsed = loader.loadActivities([self.filename], ['running'], progress=False, cache=store)[0]
+        lazy   = loader.loadActivities([self.filename], ['running'], progress=False, cache=store, lazy=True)[0]
+        self.assertIsNone(lazy.columns)
+        self.assertEqual(lazy.getStartPoint(), parsed.getStartPoint())
+        self.assertTrue(np.array_equal(lazy.getPositionsUTMX(), parsed.getPositionsUTMX()))
+        self.assertIsNotNone(lazy.columns)
+        ## Reading through loadedColumns leaves the activity as it was
+        lazy.unloadColumns(store)
+        with lazy.loadedColumns(): self.assertEqual(len(lazy.getTimes()), len(parsed))
+        self.assertIsNone(lazy.columns)
+        with parsed.loadedColumns(): pass
+        self.assertIsNotNone(parsed.columns)
+
+    def test_encode(self):
+        ## Only the reserved tag marks a typed value, not a key of the metadata
+        value = {'datetime': 3, 'tuple': [1], 'laps': [{'startTime': datetime(2018, 5, 1, 10, 0, 0, 500000), 'duration': timedelta(seconds=90)}], 'bounds': (1.0, (2, 3))}
+        self.assertEqual(cache.decode(json.loads(json.dumps(cache.encode(value)))), value)
+
+    def test_invalidation(self):
+        store = cache.ActivityCache(os.path.join(self.folder, 'cache'))
+        loader.loadActivities([self.filename], ['cycling'], progress=False, cache=store)
+        self.assertEqual(store.getActivityType(self.filename), 'running')
+        with open(self.filename, 'a') as stream: stream.write('\n')
+        self.assertIsNone(store.lookup(self.filename))
+        parsers.version += 1
+        try:     self.assertEqual(len(cache.ActivityCache(os.path.join(self.folder, 'cache'))), 0)
+        finally: parsers.version -= 1
+
+
+
+unittest.main(exit=False)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+import unittest
+import os, site, shutil, tempfile
+import numpy as np
+from datetime import datetime
+site.addsitedir(os.path.join(os.getcwd(), os.pardir, os.pardir))
+from lib import tools, export
+from fixtures import makeLine
+
+def twoLaps(size):
+    return {'offsets': [0, size//2, size], 'startTime': [0.0, size*2.5], 'duration': [size*2.5]*2, 'distance': [size*5.0]*2, 'calories': [50, 50]} if size else None
+
+class Tests_for_export(unittest.TestCase):
+
+    def setUp(self):
+        self.folder     = tempfile.mkdtemp()
+        self.activities = [makeLine('a.tcx', datetime(2017, 3, 1, 10), 50, laps=twoLaps(50)),
+                           makeLine('b.tcx', datetime(2018, 5, 1, 10), 20, laps=twoLaps(20)),
+                           makeLine('c.tcx', datetime(2018, 6, 1, 10), 0, laps=twoLaps(0)),
+                           makeLine('d.tcx', datetime(2017, 7, 1, 10), 30, laps=twoLaps(30))]
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_round_trip(self):
+        for engine in ['numpy']+(['parquet'] if export.pyarrow is not None else []):
+            folder = os.path.join(self.folder, engine)
+            self.assertEqual(export.exportActivities(self.activities, folder, engine=engine, batchSize=25), 4)
+            self.assertEqual(sorted(os.listdir(os.path.join(folder, 'trackpoints'))), ['year=2017', 'year=2018'])
+            dataset    = export.Dataset(folder)
+            activities = dataset.loadActivities()
+            self.assertEqual([activity.getName() for activity in activities], ['a.tcx', 'b.tcx', 'c.tcx', 'd.tcx'])
+            for original, activity in zip(self.activities, activities):
+                self.assertIsNone(activity.columns)
+                self.assertEqual(original.getMetadata(), activity.getMetadata())
+                for name in tools.Activity.columnNames:
+                    self.assertTrue(np.array_equal(original.getColumn(name), activity.getColumn(name)))
+            self.assertEqual(len(dataset.loadActivities(['cycling'])), 0)
+            ## Columns are slices of the partition, not copies
+            partition, rows = dataset.getRows(0)
+            for name, column in (('positions', 'xy'), ('positionsLatLong', 'latLong'), ('time', 't')):
+                self.assertTrue(np.shares_memory(activities[0].getColumn(name), partition[column]))
+
+    def test_refuse_foreign_folder(self):
+        with open(os.path.join(self.folder, 'notes.txt'), 'w') as stream: stream.write('keep')
+        self.assertRaises(Exception, export.DatasetWriter, self.folder)
+        self.assertTrue(os.path.exists(os.path.join(self.folder, 'notes.txt')))
+
+
+
+unittest.main(exit=False)
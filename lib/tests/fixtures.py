@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+''' Activities and tracks shared by the tests, built without XML files. '''
+import os, site, contextlib
+import numpy as np
+from datetime import timedelta
+site.addsitedir(os.path.join(os.getcwd(), os.pardir, os.pardir))
+from lib import tools, simplify
+
+def makeActivity(name, startTime, lat, lon, alt=None, time=None, activityType='Running', calories=100, distance=None, laps=None):
+    ''' Parsed activity of the trackpoint columns, set up as the importers do
+        (time in s since the start, 5 s apart by default; distance 10 m per
+        point by default). '''
+    activity = tools.ActivityTCX.fromPayload({'filename': name, 'activityType': activityType, 'calories': calories, 'startTime': startTime, 'laps': laps})
+    time     = np.arange(len(lat))*5.0 if time is None else np.asarray(time, dtype=float)
+    activity.setTrack(lat, lon, np.zeros(len(lat)) if alt is None else alt, time)
+    activity.duration = timedelta(seconds=float(time[-1]) if len(time) else 0.0)
+    activity.distance = len(lat)*10.0 if distance is None else distance
+    activity.findRemoveExessivePauses()
+    activity.summarizeSensors()
+    return activity
+
+def makeLine(name, startTime, size, origin=(45.5, -73.6), step=(1e-4, 1e-4), **kwargs):
+    ''' Activity of size points along a straight line from origin (lat, long),
+        step degrees apart (see makeActivity). '''
+    return makeActivity(name, startTime, origin[0]+np.arange(size)*step[0], origin[1]+np.arange(size)*step[1], np.arange(size, dtype=float), **kwargs)
+
+
+class Track():
+    ''' Stand-in for an activity of which only the UTM track is read; counts
+        the reads of its positions. '''
+    def __init__(self, positions, name=None, start=None):
+        self.positions = np.asarray(positions, dtype=float)
+        self.name      = name
+        self.start     = start
+        self.reads     = 0
+    def __len__(self):          return len(self.positions)
+    def getName(self):          return self.name
+    def getStartPoint(self):    return self.start
+    def getBoundingBox(self):   return (self.start[0], self.start[0], self.start[1], self.start[1])
+    def getLevels(self):        return simplify.TrackLevels(self.positions)
+    def loadedColumns(self):    return contextlib.nullcontext(self)
+    def getPositions(self):
+        self.reads += 1
+        return self.positions
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+import unittest
+import os, site, shutil, tempfile
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+site.addsitedir(os.path.join(os.getcwd(), os.pardir, os.pardir))
+from lib import heatmap
+from fixtures import Track
+
+class Region():
+    def __init__(self, name, activities):
+        self.name       = name
+        self.activities = activities
+
+class Tests_for_heatmap(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.RandomState(0)
+        self.activities = [Track(500000.0+np.cumsum(random.normal(0, 20, (2000, 2)), axis=0), name=str(ix)) for ix in range(4)]
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_histogram(self):
+        counts = heatmap.histogram([[0.5, 0.5], [1.5, 0.5], [1.5, 0.7], [9, 9]], 0, 0, 1.0, (2, 2))
+        self.assertEqual(counts.tolist(), [[1, 2], [0, 0]])
+
+    def test_pyramid(self):
+        pyramid = heatmap.TilePyramid(self.activities, tileSize=64, folder=self.folder)
+        for level in range(pyramid.maxLevel+1):
+            total = sum(pyramid.getTile(level, tx, ty).sum() for tx in range(2**level) for ty in range(2**level)) if level < 4 else None
+            if(total is not None): self.assertEqual(total, 8000)
+        self.assertTrue(pyramid.getCellSize(pyramid.maxLevel) <= 2.0)
+        self.assertEqual(len(os.listdir(pyramid.folder)), 1+1+4+16+64)
+        ## Cached tiles and geometry are read without positions
+        copy = heatmap.TilePyramid(self.activities, tileSize=64, folder=self.folder)
+        self.assertEqual(copy.folder, pyramid.folder)
+        self.assertEqual(copy.getExtent(), pyramid.getExtent())
+        self.assertTrue(np.array_equal(copy.getTile(2, 1, 1), pyramid.getTile(2, 1, 1)))
+        self.assertEqual([activity.reads for activity in self.activities], [1]*4)
+        self.assertIsNone(copy.points)
+        copy.getTile(pyramid.maxLevel, 0, 0)
+        self.assertEqual([activity.reads for activity in self.activities], [2]*4)
+        image, extent = pyramid.render(pyramid.getExtent()[:2], pyramid.getExtent()[2:], 1e6)
+        self.assertEqual(image.shape, (64, 64))
+        self.assertEqual(image.sum(), 8000)
+
+    def test_pyramid_key(self):
+        ## Tiles are keyed on the activity files, and those of an earlier key
+        ## are removed
+        tiles    = os.path.join(self.folder, 'tiles')
+        filename = os.path.join(self.folder, 'a.gpx')
+        with open(filename, 'w') as stream: stream.write('<gpx/>')
+        self.activities[0].name = filename
+        pyramid  = heatmap.TilePyramid(self.activities, tileSize=64, folder=tiles)
+        pyramid.getTile(0, 0, 0)
+        with open(filename, 'w') as stream: stream.write('<gpx></gpx>')
+        changed  = heatmap.TilePyramid(self.activities, tileSize=64, folder=tiles)
+        self.assertNotEqual(changed.folder, pyramid.folder)
+        self.assertEqual(os.listdir(tiles), [os.path.basename(changed.folder)])
+
+    def test_density_map(self):
+        figure = Figure(figsize=(4, 4), dpi=100)
+        FigureCanvasAgg(figure)
+        ax     = figure.add_subplot(111)
+        layer  = heatmap.DensityMap(Region('Montreal', self.activities), tileSize=64)
+        xMin, xMax, yMin, yMax = layer.getExtent()
+        ax.set_xlim(xMin, xMax)
+        ax.set_ylim(yMin, yMax)
+        self.assertIsNotNone(layer.plot(ax))
+        ax.callbacks.connect('xlim_changed', layer.update)
+        ax.set_xlim(xMin, xMin+(xMax-xMin)/16.0)
+        self.assertTrue(layer.view[1][1]-layer.view[1][0] < xMax-xMin)
+        figure.canvas.draw()
+
+
+
+unittest.main(exit=False)
@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+import unittest
+import os, site
+import numpy as np
+site.addsitedir(os.path.join(os.getcwd(), os.pardir, os.pardir))
+from lib import kinematics
+
+class Tests_for_kinematics(unittest.TestCase):
+
+    def test_cumulative_length(self):
+        positions = np.array([[0,0],[3,4],[3,4],[6,8]])
+        self.assertEqual(list(kinematics.cumulativeLength(positions)), [0, 5, 5, 10])
+        self.assertEqual(kinematics.totalLength(positions), 10)
+
+    def test_speeds_guard_zero_dt(self):
+        positions = np.array([[0,0],[3,4],[6,8],[9,12]])
+        self.assertEqual(list(kinematics.speeds(positions, [0, 5, 5, 10])), [1, 0, 1, 1])
+        self.assertEqual(list(kinematics.paces([0, 2])[1:]), [500])
+        self.assertTrue(np.isnan(kinematics.paces([0])[0]))
+
+
+
+unittest.main(exit=False)
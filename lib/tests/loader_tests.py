@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+import unittest
+import os, site, json, shutil, tempfile
+site.addsitedir(os.path.join(os.getcwd(), os.pardir, os.pardir))
+from lib import cache, loader
+
+GPX = '''<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>
+ <trkpt lat="45.5000" lon="-73.6000"><ele>30.0</ele><time>2018-05-01T10:00:00Z</time></trkpt>
+ <trkpt lat="45.5001" lon="-73.6001"><ele>31.0</ele><time>2018-05-01T10:00:10Z</time></trkpt>
+</trkseg></trk></gpx>
+'''
+EMPTY = '''<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg></trkseg></trk></gpx>
+'''
+UNTIMED = '''<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>
+ <trkpt lat="45.5000" lon="-73.6000"><ele>30.0</ele></trkpt>
+ <trkpt lat="45.5001" lon="-73.6001"><ele>31.0</ele></trkpt>
+</trkseg></trk></gpx>
+'''
+
+class Tests_for_loader(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.files  = {}
+        for name, text in (('good.gpx', GPX), ('empty.gpx', EMPTY), ('broken.gpx', GPX[:200])):
+            self.files[name] = os.path.join(self.folder, name)
+            with open(self.files[name], 'w') as stream: stream.write(text)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_batch_quarantine(self):
+        report     = loader.ErrorReport()
+        activities = loader.loadActivities(sorted(self.files.values()), ['running'], progress=False, report=report)
+        self.assertEqual(len(activities), 1)
+        self.assertEqual(sorted((os.path.basename(entry['file']), entry['code']) for entry in report.entries), [('broken.gpx', 'malformed'), ('empty.gpx', 'empty')])
+        summary = report.save(self.folder)
+        self.assertEqual((summary['files'], summary['loaded'], summary['quarantined']), (3, 1, 2))
+        report.save(self.folder)
+        with open(os.path.join(self.folder, 'ingest-history.jsonl')) as stream: self.assertEqual(len(stream.readlines()), 2)
+        with open(os.path.join(self.folder, 'ingest-report.json')) as stream: self.assertEqual(len(json.load(stream)['quarantined']), 2)
+
+    def test_untimed(self):
+        ## Positions without times are quarantined, not loaded without a start
+        untimed = os.path.join(self.folder, 'untimed.gpx')
+        with open(untimed, 'w') as stream: stream.write(UNTIMED)
+        report  = loader.ErrorReport()
+        self.assertEqual(loader.loadActivities([untimed], ['running'], progress=False, report=report), [])
+        self.assertEqual(report.entries[0]['code'], 'untimed')
+        ## and skipped with a warning outside batch mode, cached or not
+        store = cache.ActivityCache(os.path.join(self.folder, 'cache'))
+        for lazy in (False, True):
+            with self.assertWarns(UserWarning):
+                self.assertEqual(loader.loadActivities([untimed, self.files['good.gpx']], ['running'], progress=False, cache=store, lazy=lazy)[0].getName(), self.files['good.gpx'])
+
+    def test_limit(self):
+        ## The first accepted files in filename order are kept, over workers
+        ## too, and only the files considered are counted
+        names = []
+        for ix, text in enumerate((GPX, GPX[:200], GPX, GPX, GPX)):
+            names.append(os.path.join(self.folder, 'limit'+str(ix)+'.gpx'))
+            with open(names[-1], 'w') as stream: stream.write(text)
+        for jobs in (1, 2):
+            report     = loader.ErrorReport()
+            activities = loader.loadActivities(names, ['running'], jobs=jobs, limit=2, progress=False, report=report)
+            self.assertEqual([activity.getName() for activity in activities], [names[0], names[2]])
+            self.assertEqual((report.files, report.loaded, len(report)), (3, 2, 1))
+
+    def test_oversized(self):
+        report = loader.ErrorReport()
+        loader.loadActivities([self.files['good.gpx']], ['running'], progress=False, report=report, maxFileSize=100)
+        self.assertEqual(report.entries[0]['code'], 'oversized')
+
+    def test_cached_errors(self):
+        store = cache.ActivityCache(os.path.join(self.folder, 'cache'))
+        loader.loadActivities([self.files['broken.gpx']], ['running'], progress=False, cache=store, report=loader.ErrorReport())
+        report = loader.ErrorReport()
+        loader.loadActivities([self.files['broken.gpx']], ['running'], progress=False, cache=store, report=report)
+        self.assertTrue(report.entries[0]['cached'])
+        ## Outside batch mode the file is parsed again and raises
+        with self.assertRaises(Exception): loader.loadActivities([self.files['broken.gpx']], ['running'], progress=False, cache=store)
+
+
+
+unittest.main(exit=False)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+import unittest
+import os, site, tempfile
+import numpy as np
+site.addsitedir(os.path.join(os.getcwd(), os.pardir, os.pardir))
+from lib import tools, parsers
+
+TCX = '''<?xml version="1.0" encoding="UTF-8"?>
+<TrainingCenterDatabase xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2">
+ <Activities><Activity Sport="Running"><Id>2018-05-01T10:00:00.000Z</Id>
+  <Lap StartTime="2018-05-01T10:00:00.000Z">
+   <TotalTimeSeconds>20</TotalTimeSeconds><DistanceMeters>40</DistanceMeters><Calories>12</Calories>
+   <Track>
+    <Trackpoint><Time>2018-05-01T10:00:00.000Z</Time><Position><LatitudeDegrees>45.5000</LatitudeDegrees><LongitudeDegrees>-73.6000</LongitudeDegrees></Position><AltitudeMeters>30.0</AltitudeMeters><HeartRateBpm><Value>100</Value></HeartRateBpm></Trackpoint>
+    <Trackpoint><Time>2018-05-01T10:00:05.000Z</Time></Trackpoint>
+    <Trackpoint><Time>2018-05-01T10:00:10.000Z</Time><Position><LatitudeDegrees>45.5001</LatitudeDegrees><LongitudeDegrees>-73.6001</LongitudeDegrees></Position><AltitudeMeters>31.0</AltitudeMeters><HeartRateBpm><Value>110</Value></HeartRateBpm></Trackpoint>
+    <Trackpoint><Time>2018-05-01T10:00:20.000Z</Time><Position><LatitudeDegrees>45.5003</LatitudeDegrees><LongitudeDegrees>-73.6002</LongitudeDegrees></Position><AltitudeMeters>32.5</AltitudeMeters><HeartRateBpm><Value>120</Value></HeartRateBpm></Trackpoint>
+   </Track>
+  </Lap>
+ </Activity></Activities>
+</TrainingCenterDatabase>
+'''
+
+GPX = '''<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>
+ <trkpt lat="45.5000" lon="-73.6000"><ele>30.0</ele><time>2018-05-01T10:00:00Z</time></trkpt>
+ <trkpt lat="45.5001" lon="-73.6001"><ele>31.0</ele><time>2018-05-01T10:00:10Z</time></trkpt>
+ <trkpt lat="45.5003" lon="-73.6002"><ele>32.5</ele><time>2018-05-01T10:00:20Z</time></trkpt>
+</trkseg></trk></gpx>
+'''
+
+TCX_LAPS = '''<?xml version="1.0" encoding="UTF-8"?>
+<TrainingCenterDatabase xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2">
+ <Activities><Activity Sport="Running"><Id>2018-05-01T10:00:00.000Z</Id>
+  <Lap StartTime="2018-05-01T10:00:00.000Z">
+   <TotalTimeSeconds>10</TotalTimeSeconds><DistanceMeters>15.5</DistanceMeters><Calories>5</Calories>
+   <Track>
+    <Trackpoint><Time>2018-05-01T10:00:00.000Z</Time><Position><LatitudeDegrees>45.5000</LatitudeDegrees><LongitudeDegrees>-73.6000</LongitudeDegrees></Position><AltitudeMeters>30.0</AltitudeMeters></Trackpoint>
+    <Trackpoint><Time>2018-05-01T10:00:10.000Z</Time><Position><LatitudeDegrees>45.5001</LatitudeDegrees><LongitudeDegrees>-73.6001</LongitudeDegrees></Position><AltitudeMeters>31.0</AltitudeMeters></Trackpoint>
+   </Track>
+  </Lap>
+  <Lap StartTime="2018-05-01T10:00:30.000Z">
+   <TotalTimeSeconds>20.5</TotalTimeSeconds><DistanceMeters>30</DistanceMeters><Calories>7</Calories>
+   <Track>
+    <Trackpoint><Time>2018-05-01T10:00:30.000Z</Time><Position><LatitudeDegrees>45.5003</LatitudeDegrees><LongitudeDegrees>-73.6002</LongitudeDegrees></Position><AltitudeMeters>32.5</AltitudeMeters></Trackpoint>
+    <Trackpoint><Time>2018-05-01T10:00:40.000Z</Time></Trackpoint>
+    <Trackpoint><Time>2018-05-01T10:00:50.000Z</Time><Position><LatitudeDegrees>45.5005</LatitudeDegrees><LongitudeDegrees>-73.6003</LongitudeDegrees></Position><AltitudeMeters>33.0</AltitudeMeters></Trackpoint>
+   </Track>
+  </Lap>
+ </Activity></Activities>
+</TrainingCenterDatabase>
+'''
+
+GPX_SEGMENTS = '''<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1"><trk>
+ <trkseg>
+  <trkpt lat="45.5000" lon="-73.6000"><ele>30.0</ele><time>2018-05-01T10:00:00Z</time></trkpt>
+  <trkpt lat="45.5001" lon="-73.6001"><ele>31.0</ele><time>2018-05-01T10:00:10Z</time></trkpt>
+ </trkseg>
+ <trkseg>
+  <trkpt lat="45.6000" lon="-73.6000"><ele>30.0</ele><time>2018-05-01T11:00:00Z</time></trkpt>
+  <trkpt lat="45.6001" lon="-73.6001"><ele>31.0</ele><time>2018-05-01T11:00:10Z</time></trkpt>
+ </trkseg>
+</trk></gpx>
+'''
+
+def writeTemp(content, suffix):
+    handle, filename = tempfile.mkstemp(suffix=suffix)
+    with os.fdopen(handle, 'w') as stream: stream.write(content)
+    return filename
+
+class Tests_for_parsers(unittest.TestCase):
+
+    def test_track_buffer_growth(self):
+        track = parsers.TrackBuffer(['a', 'b'], capacity=2)
+        for i in range(5):
+            track.set('a', i)
+            if(i % 2): track.set('b', i)
+            track.commit()
+        columns = track.finalize()
+        self.assertEqual(list(columns['a']), [0, 1, 2, 3, 4])
+        self.assertTrue(np.isnan(columns['b'][0]))
+        self.assertEqual(columns['b'][3], 3)
+
+    def test_tcx_columns(self):
+        filename = writeTemp(TCX, '.tcx')
+        data = parsers.parseTCX(filename)
+        os.remove(filename)
+        self.assertEqual(data['activityType'], 'Running')
+        self.assertEqual(data['calories'], 12)
+        self.assertEqual(list(data['time']), [0.0, 10.0, 20.0])
+        self.assertEqual(list(data['hr']), [100.0, 110.0, 120.0])
+
+    def test_gpx_engines_match(self):
+        filename = writeTemp(GPX, '.gpx')
+        stream = tools.ActivityGPX(filename)
+        dom    = tools.ActivityGPX(filename, engine='minidom')
+        os.remove(filename)
+        self.assertTrue(np.allclose(stream.getPositions(), dom.getPositions()))
+        self.assertTrue(np.array_equal(stream.getPositionsAlt(), dom.getPositionsAlt()))
+        self.assertTrue(np.array_equal(stream.getSpeeds(), dom.getSpeeds()))
+        self.assertEqual(stream.getDuration(), dom.getDuration())
+        self.assertEqual(stream.getDistance(), dom.getDistance())
+
+    def test_tcx_laps(self):
+        filename = writeTemp(TCX_LAPS, '.tcx')
+        stream = tools.ActivityTCX(filename)
+        dom    = tools.ActivityTCX(filename, engine='minidom')
+        os.remove(filename)
+        for activity in (stream, dom):
+            self.assertEqual(activity.getLapCount(), 2)
+            self.assertEqual(activity.getLaps()['offsets'], [0, 2, 4])
+            self.assertEqual(activity.getLaps()['startTime'], [0.0, 30.0])
+            self.assertEqual((activity.getCalories(), activity.getDistance()), (12, 45))
+            self.assertEqual(activity.getDuration().total_seconds(), 30)
+            self.assertEqual(list(activity.getLapColumn(1, 'time')), [30.0, 50.0])
+        self.assertTrue(np.shares_memory(stream.getLapColumn(1, 'time'), stream.getTimes()))
+
+    def test_tcx_sensors(self):
+        tpx = TCX_LAPS.replace('<AltitudeMeters>31.0</AltitudeMeters>', '<AltitudeMeters>31.0</AltitudeMeters><Cadence>80</Cadence><Extensions><ns3:TPX xmlns:ns3="http://www.garmin.com/xmlschemas/ActivityExtension/v2"><ns3:Speed>4.5</ns3:Speed><ns3:Watts>210</ns3:Watts></ns3:TPX></Extensions>')
+        filename = writeTemp(tpx, '.tcx')
+        stream = tools.ActivityTCX(filename)
+        dom    = tools.ActivityTCX(filename, engine='minidom')
+        os.remove(filename)
+        for activity in (stream, dom):
+            self.assertIsNone(activity.getHeartRate())
+            self.assertEqual(activity.getPower().dtype, np.float32)
+            self.assertTrue(np.array_equal(activity.getPower(), [np.nan, 210, np.nan, np.nan], equal_nan=True))
+            self.assertEqual(activity.getCadence()[1], 80)
+            self.assertEqual(activity.getSensor('sensorSpeed')[1], 4.5)
+        payload = stream.getPayload()
+        self.assertTrue('power' in payload and 'heartRate' not in payload)
+        self.assertTrue(np.array_equal(tools.ActivityTCX.fromPayload(payload).getPower(), stream.getPower(), equal_nan=True))
+
+    def test_gpx_segments(self):
+        filename = writeTemp(GPX_SEGMENTS, '.gpx')
+        stream = tools.ActivityGPX(filename)
+        dom    = tools.ActivityGPX(filename, engine='minidom')
+        os.remove(filename)
+        for activity in (stream, dom):
+            self.assertEqual(activity.getLaps()['offsets'], [0, 2, 4])
+            self.assertEqual(activity.getLaps()['duration'], [10.0, 10.0])
+            ## The gap between segments does not count
+            self.assertAlmostEqual(activity.getDistance(), 2*activity.getLaps()['distance'][0], places=0)
+            self.assertTrue(activity.getDistance() < 100)
+
+
+
+unittest.main(exit=False)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+import unittest
+import os, site, shutil, tempfile
+from datetime import timedelta
+import numpy as np
+site.addsitedir(os.path.join(os.getcwd(), os.pardir, os.pardir))
+from lib import pauses, tools, kinematics
+
+def track():
+    ''' 1 Hz track: 60 s standing with 2 m jitter, 300 s at 3 m/s, a 120 s
+        gap, 100 s at 3 m/s, 5 s at a traffic light, 100 s at 3 m/s and 600 s
+        standing. '''
+    random = np.random.RandomState(0)
+    time   = np.concatenate([np.arange(0, 360), np.arange(480, 1285)]).astype(float)
+    speed  = np.zeros(len(time))
+    speed[(time >= 60) & (time < 360)] = 3.0
+    speed[(time >= 480) & (time < 580)] = 3.0
+    speed[(time >= 585) & (time < 685)] = 3.0
+    x      = np.concatenate([[0.0], np.cumsum(speed[:-1]*np.diff(time))])
+    return np.stack([x, np.zeros(len(x))], axis=1)+random.uniform(-2, 2, (len(x), 2)), time
+
+class Tests_for_pauses(unittest.TestCase):
+
+    def test_summary(self):
+        positions, time = track()
+        summary = pauses.summarizePauses(positions, time)
+        self.assertEqual(summary['elapsedTime'], 1284.0)
+        ## Standing stretches at both ends and the gap; not the traffic light
+        self.assertAlmostEqual(summary['movingTime'], 505.0, delta=25.0)
+        self.assertEqual(summary['count'], 3)
+        self.assertAlmostEqual(summary['idleStart'], 60.0, delta=15.0)
+        self.assertAlmostEqual(summary['idleEnd'], 600.0, delta=15.0)
+        self.assertAlmostEqual(time[summary['first']], 60.0, delta=15.0)
+
+    def test_intervals(self):
+        starts, stops = pauses.pauseIntervals(np.array([True, False, False, True, True]))
+        self.assertEqual(list(starts), [0, 3])
+        self.assertEqual(list(stops), [1, 5])
+        self.assertEqual(pauses.movingRange(np.array([True, False, False, True, True])), (1, 3))
+        self.assertEqual(pauses.summarizePauses(np.zeros((0, 2)), np.zeros(0))['movingTime'], 0.0)
+
+
+    def test_trim(self):
+        positions, time = track()
+        lat, lon = 45.5+positions[:,1]/111000.0, -73.6+positions[:,0]/78000.0
+        folder   = tempfile.mkdtemp()
+        filename = os.path.join(folder, 'ride.gpx')
+        with open(filename, 'w') as stream:
+            stream.write('<gpx xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>')
+            for ix in range(len(time)): stream.write('<trkpt lat="'+str(lat[ix])+'" lon="'+str(lon[ix])+'"><ele>0</ele><time>2018-05-01T10:'+str(int(time[ix])//60).zfill(2)+':'+str(int(time[ix])%60).zfill(2)+'Z</time></trkpt>')
+            stream.write('</trkseg></trk></gpx>')
+        try:
+            full = tools.ActivityGPX(filename)
+            tools.trimIdle = True
+            trimmed = tools.ActivityGPX(filename)
+        finally:
+            tools.trimIdle = False
+            shutil.rmtree(folder)
+        self.assertFalse(full.getPauses()['trimmed'])
+        self.assertTrue(trimmed.getPauses()['trimmed'])
+        self.assertEqual(trimmed.getTimes()[0], 0.0)
+        self.assertEqual(trimmed.getStartTime()-full.getStartTime(), full.getElapsedTime()-trimmed.getElapsedTime()-timedelta(seconds=full.getPauses()['idleEnd']))
+        self.assertLess(trimmed.getDuration(), timedelta(seconds=700))
+        self.assertAlmostEqual(trimmed.getMovingTime().total_seconds(), full.getMovingTime().total_seconds(), delta=5.0)
+        self.assertEqual(trimmed.getLaps()['offsets'], [0, len(trimmed)])
+        ## Laps and totals lose the time and distance of the points cut
+        self.assertAlmostEqual(trimmed.getLaps()['duration'][0], trimmed.getTimes()[-1])
+        self.assertAlmostEqual(trimmed.getLaps()['distance'][0], kinematics.totalLength(trimmed.getPositions()))
+        self.assertAlmostEqual(trimmed.getDistance(), trimmed.getLaps()['distance'][0])
+        self.assertLess(trimmed.getDistance(), full.getDistance())
+        self.assertAlmostEqual(trimmed.getDuration().total_seconds(), trimmed.getTimes()[-1])
+
+
+
+unittest.main(exit=False)
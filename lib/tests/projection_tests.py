@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+import unittest
+import os, site
+import numpy as np
+import utm
+site.addsitedir(os.path.join(os.getcwd(), os.pardir, os.pardir))
+from lib import projection
+
+class Tests_for_projection(unittest.TestCase):
+
+    def test_matches_scalar_path(self):
+        for lat0, lon0 in [(45.5, -73.6), (-33.9, 151.2), (60.1, 5.0)]:
+            lat = lat0+np.linspace(0, 0.2, 50)
+            lon = lon0+np.linspace(0, 0.2, 50)
+            scalar = np.array([utm.from_latlon(lat[ix], lon[ix])[:2] for ix in range(len(lat))])
+            self.assertTrue(np.allclose(projection.fromLatLon(lat, lon), scalar, rtol=0, atol=1e-6))
+
+    def test_zone_fixed_from_first_point(self):
+        lat = np.array([45.0, 45.0])
+        lon = np.array([-72.1, -71.9])
+        zone = projection.getZone(lat[0], lon[0])
+        forced = utm.from_latlon(lat[1], lon[1], force_zone_number=zone[0])[:2]
+        self.assertTrue(np.allclose(projection.fromLatLon(lat, lon)[1], forced, rtol=0, atol=1e-6))
+
+    def test_zone_matches_utm(self):
+        for lat, lon in [(45.5, -73.6), (-33.9, 151.2), (60.0, 5.0), (78.2, 15.6), (78.2, 8.9), (0.0, 180.0), (84.0, 0.0)]:
+            self.assertEqual(projection.getZone(lat, lon), utm.from_latlon(lat, lon)[2:])
+
+    @unittest.skipIf(projection.pyproj is None, 'pyproj is not installed')
+    def test_pyproj_engine(self):
+        lat = 45.5+np.linspace(0, 0.2, 50)
+        lon = -73.6+np.linspace(0, 0.2, 50)
+        self.assertTrue(np.allclose(projection.fromLatLon(lat, lon, engine='pyproj'), projection.fromLatLon(lat, lon), rtol=0, atol=0.01))
+
+
+
+unittest.main(exit=False)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+import unittest
+import os, site
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+site.addsitedir(os.path.join(os.getcwd(), os.pardir, os.pardir))
+from lib import render
+from fixtures import Track
+
+class Tests_for_render(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.RandomState(0)
+        self.activities = [Track(np.cumsum(random.normal(0, 5, (size, 2)), axis=0)) for size in (300, 1, 800)]
+
+    def test_collection(self):
+        tracks   = render.TrackCollection(self.activities)
+        segments = tracks.collection.get_segments()
+        self.assertEqual(len(segments), 3)
+        for ix, activity in enumerate(self.activities):
+            self.assertTrue(np.array_equal(segments[ix], activity.getPositions()))
+            self.assertTrue(np.array_equal(tracks.getTrack(ix), activity.getPositions()))
+        coarse = tracks.getSegments(1000.0)
+        self.assertTrue(np.array_equal(coarse[2], self.activities[2].getLevels().getPositions(self.activities[2].getPositions(), 1000.0)))
+        self.assertTrue(sum(len(segment) for segment in coarse) < len(tracks.buffer))
+
+    def test_update_and_highlight(self):
+        figure = Figure()
+        FigureCanvasAgg(figure)
+        ax     = figure.add_subplot(111)
+        tracks = render.TrackCollection(self.activities)
+        ax.add_collection(tracks.collection)
+        ax.callbacks.connect('xlim_changed', tracks.update)
+        xMin, xMax, yMin, yMax = tracks.getExtent()
+        ax.set_xlim(xMin, xMax+1e6)
+        self.assertTrue(sum(len(segment) for segment in tracks.collection.get_segments()) < len(tracks.buffer))
+        self.assertFalse(tracks.update(ax))
+
+        highlight = render.Highlight(ax)
+        figure.canvas.draw()
+        self.assertIsNotNone(highlight.background)
+        highlight.show(tracks.getTrack(2), 'track')
+        self.assertTrue(highlight.line.get_visible())
+        self.assertEqual(highlight.label.get_text(), 'track')
+        highlight.hide()
+        self.assertFalse(highlight.line.get_visible())
+
+
+
+unittest.main(exit=False)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+import unittest
+import os, site
+from datetime import datetime
+import numpy as np
+site.addsitedir(os.path.join(os.getcwd(), os.pardir, os.pardir))
+from lib import routes, synthetic
+from fixtures import makeActivity
+
+def frechetReference(a, b):
+    ''' Textbook recursive discrete Frechet distance. '''
+    coupling = np.zeros((len(a), len(b)))
+    for i in range(len(a)):
+        for j in range(len(b)):
+            distance = np.hypot(*(a[i]-b[j]))
+            if(i == 0 and j == 0): coupling[i,j] = distance
+            elif(i == 0):          coupling[i,j] = max(coupling[i,j-1], distance)
+            elif(j == 0):          coupling[i,j] = max(coupling[i-1,j], distance)
+            else:                  coupling[i,j] = max(min(coupling[i-1,j], coupling[i,j-1], coupling[i-1,j-1]), distance)
+    return coupling[-1,-1]
+
+class Tests_for_routes(unittest.TestCase):
+
+    def setUp(self):
+        ## Two routes followed three times each, with GPS noise and varying pace
+        self.activities = []
+        for route in range(2):
+            base = synthetic.makeTrack(600, seed=10+route)
+            for ix in range(3):
+                random = np.random.RandomState(ix)
+                track  = dict(base, lat=base['lat']+random.normal(0, 2e-5, 600), lon=base['lon']+random.normal(0, 2e-5, 600),
+                              time=base['time']*(1+0.1*ix), start=datetime(2018, 1, 1+ix+3*route))
+                self.activities.append(makeActivity('route'+str(route)+'-'+str(ix), track['start'], track['lat'], track['lon'], track['alt'], track['time'], calories=0, distance=float(track['steps'].sum())))
+
+    def test_resample(self):
+        positions = np.array([[0.0, 0.0], [100.0, 0.0], [100.0, 60.0]])
+        points, times = routes.resample(positions, [0.0, 10.0, 16.0], spacing=25.0)
+        self.assertEqual(len(points), 8)
+        self.assertTrue(np.allclose(points[1], [25.0, 0.0]))
+        self.assertTrue(np.allclose(points[-1], [100.0, 60.0]))
+        self.assertAlmostEqual(times[4], 10.0)
+        self.assertLessEqual(len(routes.resample(positions, [0.0, 10.0, 16.0], spacing=1.0, maxPoints=20)[0]), 20)
+
+    def test_distances(self):
+        random = np.random.RandomState(0)
+        a, b   = random.uniform(0, 100, (30, 2)), random.uniform(0, 100, (20, 2))
+        self.assertAlmostEqual(routes.frechet(a, b), frechetReference(a, b))
+        self.assertGreater(routes.frechet(a, b, limit=1.0), 1.0)
+        self.assertLessEqual(routes.hausdorff(a, b), routes.frechet(a, b))
+        ## Over several blocks of points too
+        c, d   = random.uniform(0, 100, (150, 2)), random.uniform(0, 100, (90, 2))
+        self.assertAlmostEqual(routes.hausdorff(c, d), max(routes.pairwiseDistances(c, d).min(axis=1).max(), routes.pairwiseDistances(c, d).min(axis=0).max()))
+        self.assertGreater(routes.hausdorff(c, d, limit=1.0), 1.0)
+        ## The same loop run backwards is another route, unless direction is ignored
+        self.assertGreater(routes.frechet(a, a[::-1]), 0.0)
+        self.assertEqual(routes.hausdorff(a, a[::-1]), 0.0)
+
+    def test_find_routes(self):
+        found = routes.findRoutes(self.activities)
+        self.assertEqual(sorted(route.members for route in found), [[0, 1, 2], [3, 4, 5]])
+        stats = found[0].getStatistics(self.activities)
+        self.assertEqual(stats['count'], 3)
+        self.assertEqual(stats['best'], 599.0)
+        self.assertIn(stats['fastest'], (0, 3))
+        self.assertEqual(len(routes.RouteIndex(metric='hausdorff').addActivities(self.activities)), 2)
+
+    def test_segment(self):
+        latLong = self.activities[0].getColumn('positionsLatLong')
+        segment = routes.Segment('Climb', latLong[100], latLong[400])
+        efforts = segment.findEfforts(self.activities[1])
+        self.assertEqual(len(efforts), 1)
+        self.assertAlmostEqual(efforts[0][0], 330.0, delta=15.0)
+        stats   = segment.getStatistics(self.activities)
+        self.assertEqual(stats['count'], 3)
+        self.assertEqual(stats['fastest'], 0)
+
+
+
+unittest.main(exit=False)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+import unittest
+import os, site, shutil, tempfile
+site.addsitedir(os.path.join(os.getcwd(), os.pardir, os.pardir))
+from lib import scanner
+
+class Tests_for_scanner(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.folder, 'device', '2024'))
+        for name in ('a.tcx', 'notes.txt', os.path.join('device', 'b.GPX'), os.path.join('device', '2024', 'c.tcx')):
+            with open(os.path.join(self.folder, name), 'w') as stream: stream.write(name)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_scan_recursive(self):
+        files = scanner.scanFiles(self.folder, ('.tcx', '.gpx'))
+        self.assertEqual(sorted(os.path.relpath(name, self.folder) for name in files),
+                         sorted(['a.tcx', os.path.join('device', 'b.GPX'), os.path.join('device', '2024', 'c.tcx')]))
+        self.assertEqual(files[os.path.join(self.folder, 'a.tcx')][0], 5)
+
+    def test_manifest_diff(self):
+        filename = os.path.join(self.folder, 'cache', 'files.json')
+        manifest = scanner.FileManifest(filename)
+        files    = scanner.scanFiles(self.folder, ('.tcx', '.gpx'))
+        self.assertEqual(len(manifest.diff(files)[0]), 3)
+        manifest.update(files)
+
+        os.remove(os.path.join(self.folder, 'a.tcx'))
+        with open(os.path.join(self.folder, 'device', 'b.GPX'), 'a') as stream: stream.write('more')
+        with open(os.path.join(self.folder, 'd.tcx'), 'w') as stream: stream.write('d')
+        added, changed, removed = scanner.FileManifest(filename).diff(scanner.scanFiles(self.folder, ('.tcx', '.gpx')))
+        self.assertEqual(added,   [os.path.join(self.folder, 'd.tcx')])
+        self.assertEqual(changed, [os.path.join(self.folder, 'device', 'b.GPX')])
+        self.assertEqual(removed, [os.path.join(self.folder, 'a.tcx')])
+
+
+
+unittest.main(exit=False)
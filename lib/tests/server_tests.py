@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+import unittest
+import os, site, json, time, asyncio
+from datetime import datetime
+site.addsitedir(os.path.join(os.getcwd(), os.pardir, os.pardir))
+from lib import tools, server
+from fixtures import makeLine
+
+def makeNorthward(name, startTime, size, **kwargs):
+    ''' Activity heading north, 1e-4 degree per point (see makeLine). '''
+    return makeLine(name, startTime, size, step=(1e-4, 0.0), **kwargs)
+
+class Tests_for_server(unittest.TestCase):
+
+    def setUp(self):
+        self.activities = [makeNorthward('a.tcx', datetime(2017, 3, 1, 10), 50),
+                           makeNorthward('b.tcx', datetime(2018, 5, 1, 10), 20, origin=(45.5, -73.59), activityType='Biking'),
+                           makeNorthward('c.tcx', datetime(2018, 6, 1, 10), 0),
+                           makeNorthward('d.tcx', datetime(2017, 7, 1, 10), 30, origin=(46.8, -71.2))]
+        self.regions    = {'Montreal': tools.Region('Montreal', latLim=[45.0, 46.0], longLim=[-74.0, -73.0])}
+        self.server     = server.Server(self.activities, self.regions, detailCacheSize=2)
+
+    def test_stats(self):
+        status, stats = self.server.respond('/stats', {})
+        self.assertEqual(status, 200)
+        self.assertEqual(stats['all']['count'], 4)
+        self.assertEqual(stats['regions']['Montreal']['count'], 2)
+        self.assertEqual(stats['monthly']['2017'][2], 1)
+        self.assertEqual(self.server.respond('/stats', {'region': 'Montreal', 'year': '2018'})[1]['count'], 1)
+        self.assertEqual(self.server.respond('/stats', {'type': 'biking'})[1]['distance'], 200.0)
+        self.assertRaises(server.QueryError, self.server.respond, '/stats', {'region': 'Quebec'})
+        self.assertRaises(server.QueryError, self.server.respond, '/stats', {'year': 'last'})
+
+    def test_activities_and_details(self):
+        listing = self.server.respond('/activities', {'region': 'Montreal'})[1]
+        self.assertEqual([activity['name'] for activity in listing], ['a.tcx', 'b.tcx'])
+        ids    = [server.activityId(activity) for activity in self.activities]
+        self.assertEqual([activity['id'] for activity in listing], ids[:2])
+        self.assertEqual(self.server.respond('/activities/'+ids[3], {})[1]['points'], 30)
+        arrays = self.server.respond('/activities/'+ids[0]+'/arrays', {'columns': 'time,positions'})[1]
+        self.assertEqual(arrays['time'], self.activities[0].getTimes().tolist())
+        self.assertEqual(len(arrays['positions']), 50)
+        for ix in (0, 1, 3): self.server.respond('/activities/'+ids[ix]+'/arrays', {})
+        self.assertEqual(self.server.details.getStatus(), {'size': 2, 'maxSize': 2, 'hits': 1, 'misses': 3})
+        self.assertEqual(list(self.server.details.entries), ['b.tcx', 'd.tcx'])
+        for path in ('/activities/9', '/activities/'+ids[0]+'/laps', '/unknown'):
+            self.assertRaises(server.QueryError, self.server.respond, path, {})
+        self.assertRaises(server.QueryError, self.server.respond, '/activities/'+ids[0]+'/arrays', {'columns': 'power'})
+
+    def test_nearest(self):
+        self.assertEqual(self.server.respond('/nearest', {'lat': '45.502', 'lon': '-73.5902'})[1]['name'], 'b.tcx')
+        self.assertEqual(self.server.respond('/nearest', {'lat': '46.9', 'lon': '-71.2'})[1]['name'], 'd.tcx')
+        self.assertRaises(server.QueryError, self.server.respond, '/nearest', {'lat': '45.5'})
+
+    def test_nearest_across_zones(self):
+        ## Far queries are answered from the bounding boxes of the zone grids
+        activities = self.activities+[makeNorthward('p.tcx', datetime(2018, 7, 1, 10), 2000, origin=(48.85, 2.35))]
+        snapshot   = server.Snapshot(activities)
+        start      = time.time()
+        self.assertEqual(activities[snapshot.nearest(48.86, 2.36)[0]].getName(), 'p.tcx')
+        self.assertEqual(activities[snapshot.nearest(45.51, -73.6)[0]].getName(), 'a.tcx')
+        self.assertIsNotNone(snapshot.nearest(10.0, 100.0)[0])
+        self.assertLess(time.time()-start, 5.0)
+
+    def test_refresh_and_http(self):
+        added = makeNorthward('e.tcx', datetime(2019, 1, 1, 10), 10)
+        previous = self.server.snapshot
+        key      = server.activityId(self.activities[3])
+        self.server.respond('/activities/'+server.activityId(self.activities[1])+'/arrays', {})
+        ## A new file sorted first does not change the ids of the others
+        self.server.refresh = lambda activities: [added]+activities
+        self.server.swap(self.server.update())
+        self.assertEqual(self.server.respond('/activities/'+key, {})[1]['name'], 'd.tcx')
+        self.assertEqual(self.server.respond('/status', {})[1]['activities'], 5)
+        ## Only the new track is read; the grid of the other zone is kept
+        self.assertEqual(self.server.snapshot.loaded, 1)
+        self.assertIs(self.server.snapshot.grids[tuple(self.activities[3].UTMZone)][1], previous.grids[tuple(self.activities[3].UTMZone)][1])
+        modified = makeNorthward('b.tcx', datetime(2018, 5, 1, 10), 25, origin=(45.6, -73.59))
+        self.server.refresh = lambda activities: [modified if activity.getName() == 'b.tcx' else activity for activity in activities]
+        self.server.swap(self.server.update())
+        ## The detail arrays of the replaced activity are dropped
+        self.assertEqual(len(self.server.details), 0)
+        self.assertEqual(self.server.snapshot.loaded, 1)
+        self.assertEqual(self.server.respond('/nearest', {'lat': '45.601', 'lon': '-73.59'})[1]['name'], 'b.tcx')
+        self.assertEqual(self.server.respond('/nearest', {'lat': '45.5049', 'lon': '-73.6'})[1]['name'], 'a.tcx')
+        async def request(path):
+            instance = await self.server.start(port=0)
+            reader, writer = await asyncio.open_connection('127.0.0.1', instance.port)
+            writer.write(('GET '+path+' HTTP/1.1\r\nHost: localhost\r\n\r\n').encode('latin-1'))
+            response = await reader.read()
+            writer.close()
+            await instance.stop()
+            return response
+        head, body = asyncio.run(request('/stats?year=2019')).split(b'\r\n\r\n', 1)
+        self.assertTrue(head.startswith(b'HTTP/1.1 200 OK'))
+        self.assertEqual(json.loads(body.decode('utf-8'))['count'], 1)
+        head, body = asyncio.run(request('/activities/42')).split(b'\r\n\r\n', 1)
+        self.assertTrue(head.startswith(b'HTTP/1.1 404'))
+        self.assertIn('error', json.loads(body.decode('utf-8')))
+
+
+
+unittest.main(exit=False)
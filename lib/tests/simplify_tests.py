@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+import unittest
+import os, site
+import numpy as np
+site.addsitedir(os.path.join(os.getcwd(), os.pardir, os.pardir))
+from lib import simplify
+
+class Tests_for_simplify(unittest.TestCase):
+
+    def test_douglas_peucker_tolerance(self):
+        random = np.random.RandomState(0)
+        track  = np.cumsum(random.normal(0, 5, (2000, 2)), axis=0)
+        for tolerance in simplify.tolerances:
+            kept = simplify.douglasPeucker(track, tolerance)
+            self.assertEqual((kept[0], kept[-1]), (0, len(track)-1))
+            for start, end in zip(kept[:-1], kept[1:]):
+                if(end-start > 1): self.assertTrue(simplify.segmentDistances(track[start+1:end], track[start], track[end]).max() <= tolerance)
+        self.assertEqual(list(simplify.douglasPeucker([[0, 0], [1, 0], [2, 0], [3, 0]], 0.1)), [0, 3])
+
+    def test_levels(self):
+        track  = np.cumsum(np.random.RandomState(1).normal(0, 5, (500, 2)), axis=0)
+        levels = simplify.TrackLevels(track)
+        self.assertIsNone(levels.select(1.0))
+        self.assertEqual(levels.select(60.0), 2)
+        copy = simplify.TrackLevels.fromArrays(levels.toArrays())
+        self.assertTrue(np.array_equal(copy.getPositions(track, 1000.0), levels.getPositions(track, 1000.0)))
+        self.assertTrue(len(levels.getPositions(track, 1000.0)) < len(levels.getPositions(track, 3.0)) < len(track))
+
+
+
+unittest.main(exit=False)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+import unittest
+import os, site, time
+import numpy as np
+site.addsitedir(os.path.join(os.getcwd(), os.pardir, os.pardir))
+from lib import spatial
+from fixtures import Track
+
+def trackDistance(point, positions):
+    a  = positions[:max(len(positions)-1, 1)]
+    ab = positions[1:]-a if len(positions) > 1 else np.zeros((1, 2))
+    norm = (ab**2).sum(axis=1)
+    t  = np.clip(((point-a)*ab).sum(axis=1)/np.where(norm > 0, norm, 1), 0, 1)
+    return np.hypot(*(a+t[:,None]*ab-point).T).min()
+
+class Tests_for_spatial(unittest.TestCase):
+
+    def test_nearest_matches_brute_force(self):
+        random = np.random.RandomState(0)
+        tracks = [Track(np.cumsum(random.normal(0, 20, (int(random.randint(1, 200)), 2)), axis=0)+random.uniform(0, 5000, 2)) for _ in range(50)]
+        tracks.append(Track([[0, 0], [5000, 5000]]))
+        grid = spatial.SegmentGrid(tracks)
+        for x, y in random.uniform(-500, 5500, (200, 2)):
+            best = [trackDistance(np.array([x, y]), track.positions) for track in tracks]
+            aIx, distance = grid.nearest(x, y)
+            self.assertAlmostEqual(distance, min(best))
+            self.assertAlmostEqual(best[aIx], min(best))
+
+    def test_nearest_far_outside_grid(self):
+        ## A 10 km wide grid of 10 m cells queried from thousands of km away
+        random = np.random.RandomState(1)
+        tracks = [Track(np.cumsum(random.normal(0, 10, (500, 2)), axis=0)+random.uniform(0, 10000, 2)) for _ in range(20)]
+        grid   = spatial.SegmentGrid(tracks, cellSize=10.0)
+        start  = time.time()
+        for x, y in [(-2e6, 3e6), (5e6, 5000.0), (5000.0, -4e6), (6e6, 6e6)]:
+            best = [trackDistance(np.array([x, y]), track.positions) for track in tracks]
+            aIx, distance = grid.nearest(x, y)
+            self.assertAlmostEqual(distance, min(best))
+            self.assertEqual(aIx, int(np.argmin(best)))
+        self.assertLess(time.time()-start, 5.0)
+        self.assertEqual(grid.nearest(-2e6, 3e6, limit=1e5), (None, np.inf))
+
+    def test_starts_within(self):
+        tracks = [Track([[0, 0]], start=(45.5, -73.6)), Track([[0, 0]], start=(48.8, 2.3)), Track([])]
+        index = spatial.ActivityIndex(tracks)
+        self.assertEqual(list(index.startsWithin([45, 46], [-74, -73])), [0])
+        self.assertEqual(list(index.intersecting([40, 50], [-80, 10])), [0, 1])
+
+
+
+unittest.main(exit=False)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+import unittest
+import os, site, shutil, tempfile
+import numpy as np
+from datetime import datetime
+site.addsitedir(os.path.join(os.getcwd(), os.pardir, os.pardir))
+from lib import tools, export, store
+from fixtures import makeLine
+
+class Tests_for_store(unittest.TestCase):
+
+    def setUp(self):
+        self.folder     = tempfile.mkdtemp()
+        self.activities = [makeLine('a.tcx', datetime(2017, 3, 1, 10), 50),
+                           makeLine('b.tcx', datetime(2018, 5, 1, 10), 20),
+                           makeLine('c.tcx', datetime(2018, 6, 1, 10), 0),
+                           makeLine('d.tcx', datetime(2017, 7, 1, 10), 30, origin=(46.8, -71.2))]
+        store.createStore(self.activities, self.folder, batchSize=25)
+        self.store = store.TrackpointStore(self.folder)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_packed_columns(self):
+        self.assertEqual(os.listdir(os.path.join(self.folder, 'trackpoints')), ['all'])
+        self.assertEqual(list(self.store.offsets), [0, 50, 70, 70, 100])
+        self.assertIsInstance(self.store.getColumn(3, 'x'), np.memmap)
+        self.assertIsInstance(self.store.getPositions(3), np.memmap)
+        for ix, original in enumerate(self.activities):
+            self.assertTrue(np.array_equal(self.store.getPositions(ix), original.getPositions()))
+            activity = self.store[ix]
+            self.assertIsNone(activity.columns)
+            self.assertEqual(original.getMetadata(), activity.getMetadata())
+            self.assertTrue(np.array_equal(activity.getTimes(), original.getTimes()))
+        self.assertRaises(Exception, store.TrackpointStore, self.folder+'-missing')
+
+    def test_window_and_region(self):
+        self.assertEqual(list(self.store.window('2018-01-01')), [1, 2])
+        self.assertEqual(list(self.store.window(None, '2017-07-01T10:00:00')), [0])
+        self.assertEqual(list(self.store.window(datetime(2017, 3, 1, 10, 4))), [0, 1, 2, 3])
+        region = tools.Region('Montreal', latLim=[45.0, 46.0], longLim=[-74.0, -73.0])
+        self.store.bindRegion(region)
+        self.assertEqual([activity.getName() for activity in region.activities], ['a.tcx', 'b.tcx'])
+        self.store.bindRegion(region, start='2018-01-01')
+        self.assertEqual([activity.getName() for activity in region.activities], ['b.tcx'])
+
+    def test_points(self):
+        ## Points 10 to 19 of a and b, and none of d
+        latLim = [45.5+9.5e-4, 45.5+19.5e-4]
+        found  = dict(self.store.iterPoints(latLim))
+        self.assertEqual(sorted(found), [0, 1])
+        self.assertEqual(list(found[0]), list(range(10, 20)))
+        self.assertEqual(self.store.countPoints(latLim, start='2018-01-01'), 10)
+        ## Points of a recorded from 100 s to 150 s after its start
+        rows = dict(self.store.iterPoints(start=datetime(2017, 3, 1, 10, 1, 40), end=datetime(2017, 3, 1, 10, 2, 30)))
+        self.assertEqual(list(rows), [0])
+        self.assertEqual(list(rows[0]), list(range(20, 30)))
+        store.chunkSize = 7
+        self.assertEqual(self.store.countPoints(latLim), 20)
+        store.chunkSize = 1000000
+        self.assertEqual(self.store.countPoints(), 100)
+
+
+
+unittest.main(exit=False)
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+import unittest
+import os, site, shutil, tempfile
+import numpy as np
+site.addsitedir(os.path.join(os.getcwd(), os.pardir, os.pardir))
+from lib import synthetic, benchmark, tools
+
+class Tests_for_synthetic(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_roundtrip(self):
+        filenames = synthetic.generateFiles(self.folder, files=2, points=300, laps=3, sensors=('hr', 'power'))
+        self.assertEqual([os.path.splitext(filename)[1] for filename in filenames], ['.tcx', '.gpx'])
+        track = synthetic.makeTrack(300, ('hr', 'power'))
+        for filename in filenames:
+            for engine in ('iterparse', 'minidom'):
+                activity = tools.activityFormats[os.path.splitext(filename)[1]](filename, engine=engine)
+                self.assertEqual(len(activity), 300)
+                self.assertEqual(activity.getLapCount(), 3)
+                self.assertIsNotNone(activity.getHeartRate())
+                self.assertIsNotNone(activity.getPower())
+                self.assertIsNone(activity.getCadence())
+                self.assertEqual(activity.getTimes()[-1], 299.0)
+        ## Same seed, same track
+        self.assertTrue(np.array_equal(activity.getHeartRate(), synthetic.makeTrack(300, ('hr', 'power'), seed=1)['hr']))
+
+    def test_benchmark(self):
+        run = benchmark.benchmark(self.folder, files=2, points=200, repeat=1, clicks=5)
+        names = [suite['name'] for suite in run['suites']]
+        self.assertIn('importXML (iterparse)', names)
+        self.assertIn('statistics tables', names)
+        self.assertEqual(run['suites'][0]['points'], 400)
+        self.assertGreater(run['suites'][0]['pointsPerSecond'], 0)
+        benchmark.saveRun(os.path.join(self.folder, 'run.json'), run)
+        speedups = benchmark.compareRuns(benchmark.loadRun(os.path.join(self.folder, 'run.json')), run)
+        self.assertAlmostEqual(speedups['statistics tables'], 1.0)
+
+
+
+unittest.main(exit=False)
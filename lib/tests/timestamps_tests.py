@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+import unittest
+import os, site
+from datetime import datetime
+import numpy as np
+site.addsitedir(os.path.join(os.getcwd(), os.pardir, os.pardir))
+from lib import timestamps
+
+def reference(year, month, day, hour=0, minute=0, second=0):
+    return (datetime(year, month, day, hour, minute, second)-datetime(1970, 1, 1)).total_seconds()
+
+class Tests_for_timestamps(unittest.TestCase):
+
+    def test_layouts(self):
+        self.assertEqual(timestamps.parseTimestamp('2018-05-01T10:00:00.000Z'), reference(2018, 5, 1, 10))
+        self.assertEqual(timestamps.parseTimestamp('2018-05-01T10:00:00Z'), reference(2018, 5, 1, 10))
+        self.assertEqual(timestamps.parseTimestamp('2018-05-01T10:00:00.250Z'), reference(2018, 5, 1, 10)+0.25)
+        self.assertEqual(timestamps.parseTimestamp('2018-05-01T12:30:00+02:30'), reference(2018, 5, 1, 10))
+        self.assertEqual(timestamps.parseTimestamp('2016-02-29T05:00:00-0500'), reference(2016, 2, 29, 10))
+        self.assertEqual(timestamps.parseTimestamp('2018-05-01'), reference(2018, 5, 1))
+
+    def test_column(self):
+        texts = ['1999-12-31T23:59:59.500Z', '2000-03-01T00:00:00.125Z', '2024-02-29T12:00:00.000Z']
+        expected = [timestamps.parseTimestamp(text) for text in texts]
+        self.assertEqual(list(timestamps.parseTimestamps(texts)), expected)
+        self.assertEqual(list(timestamps.parseTimestamps(texts+['2018-05-01T10:00:00Z'])), expected+[reference(2018, 5, 1, 10)])
+        self.assertEqual(timestamps.toDatetime64(expected)[1], np.datetime64('2000-03-01T00:00:00.125'))
+
+
+
+unittest.main(exit=False)
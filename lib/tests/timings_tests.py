@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+import unittest
+import os, site, json, time, shutil, tempfile
+site.addsitedir(os.path.join(os.getcwd(), os.pardir, os.pardir))
+from lib import timings, loader, synthetic
+
+class Tests_for_timings(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_stages(self):
+        run = timings.Timings(profile='sleep', profileFolder=self.folder)
+        for _ in range(2):
+            with run.stage('sleep') as stage:
+                time.sleep(0.01)
+                stage['files'] = 3
+        totals = run.getStageTotals()
+        self.assertEqual([total['name'] for total in totals], ['sleep'])
+        self.assertEqual((totals[0]['runs'], totals[0]['files']), (2, 6))
+        self.assertGreaterEqual(totals[0]['wall'], 0.02)
+        self.assertLess(totals[0]['cpu'], totals[0]['wall'])
+        self.assertEqual(len(run.profiles), 1)
+        self.assertTrue(os.path.exists(os.path.join(self.folder, 'profile-sleep.prof')))
+
+    def test_files(self):
+        filenames = synthetic.generateFiles(self.folder, files=3, points=200)
+        run = timings.Timings()
+        loader.loadActivities(filenames, ['running'], progress=False, timings=run)
+        self.assertEqual(len(run.files), 3)
+        self.assertEqual(run.slowestFiles(1)[0]['wall'], max(record['wall'] for record in run.files))
+        self.assertEqual(run.files[0]['points'], 200)
+        names = [total['name'] for total in run.getStageTotals()]
+        self.assertIn('load/xml', names)
+        self.assertIn('load/projection', names)
+        run.saveTrace(os.path.join(self.folder, 'trace.json'))
+        with open(os.path.join(self.folder, 'trace.json')) as stream: events = json.load(stream)['traceEvents']
+        self.assertEqual([event['ph'] for event in events], ['X']*3)
+        self.assertEqual(events[0]['tid'], os.getpid())
+
+
+
+unittest.main(exit=False)
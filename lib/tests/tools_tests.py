@@ -1,14 +1,20 @@
 #!/usr/bin/env python
 import unittest
-import os, site
+import os, sys, site, subprocess
 import numpy as np
-site.addsitedir(os.path.join(os.getcwd(), os.pardir))
-import tools
+site.addsitedir(os.path.join(os.getcwd(), os.pardir, os.pardir))
+from lib import tools
 
 class Tests_for_comp(unittest.TestCase):
 
     def test_flatten_list(self):
-        self.assertEqual(tools.closestPoint((10,10), np.array([[1,2],[9,9],[2,2],[5,3],[19,19]])), 1)
+        self.assertEqual(tools.closestPoint((10,10), np.array([[1,2],[9,9],[2,2],[5,3],[19,19]])), 2)
+
+    def test_headless_import(self):
+        ## The parsing, cache and statistics core must not load any GUI package
+        code    = 'import sys, lib.tools, lib.loader, lib.aggregate, lib.routes; print([name for name in ("matplotlib", "PIL", "tkinter") if name in sys.modules])'
+        output  = subprocess.check_output([sys.executable, '-c', code], cwd=os.path.join(os.getcwd(), os.pardir, os.pardir))
+        self.assertEqual(output.strip(), b'[]')
 
 
 
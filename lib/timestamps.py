@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+## Dependancies
+#Native
+from datetime import datetime, timedelta
+#Packages
+import numpy as np
+
+
+###############################################################################
+## ISO-8601 timestamp decoding
+###############################################################################
+epoch = datetime(1970, 1, 1)
+
+def daysFromCivil(year, month, day):
+    ''' Days since 1970-01-01 of a proleptic Gregorian date. Works on ints and
+        on NumPy integer arrays alike. '''
+    if(isinstance(month, np.ndarray)): shift = np.where(month > 2, -3, 9)
+    else:                              shift = -3 if month > 2 else 9
+    year  = year-(month <= 2)
+    era   = year//400
+    yoe   = year-era*400
+    doy   = (153*(month+shift)+2)//5+day-1
+    doe   = yoe*365+yoe//4-yoe//100+doy
+    return era*146097+doe-719468
+
+def parseOffset(suffix):
+    ''' UTC offset in seconds of a 'Z', '+HH:MM', '+HHMM' or '+HH' suffix, or
+        None if suffix is not one of those. '''
+    if(suffix in ('', 'Z', 'z')): return 0
+    if(suffix[0] not in '+-' or not suffix[1:].replace(':','').isdigit()): return None
+    digits = suffix[1:].replace(':','')
+    if(len(digits) == 2):   offset = int(digits)*3600
+    elif(len(digits) == 4): offset = int(digits[:2])*3600+int(digits[2:])*60
+    else:                   return None
+    return -offset if suffix[0] == '-' else offset
+
+def parseTimestamp(text):
+    ''' Parse an ISO-8601 timestamp ('2018-05-01T10:00:00.123+02:00') to UTC
+        epoch seconds. Fixed-layout strings are decoded by slicing; anything
+        else goes through datetime. '''
+    if(len(text) >= 19 and text[4] == '-' and text[7] == '-' and text[10] in 'T ' and text[13] == ':' and text[16] == ':'):
+        try:
+            seconds  = daysFromCivil(int(text[0:4]), int(text[5:7]), int(text[8:10]))*86400
+            seconds += int(text[11:13])*3600+int(text[14:16])*60+int(text[17:19])
+            rest     = text[19:]
+            fraction = 0.0
+            if(rest[:1] in ('.', ',')):
+                end = 1
+                while(end < len(rest) and rest[end].isdigit()): end += 1
+                fraction = float('0.'+rest[1:end]) if end > 1 else 0.0
+                rest = rest[end:]
+            offset = parseOffset(rest)
+            if(offset is not None): return seconds+fraction-offset
+        except ValueError: pass
+    return parseTimestampGeneral(text)
+
+def parseTimestampGeneral(text):
+    ''' Slow path for layouts parseTimestamp does not decode itself. '''
+    value = datetime.fromisoformat(text.strip().replace('Z', '+00:00').replace('z', '+00:00'))
+    if(value.tzinfo is not None): value = value.replace(tzinfo=None)-value.utcoffset()
+    return (value-epoch).total_seconds()
+
+
+def parseTimestamps(texts):
+    ''' Decode a column of timestamps to a float64 array of UTC epoch seconds.
+
+        When all timestamps share the layout of the first one (the usual case
+        for a device recording), the digits are decoded for the whole column at
+        once; otherwise each timestamp is parsed individually. '''
+    if(len(texts) == 0): return np.zeros(0)
+    try:    column = np.array(texts, dtype='S')
+    except UnicodeEncodeError: column = None
+    if(column is not None and len(set(len(text) for text in texts)) == 1):
+        values = parseColumn(column.view(np.uint8).reshape(len(texts), -1), texts[0])
+        if(values is not None): return values
+    return np.array([parseTimestamp(text) for text in texts], dtype=float)
+
+def parseColumn(chars, sample):
+    ''' Vectorized decoding of an (n, width) array of ASCII codes laid out like
+        sample. Returns None if the column does not match the layout. '''
+    if(len(sample) < 19 or sample[10] not in 'T '): return None
+    for ix, separator in ((4, '-'), (7, '-'), (10, sample[10]), (13, ':'), (16, ':')):
+        if(not np.all(chars[:,ix] == ord(separator))): return None
+    fractionEnd = 19
+    if(sample[19:20] in ('.', ',')):
+        if(not np.all(chars[:,19] == ord(sample[19]))): return None
+        fractionEnd = 20
+        while(fractionEnd < len(sample) and sample[fractionEnd].isdigit()): fractionEnd += 1
+    offset = parseOffset(sample[fractionEnd:])
+    if(offset is None or not np.all(chars[:,fractionEnd:] == chars[0,fractionEnd:])): return None
+    digitColumns = [ix for ix in range(fractionEnd) if ix not in (4, 7, 10, 13, 16, 19)]
+    digits = chars[:,digitColumns].astype(np.int64)-ord('0')
+    if(np.any((digits < 0) | (digits > 9))): return None
+
+    def number(start, end): return digits[:,start:end].dot(10**np.arange(end-start-1, -1, -1))
+    seconds = daysFromCivil(number(0, 4), number(4, 6), number(6, 8))*86400
+    seconds = seconds+number(8, 10)*3600+number(10, 12)*60+number(12, 14)-offset
+    values  = seconds.astype(float)
+    if(digits.shape[1] > 14): values += number(14, digits.shape[1])/float(10**(digits.shape[1]-14))
+    return values
+
+
+def toDatetime(seconds):
+    ''' Naive UTC datetime of epoch seconds. '''
+    return epoch+timedelta(seconds=float(seconds))
+
+def toDatetime64(seconds):
+    ''' datetime64[ms] array of an array of epoch seconds. '''
+    return (np.round(np.asarray(seconds, dtype=float)*1000)).astype('int64').astype('datetime64[ms]')
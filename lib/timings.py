@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+
+## Dependancies
+#Native
+import os, sys, time, json, cProfile, pstats
+from contextlib import contextmanager
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+###############################################################################
+## Pipeline instrumentation
+###############################################################################
+## Wall time (s) spent in each named section of this process since the last
+## resetSections(), such as the projection of each parsed file
+sections = {}
+
+
+def peakRSS():
+    ''' Peak resident set size of this process so far (bytes), or None where
+        the resource module is not available. '''
+    if(resource is None): return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    ## Kilobytes on Linux, bytes on macOS
+    return int(peak if sys.platform == 'darwin' else peak*1024)
+
+@contextmanager
+def section(name):
+    ''' Add the wall time of the block to sections[name]. '''
+    start = time.perf_counter()
+    try:     yield
+    finally: sections[name] = sections.get(name, 0.0)+time.perf_counter()-start
+
+def resetSections():
+    sections.clear()
+
+@contextmanager
+def measure(record):
+    ''' Fill record with the start time (epoch s), wall and CPU time (s) and
+        peak RSS of the block. '''
+    record['start'] = time.time()
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:     yield record
+    finally:
+        record['wall']    = time.perf_counter()-wall
+        record['cpu']     = time.process_time()-cpu
+        record['peakRSS'] = peakRSS()
+
+
+class Timings():
+    ''' Wall time, CPU time, file and point counts and peak memory of each
+        stage of a run and of each parsed file. With profile set to a stage
+        name, that stage also runs under cProfile and its statistics are
+        dumped to profileFolder (the last run of the stage only). '''
+    def __init__(self, profile=None, profileFolder='.'):
+        self.stages        = []
+        self.files         = []
+        self.profile       = profile
+        self.profileFolder = profileFolder
+        self.profiles      = []
+
+    @contextmanager
+    def stage(self, name, files=0, points=0):
+        ''' Time the block as stage name. The yielded record can be updated
+            with the files and points handled once they are known. '''
+        record  = {'name': name, 'files': files, 'points': points}
+        profile = cProfile.Profile() if name == self.profile else None
+        with measure(record):
+            if(profile is not None): profile.enable()
+            try:     yield record
+            finally:
+                if(profile is not None):
+                    profile.disable()
+                    self.dumpProfile(name, profile)
+        self.stages.append(record)
+
+    def dumpProfile(self, name, profile):
+        if(not os.path.exists(self.profileFolder)): os.makedirs(self.profileFolder)
+        filename = os.path.join(self.profileFolder, 'profile-'+name+'.prof')
+        profile.dump_stats(filename)
+        if(filename not in self.profiles): self.profiles.append(filename)
+
+    def addFile(self, filename, record, stage='load'):
+        ''' Record the timings of one file (see measure), with its point count
+            and sections. '''
+        self.files.append(dict(record, file=filename, stage=stage))
+
+    def slowestFiles(self, count=10):
+        return sorted(self.files, key=lambda record: -record['wall'])[:count]
+
+    def getStageTotals(self):
+        ''' Stages by name, summed over repeated runs (such as watch passes),
+            in order of first appearance, plus the time of each file section
+            summed into '<stage>/<section>' entries. '''
+        totals = {}
+        for record in self.stages:
+            total = totals.setdefault(record['name'], {'name': record['name'], 'wall': 0.0, 'cpu': 0.0, 'files': 0, 'points': 0, 'peakRSS': None, 'runs': 0})
+            for key in ('wall', 'cpu', 'files', 'points'): total[key] += record[key]
+            total['runs']   += 1
+            total['peakRSS'] = max(total['peakRSS'] or 0, record['peakRSS'] or 0) or None
+        for record in self.files:
+            for name, seconds in record.get('sections', {}).items():
+                total = totals.setdefault(record['stage']+'/'+name, {'name': record['stage']+'/'+name, 'wall': 0.0, 'cpu': None, 'files': 0, 'points': 0, 'peakRSS': None, 'runs': 1})
+                total['wall']   += seconds
+                total['files']  += 1
+                total['points'] += record.get('points', 0)
+        return list(totals.values())
+
+    def getReport(self, count=10):
+        return {'stages': self.getStageTotals(), 'runs': self.stages, 'slowestFiles': self.slowestFiles(count), 'files': len(self.files),
+                'profiles': self.profiles}
+
+    def getTraceEvents(self):
+        ''' Chrome trace events (chrome://tracing, Perfetto): one complete
+            event per stage on the main thread and per file on the thread of
+            the process that parsed it. '''
+        events = []
+        for record in self.stages:
+            events.append({'name': record['name'], 'cat': 'stage', 'ph': 'X', 'pid': 0, 'tid': 0,
+                           'ts': record['start']*1e6, 'dur': record['wall']*1e6,
+                           'args': {key: record[key] for key in ('cpu', 'files', 'points', 'peakRSS')}})
+        for record in self.files:
+            events.append({'name': os.path.basename(record['file']), 'cat': record['stage'], 'ph': 'X', 'pid': 0, 'tid': record.get('pid', 0),
+                           'ts': record['start']*1e6, 'dur': record['wall']*1e6,
+                           'args': {'file': record['file'], 'cpu': record['cpu'], 'points': record.get('points', 0), 'sections': record.get('sections', {})}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save(self, filename, count=10):
+        with open(filename, 'w') as stream: json.dump(self.getReport(count), stream, indent=1)
+
+    def saveTrace(self, filename):
+        with open(filename, 'w') as stream: json.dump(self.getTraceEvents(), stream)
+
+
+def printProfile(filename, count=20, stream=sys.stdout):
+    ''' Print the count functions with the most cumulative time of a cProfile
+        dump. '''
+    pstats.Stats(filename, stream=stream).sort_stats('cumulative').print_stats(count)
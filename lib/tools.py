@@ -2,20 +2,38 @@
 
 ## Dependancies
 #Native
-import os
+import os, logging
 import math as m
 from xml.dom import minidom
-from datetime import datetime, timedelta
+from datetime import timedelta
+from contextlib import contextmanager
 #Packages
-import utm
 import numpy as np
-import matplotlib.pyplot as plt
-from PIL import Image
+#Internal
+import lib.parsers
+import lib.projection
+import lib.kinematics
+import lib.timestamps
+import lib.spatial
+import lib.simplify
+import lib.archives
+import lib.pauses
+import lib.analytics
+import lib.timings
 
 
 ###############################################################################
 ## Library
 ###############################################################################
+class ActivityError(Exception):
+    ''' A file that cannot be loaded as an activity. args[0] is [code, reason]
+        as for every runtime error handled by main(). '''
+    def __init__(self, code, reason):
+        Exception.__init__(self, [code, reason])
+        self.code   = code
+        self.reason = reason
+
+
 class ActivityType():
     def __init__(self, name):
         self.name       = name
@@ -23,7 +41,7 @@ class ActivityType():
     def bindActivities(self, listOfActivities):
         indeces = []
         for i in range(len(listOfActivities)):
-            if(listOfActivities[i].getActivityType() == self.name and len(listOfActivities[i].getPositionsLat()) > 0):
+            if(listOfActivities[i].getActivityType() == self.name and len(listOfActivities[i]) > 0):
                 indeces.append(i)
 
         self.activities = [listOfActivities[ix] for ix in indeces]
@@ -35,41 +53,55 @@ class Region():
         self.latLim  = latLim
         self.longLim = longLim
         self.plot    = plot
-
-    def bindActivities(self, listOfActivities):
-        indeces = []
-        for i in range(len(listOfActivities)):
-            if(len(listOfActivities[i].getPositionsLat()) > 0 and
-                listOfActivities[i].getPositionsLat()[0] > self.latLim[0] and
-                listOfActivities[i].getPositionsLat()[0] < self.latLim[1] and
-                listOfActivities[i].getPositionsLong()[0] > self.longLim[0] and
-                listOfActivities[i].getPositionsLong()[0] < self.longLim[1]):
-                indeces.append(i)
-
-        self.activities = [listOfActivities[ix] for ix in indeces]
+        self.segmentIndex = None
+
+    def bindActivities(self, listOfActivities, index=None, subset=None):
+        ''' Bind the activities starting inside the region. index is an
+            optional lib.spatial.ActivityIndex of listOfActivities, subset
+            optional indices to choose from (such as a time window, see
+            lib.store.TrackpointStore.window). '''
+        if(index is None): index = lib.spatial.ActivityIndex(listOfActivities)
+        indeces = index.startsWithin(self.latLim, self.longLim)
+        if(subset is not None): indeces = np.intersect1d(indeces, subset)
+
+        self.activities   = [listOfActivities[ix] for ix in indeces]
+        self.segmentIndex = None
         return True
 
-class Map():
-    def __init__(self, filename, originLat, originLong, scale, region):
-        self.filename   = filename
-        self.originLat  = originLat
-        self.originLong = originLong
-        self.scale      = scale          ## px/m
-        self.region     = region
-        self.load()
-
-    def load(self):
-        self.img = Image.open(self.filename)
-        self.img = self.img.resize((int(self.img.size[0]/self.scale),int(self.img.size[1]/self.scale)), Image.ANTIALIAS)
-
-    def plot(self):
-        x,y,_,_ = utm.from_latlon(self.originLat,self.originLong)
-        plt.imshow(self.img, extent=[x,x+self.img.size[0],y,y+self.img.size[1]], interpolation='bicubic')
-
-
-class Activity:
-    def __init__(self, filename):
+    def getSegmentIndex(self):
+        ''' Grid over the track segments of the bound activities, built on
+            first use. '''
+        if(self.segmentIndex is None): self.segmentIndex = lib.spatial.SegmentGrid(self.activities)
+        return self.segmentIndex
+
+## XML engine: 'iterparse' (streaming, single pass) or 'minidom' (DOM)
+defaultEngine = 'iterparse'
+## Drop idle stretches at the beginning and end of tracks when parsing (see
+## Activity.findRemoveExessivePauses)
+trimIdle = False
+
+class Activity(object):
+    ''' Parsed activity.
+
+        Summary metadata is held in slots; the per-point columns live in
+        self.columns, which unloadColumns() drops and the getters reload on
+        demand from the cache or the source file. '''
+    __slots__     = ('filename', 'engine', 'source', 'activityType', 'calories', 'startTime', 'duration', 'distance',
+                     'length', 'UTMZone', 'bbox', 'startPoint', 'laps', 'pauses', 'sensors', 'columns')
+    metadataNames = ('filename', 'activityType', 'calories', 'startTime', 'duration', 'distance', 'length', 'UTMZone', 'bbox', 'startPoint', 'laps', 'pauses', 'sensors')
+    columnNames   = ('positionsLatLong', 'positions', 'altitude', 'time', 'speeds')
+    ## Optional float32 sensor columns, present only when recorded: activity
+    ## column and parser column
+    sensorNames   = (('heartRate', 'hr'), ('cadence', 'cadence'), ('power', 'power'), ('sensorSpeed', 'speed'))
+
+    def __init__(self, filename, engine=None):
         self.filename = filename
+        self.engine   = engine or defaultEngine
+        self.source   = None
+        self.laps     = None
+        self.pauses   = None
+        self.sensors  = None
+        self.columns  = {}
         self.importXML()
 
     def __len__(self):          return self.length
@@ -80,89 +112,343 @@ class Activity:
     def getDuration(self):      return self.duration
     def getEndTime(self):       return self.getStartTime() + self.getDuration()
     def getDistance(self):      return self.distance
+    def getBoundingBox(self):   return self.bbox        # (latMin, latMax, longMin, longMax)
+    def getStartPoint(self):    return self.startPoint  # (lat, long)
+
+    def getPositionsLat(self):  return self.getColumn('positionsLatLong')[:,0]
+    def getPositionsLong(self): return self.getColumn('positionsLatLong')[:,1]
+    def getPositionsUTMX(self): return self.getColumn('positions')[:,0]
+    def getPositionsUTMY(self): return self.getColumn('positions')[:,1]
+    def getPositions(self):     return self.getColumn('positions')
+    def getPositionsAlt(self):  return self.getColumn('altitude')
+    def getTimes(self):         return self.getColumn('time')
+    def getSpeeds(self):        return self.getColumn('speeds')
+    def getPaces(self):         return lib.kinematics.paces(self.getSpeeds())
+    def getCumulativeDistance(self): return lib.kinematics.cumulativeLength(self.getPositions())
+
+    def getLaps(self):
+        ''' Laps of the activity (TCX laps, GPX track segments) as lists:
+            'offsets' (one more than laps) into the trackpoint columns, and
+            per lap 'startTime' (s since the start), 'duration' (s), 'distance'
+            (m) and 'calories'. Without lap data, the activity is one lap. '''
+        if(self.laps): return self.laps
+        return {'offsets': [0, len(self)], 'startTime': [0.0], 'duration': [self.getDuration().total_seconds()],
+                'distance': [self.getDistance()], 'calories': [self.getCalories()]}
+
+    def getPauses(self):
+        ''' Pause summary (see lib.pauses.summarizePauses) plus 'trimmed', set
+            if idle stretches at both ends were dropped when parsing. Computed
+            from the columns for activities loaded without it. '''
+        if(self.pauses is None):
+            with self.loadedColumns(): self.pauses = dict(lib.pauses.summarizePauses(self.getPositions(), self.getTimes()), trimmed=False)
+        return self.pauses
+
+    def getSensorSummary(self):
+        ''' Sensor summary (see lib.analytics.summarizeSensors), computed when
+            parsing. Computed from the columns for activities loaded without
+            it. '''
+        if(self.sensors is None):
+            with self.loadedColumns(): self.summarizeSensors()
+        return self.sensors
+
+    def getMovingTime(self):    return timedelta(seconds=self.getPauses()['movingTime'])
+    def getElapsedTime(self):   return timedelta(seconds=self.getPauses()['elapsedTime'])
+
+    def getLapCount(self):      return len(self.getLaps()['offsets'])-1
+
+    def getLapColumn(self, ix, name):
+        ''' Column name of lap ix: a view into the activity column. '''
+        offsets = self.getLaps()['offsets']
+        return self.getColumn(name)[offsets[ix]:offsets[ix+1]]
+
+    def setSegments(self, offsets):
+        ''' Laps of consecutive track segments starting at offsets, measured
+            from the track itself; distance then excludes the gaps between
+            segments. '''
+        offsets = [int(offset) for offset in offsets]+[len(self)]
+        time, positions = self.getTimes(), self.getPositions()
+        self.laps = {'offsets': offsets, 'startTime': [], 'duration': [], 'distance': [], 'calories': []}
+        for start, stop in zip(offsets[:-1], offsets[1:]):
+            self.laps['startTime'].append(float(time[start]) if stop > start else 0.0)
+            self.laps['duration'].append(float(time[stop-1]-time[start]) if stop > start else 0.0)
+            self.laps['distance'].append(float(lib.kinematics.totalLength(positions[start:stop])))
+            self.laps['calories'].append(0)
+
+    def getColumn(self, name):
+        if(self.columns is None): self.loadColumns()
+        return self.columns[name]
+
+    def getSensor(self, name):
+        ''' Sensor column name (see sensorNames), or None if not recorded. '''
+        if(self.columns is None): self.loadColumns()
+        return self.columns.get(name)
+
+    def getHeartRate(self):     return self.getSensor('heartRate')
+    def getCadence(self):       return self.getSensor('cadence')
+    def getPower(self):         return self.getSensor('power')
+
+    def loadColumns(self):
+        ''' Reload the columns dropped by unloadColumns(), from the cache when
+            the activity came from one and is still up to date, otherwise by
+            parsing the source file again. '''
+        columns = self.source.getArrays(self.filename) if self.source is not None else None
+        if(columns is None): self.importXML()
+        else:                self.columns = columns
+
+    def unloadColumns(self, source=None):
+        ''' Drop the per-point columns, keeping only the summary metadata.
+            source is the lib.cache.ActivityCache to reload them from. '''
+        self.source  = source
+        self.columns = None
+
+    @contextmanager
+    def loadedColumns(self):
+        ''' Block in which the columns are loaded. Those of an unloaded
+            activity are dropped again on leaving it, so that reading an
+            activity leaves it as it was. '''
+        unloaded = self.columns is None
+        if(unloaded): self.loadColumns()
+        try:     yield self
+        finally:
+            if(unloaded): self.unloadColumns(self.source)
 
-    def getPositionsLat(self):  return self.positionsLatLong[:,0]
-    def getPositionsLong(self): return self.positionsLatLong[:,1]
-    def getPositionsUTMX(self): return self.positions[:,0]
-    def getPositionsUTMY(self): return self.positions[:,1]
-    def getPositions(self):     return self.positions
-    def getPositionsAlt(self):  return self.altitude
-    def getSpeeds(self):        return self.speeds
+    def importXML(self):
+        if(self.engine == 'minidom'): self.importMinidom()
+        else:                         self.importIterparse()
+
+    def setTrack(self, lat, lon, altitude, time, sensors=None):
+        ''' Build positions, altitude, time and speeds from raw trackpoint
+            columns (time in seconds since the start of the activity). sensors
+            holds the raw sensor columns by parser name; those with at least
+            one value are kept (see sensorNames). '''
+        if(len(lat) == 0): return self.setEmptyTrack()
+        positionsLatLong = np.array([lat, lon], dtype=float).transpose()
+        self.UTMZone     = lib.projection.getZone(positionsLatLong[0][0],positionsLatLong[0][1])
+        with lib.timings.section('projection'):
+            positions    = lib.projection.fromLatLon(positionsLatLong[:,0], positionsLatLong[:,1], *self.UTMZone)
+        time             = np.asarray(time, dtype=float)   # Seconds since start
+        self.columns     = {'positionsLatLong': positionsLatLong,
+                            'positions':        positions,
+                            'altitude':         np.asarray(altitude, dtype=float),
+                            'time':             time,
+                            'speeds':           lib.kinematics.speeds(positions, time)}
+        for name, column in self.sensorNames:
+            values = np.asarray((sensors or {}).get(column, ()), dtype=np.float32)
+            if(len(values) == len(positions) and np.isfinite(values).any()): self.columns[name] = values
+        self.setBounds()
+
+    def setBounds(self):
+        ''' Length, bounding box and start point of the loaded columns. '''
+        positionsLatLong = self.columns['positionsLatLong']
+        self.length      = len(positionsLatLong)
+        self.bbox        = (float(positionsLatLong[:,0].min()), float(positionsLatLong[:,0].max()),
+                            float(positionsLatLong[:,1].min()), float(positionsLatLong[:,1].max()))
+        self.startPoint  = (float(positionsLatLong[0,0]), float(positionsLatLong[0,1]))
+
+    def trimTrack(self, first, last):
+        ''' Keep points first to last-1 only: the start time moves to point
+            first and laps are clipped to it. The time and distance of the
+            points cut, measured on the columns, are taken off the laps they
+            belong to and off the totals. '''
+        time, positions = self.getTimes(), self.getPositions()
+        def measure(start, stop):
+            if(stop <= start): return 0.0, 0.0
+            return float(time[stop-1]-time[start]), float(lib.kinematics.totalLength(positions[start:stop]))
+        offsets = self.laps['offsets'] if self.laps else [0, len(self)]
+        cut     = [np.subtract(measure(start, stop), measure(max(start, first), min(stop, last))) for start, stop in zip(offsets[:-1], offsets[1:])]
+        shift        = float(time[first])
+        self.columns = {name: column[first:last] for name, column in self.columns.items()}
+        self.columns['time'] = self.columns['time']-shift
+        self.startTime      += timedelta(seconds=shift)
+        self.duration        = min(self.duration-timedelta(seconds=sum(seconds for seconds, metres in cut)), timedelta(seconds=float(self.columns['time'][-1])))
+        self.distance        = max(self.distance-sum(metres for seconds, metres in cut), 0.0)
+        self.setBounds()
+        if(self.laps):
+            self.laps = dict(self.laps, offsets=[int(min(max(offset-first, 0), self.length)) for offset in self.laps['offsets']],
+                             duration=[max(duration-seconds, 0.0) for duration, (seconds, metres) in zip(self.laps['duration'], cut)],
+                             distance=[max(distance-metres, 0.0) for distance, (seconds, metres) in zip(self.laps['distance'], cut)])
+            if('startTime' in self.laps): self.laps['startTime'] = [max(lapStart-shift, 0.0) for lapStart in self.laps['startTime']]
+
+    def setEmptyTrack(self):
+        self.UTMZone      = (None, None)
+        self.columns      = {'positionsLatLong': np.zeros((0, 2)),
+                             'positions':        np.zeros((0, 2)),
+                             'altitude':         np.zeros(0),
+                             'time':             np.zeros(0),
+                             'speeds':           np.zeros(0)}
+        self.length       = 0
+        self.bbox         = None
+        self.startPoint   = None
+
+    def getLevels(self):
+        ''' Levels of detail of the UTM track (see lib.simplify.TrackLevels),
+            read from the cache the activity was loaded from, if any, or
+            computed and stored there. '''
+        arrays = self.source.getDerived(self.filename, 'levels') if self.source is not None else None
+        if(arrays is not None and list(arrays['tolerances']) == list(lib.simplify.tolerances)): return lib.simplify.TrackLevels.fromArrays(arrays)
+        levels = lib.simplify.TrackLevels(self.getPositions())
+        if(self.source is not None): self.source.putDerived(self.filename, 'levels', levels.toArrays())
+        return levels
+
+    def getMetadata(self):
+        return {name: getattr(self, name) for name in self.metadataNames}
+
+    def getPayload(self):
+        ''' Return a compact, picklable copy of the parsed activity: its
+            metadata and its columns as NumPy arrays. '''
+        payload = self.getMetadata()
+        for name in self.columnNames: payload[name] = self.getColumn(name)
+        for name, _ in self.sensorNames:
+            if(self.getSensor(name) is not None): payload[name] = self.getSensor(name)
+        return payload
+
+    @classmethod
+    def fromPayload(cls, payload):
+        ''' Rebuild an activity from getPayload() without parsing XML. Without
+            columns in payload, the activity is left unloaded. '''
+        activity = cls.__new__(cls)
+        activity.engine  = defaultEngine
+        activity.source  = None
+        activity.columns = None
+        for name in cls.metadataNames: setattr(activity, name, payload.get(name))
+        if(all(name in payload for name in cls.columnNames)):
+            activity.columns = {name: payload[name] for name in cls.columnNames+tuple(name for name, _ in cls.sensorNames) if name in payload}
+        return activity
 
     def findRemoveExessivePauses(self):
-        ''' Use this function to check and flush any long breaks at beginning or
-            end of activity. '''
-        if(self.getDuration() > timedelta(0, 10800)):
-            import pdb; pdb.set_trace()
+        ''' Detect the pauses of the track (see lib.pauses) and, with trimIdle,
+            drop the idle stretches at its beginning and end. '''
+        with lib.timings.section('pauses'):
+            self.pauses = dict(lib.pauses.summarizePauses(self.getPositions(), self.getTimes()), trimmed=trimIdle)
+        if(trimIdle and len(self) and self.pauses['last'] > self.pauses['first'] and (self.pauses['first'] > 0 or self.pauses['last'] < len(self)-1)):
+            self.trimTrack(self.pauses['first'], self.pauses['last']+1)
+            self.pauses = dict(lib.pauses.summarizePauses(self.getPositions(), self.getTimes()), trimmed=trimIdle)
+
+    def summarizeSensors(self):
+        ''' Keep the sensor summary of the track with the metadata, so that
+            sensor tables need no columns (see getSensorSummary). '''
+        with lib.timings.section('sensors'):
+            self.sensors = lib.analytics.summarizeSensors(self.getTimes(), self.getSensor('heartRate'), self.getSensor('power'), self.getSensor('cadence'))
 
 
 class ActivityTCX(Activity):
+    __slots__ = ()
+
+    def importIterparse(self):
+        with lib.archives.openActivity(self.filename) as stream, lib.timings.section('xml'): data = lib.parsers.parseTCX(stream)
+        self.activityType     = data['activityType']
+        self.calories         = data['calories']
+        self.startTime        = data['startTime']
+        self.duration         = timedelta(seconds=data['duration'])
+        self.distance         = data['distance'] # In metres
+        self.laps             = data['laps']
+        try:
+            self.setTrack(data['lat'], data['lon'], data['alt'], data['time'], data)
+        except (IndexError, ValueError):
+            self.setEmptyTrack()
+        if(len(self) == 0): logging.warning('Empty positions in '+self.filename)
 
-    def importXML(self):
-        data      = minidom.parse(self.filename)
+        self.findRemoveExessivePauses()
+        self.summarizeSensors()
+
+    def importMinidom(self):
+        with lib.archives.openActivity(self.filename) as stream, lib.timings.section('xml'): data = minidom.parse(stream)
         activity  = data.getElementsByTagName('Activity')[0]
-        lap       = activity.getElementsByTagName('Lap')[0]
-        positions = lap.getElementsByTagName('Trackpoint')
+        laps      = activity.getElementsByTagName('Lap')
+        lapValue  = lambda lap, name: lap.getElementsByTagName(name)[0].childNodes[0].nodeValue
+        start     = lib.timestamps.parseTimestamp(laps[0].attributes['StartTime'].value)
+        ## Positioned trackpoints of each lap, back to back
+        lapPositions = [[pos for pos in lap.getElementsByTagName('Trackpoint') if pos.getElementsByTagName('LatitudeDegrees')] for lap in laps]
+        positions    = [pos for lapPosition in lapPositions for pos in lapPosition]
+        self.laps             = {'offsets':   [int(offset) for offset in np.cumsum([0]+[len(lapPosition) for lapPosition in lapPositions])],
+                                 'startTime': [float(lib.timestamps.parseTimestamp(lap.attributes['StartTime'].value)-start) for lap in laps],
+                                 'duration':  [float(lapValue(lap, 'TotalTimeSeconds')) for lap in laps],
+                                 'distance':  [float(lapValue(lap, 'DistanceMeters')) for lap in laps],
+                                 'calories':  [int(lapValue(lap, 'Calories')) for lap in laps]}
         self.activityType     = activity.attributes['Sport'].value
-        self.calories         = int(lap.getElementsByTagName('Calories')[0].childNodes[0].nodeValue)
-        self.startTime        = datetime.strptime(lap.attributes['StartTime'].value, '%Y-%m-%dT%H:%M:%S.000Z')
-        self.duration         = timedelta(seconds=int(lap.getElementsByTagName('TotalTimeSeconds')[0].childNodes[0].nodeValue))
-        self.distance         = int(lap.getElementsByTagName('DistanceMeters')[0].childNodes[0].nodeValue) # In metres
-        self.positionsLatLong = np.array([[float(pos.getElementsByTagName('LatitudeDegrees')[0].childNodes[0].nodeValue) for pos in positions],
-                                          [float(pos.getElementsByTagName('LongitudeDegrees')[0].childNodes[0].nodeValue) for pos in positions]]).transpose()
+        self.calories         = sum(self.laps['calories'])
+        self.startTime        = lib.timestamps.toDatetime(start)
+        self.duration         = timedelta(seconds=int(sum(self.laps['duration'])))
+        self.distance         = int(sum(self.laps['distance'])) # In metres
         try:
-            self.UTMZone      = utm.from_latlon(self.positionsLatLong[0][0],self.positionsLatLong[0][1])[2:]
-            self.positions    = np.array([utm.from_latlon(pll[0],pll[1])[:2] for pll in self.positionsLatLong])
-            self.length       = len(self.positions[:,0])
-            self.altitude     = [float(pos.getElementsByTagName('AltitudeMeters')[0].childNodes[0].nodeValue) for pos in positions]
-            self.time         = [datetime.strptime(pos.getElementsByTagName('Time')[0].childNodes[0].nodeValue, '%Y-%m-%dT%H:%M:%S.000Z')-self.startTime for pos in positions]
-            self.speeds       = [ppd(self.positions[pIx+1],self.positions[pIx])/(self.time[pIx+1].total_seconds()-self.time[pIx].total_seconds()) if (self.time[pIx+1].total_seconds()-self.time[pIx].total_seconds()) > 0 else 0.0 for pIx in range(len(positions)-1)]
-            self.speeds.append(self.speeds[-1])
-        except:
-            self.UTMZone      = (None, None)
-            self.positions    = np.array([[],[]])
-            self.length       = 0
-            self.altitude     = []
-            self.time         = []
-            import pdb; pdb.set_trace()
-            print('Warning: Empty positions in '+self.filename)
+            self.setTrack([float(pos.getElementsByTagName('LatitudeDegrees')[0].childNodes[0].nodeValue) for pos in positions],
+                          [float(pos.getElementsByTagName('LongitudeDegrees')[0].childNodes[0].nodeValue) for pos in positions],
+                          [float(pos.getElementsByTagName('AltitudeMeters')[0].childNodes[0].nodeValue) for pos in positions],
+                          lib.timestamps.parseTimestamps([pos.getElementsByTagName('Time')[0].childNodes[0].nodeValue for pos in positions])-start,
+                          domSensors(positions, lib.parsers.tcxSensors))
+        except (IndexError, ValueError):
+            self.setEmptyTrack()
+        if(len(self) == 0): logging.warning('Empty positions in '+self.filename)
 
         self.findRemoveExessivePauses()
+        self.summarizeSensors()
 
 
 class ActivityGPX(Activity):
-    def importXML(self, activities=[]):
-        data      = minidom.parse(self.filename)
-        positions = data.getElementsByTagName('trkpt')
-        ## Attempt to find activity name in filename
+    __slots__     = ('activities',)
+    metadataNames = Activity.metadataNames+('activities',)
+
+    def __init__(self, filename, engine=None, activities=[]):
+        self.activities = activities
+        Activity.__init__(self, filename, engine=engine)
+
+    def findActivityType(self):
+        ''' Attempt to find activity name in filename. '''
         self.activityType     = 'running'
-        for activity in activities:
+        for activity in self.activities:
             if(activity.lower() in os.path.basename(self.filename.lower())): self.activityType = activity
+
+    def importIterparse(self):
+        with lib.archives.openActivity(self.filename) as stream, lib.timings.section('xml'): data = lib.parsers.parseGPX(stream)
+        self.findActivityType()
         self.calories         = 0
-        self.startTime        = datetime.strptime(positions[0].getElementsByTagName('time')[0].childNodes[0].nodeValue, '%Y-%m-%dT%H:%M:%SZ')
-        self.duration         = self.startTime-datetime.strptime(positions[-1].getElementsByTagName('time')[0].childNodes[0].nodeValue, '%Y-%m-%dT%H:%M:%SZ')
-        self.positionsLatLong = np.array([[float(pos.attributes['lat'].value) for pos in positions],
-                                          [float(pos.attributes['lon'].value) for pos in positions]]).transpose()
-        self.UTMZone          = utm.from_latlon(self.positionsLatLong[0][0],self.positionsLatLong[0][1])[2:]
-        self.positions        = np.array([utm.from_latlon(pll[0],pll[1])[:2] for pll in self.positionsLatLong])
-        self.length           = len(self.positions[:,0])
-        self.altitude         = [float(pos.getElementsByTagName('ele')[0].childNodes[0].nodeValue) for pos in positions]
-        self.time             = [datetime.strptime(pos.getElementsByTagName('time')[0].childNodes[0].nodeValue, '%Y-%m-%dT%H:%M:%SZ')-self.startTime for pos in positions]
-        self.speeds           = [ppd(self.positions[pIx+1],self.positions[pIx])/(self.time[pIx+1].total_seconds()-self.time[pIx].total_seconds()) if (self.time[pIx+1].total_seconds()-self.time[pIx].total_seconds()) > 0 else 0.0 for pIx in range(len(positions)-1)]
-        self.speeds.append(self.speeds[-1])
-        self.distance         = getCumulativeLength(self.positions)
+        self.startTime        = data['startTime']
+        self.duration         = timedelta(seconds=data['duration'])
+        self.setTrack(data['lat'], data['lon'], data['alt'], data['time'], data)
+        self.setSegments(data['laps']['offsets'][:-1])
+        self.distance         = sum(self.laps['distance'])
 
         self.findRemoveExessivePauses()
+        self.summarizeSensors()
 
-class Persistant():
-    data = []
+    def importMinidom(self):
+        with lib.archives.openActivity(self.filename) as stream, lib.timings.section('xml'): data = minidom.parse(stream)
+        segments  = [segment.getElementsByTagName('trkpt') for segment in data.getElementsByTagName('trkseg')]
+        positions = [pos for segment in segments for pos in segment]
+        self.findActivityType()
+        self.calories         = 0
+        times     = lib.timestamps.parseTimestamps([pos.getElementsByTagName('time')[0].childNodes[0].nodeValue for pos in positions])
+        self.startTime        = lib.timestamps.toDatetime(times[0])
+        self.duration         = timedelta(seconds=times[-1]-times[0])
+        self.setTrack([float(pos.attributes['lat'].value) for pos in positions],
+                      [float(pos.attributes['lon'].value) for pos in positions],
+                      [float(pos.getElementsByTagName('ele')[0].childNodes[0].nodeValue) for pos in positions],
+                      times-times[0],
+                      domSensors(positions, lib.parsers.gpxSensors))
+        self.setSegments(sorted(set(np.cumsum([0]+[len(segment) for segment in segments[:-1]]).tolist())))
+        self.distance         = sum(self.laps['distance'])
 
+        self.findRemoveExessivePauses()
+        self.summarizeSensors()
+
+activityFormats = {'.tcx': ActivityTCX, '.gpx': ActivityGPX}
+
+def domSensors(positions, sensors):
+    ''' Sensor columns (see lib.parsers.tcxSensors) of minidom trackpoints. '''
+    columns = {}
+    for column, names in sensors:
+        values = np.full(len(positions), np.nan)
+        for ix, pos in enumerate(positions):
+            for name in names:
+                nodes = pos.getElementsByTagNameNS('*', name) or pos.getElementsByTagName(name)
+                if(nodes and nodes[0].childNodes):
+                    values[ix] = float(nodes[0].childNodes[0].nodeValue)
+                    break
+        columns[column] = values
+    return columns
 
 def getCumulativeLength(positions):
-    length = 0
-    for pIx in range(len(positions)-1):
-        length += m.sqrt((positions[pIx+1][0]-positions[pIx][0])**2+(positions[pIx+1][1]-positions[pIx][1])**2)
-    return length
+    return lib.kinematics.totalLength(positions)
 
 
 def closestPoint(point, points):
@@ -170,58 +456,14 @@ def closestPoint(point, points):
     dist_2 = np.einsum('ij,ij->i', deltas, deltas)
     return min(dist_2)
 
-def findNearestActivity(x,y, activities):
+def findNearestActivity(x,y, activities, index=None):
+    ''' Index of the activity nearest to (x,y). With a lib.spatial.SegmentGrid
+        of activities as index, only the cells around (x,y) are searched. '''
+    if(index is not None): return index.nearest(x,y)[0]
     dists = [closestPoint((x,y), activity.getPositions()) for activity in activities]
     return dists.index(min(dists))
 
 
-def mapClickCallback(event, canvas, toolbar, activities, activeElements, linewidth):
-    ''' Fire when user click on map. '''
-    ## Interactivity conditions
-    if(toolbar._active is not None): return False
-    if(event.button != 1): return False
-    ## Flush previous interactive elements
-    try:
-        for activeElement in activeElements.data: activeElement.remove()
-        activeElements.data = []
-    except: pass
-    ## Find closest trajectory (expensive)
-    aIx = findNearestActivity(event.xdata, event.ydata, activities)
-    ## Highlight closest trajectory
-    activity_plot, = plt.plot(activities[aIx].getPositionsUTMX(), activities[aIx].getPositionsUTMY(), color='#eb3c15', zorder=100)
-    activeElements.data.append(activity_plot)
-    activeElements.data.append(plt.text(activities[aIx].getPositionsUTMX()[0], activities[aIx].getPositionsUTMY()[0], activities[aIx].getName(), fontsize=12))
-    canvas.draw()
-    return True
-
-def mapZoom(event, canvas, base_scale=2.):
-    ''' https://stackoverflow.com/questions/11551049/matplotlib-plot-zooming-with-scroll-wheel. '''
-    ax = plt.gca()
-    # get the current x and y limits
-    cur_xlim = ax.get_xlim()
-    cur_ylim = ax.get_ylim()
-    cur_xrange = (cur_xlim[1] - cur_xlim[0])*.5
-    cur_yrange = (cur_ylim[1] - cur_ylim[0])*.5
-    xdata = event.xdata # get event x location
-    ydata = event.ydata # get event y location
-    if event.button == 'up':
-        # deal with zoom in
-        scale_factor = 1/base_scale
-    elif event.button == 'down':
-        # deal with zoom out
-        scale_factor = base_scale
-    else:
-        # deal with something that should never happen
-        scale_factor = 1
-        print event.button
-    # set new limits
-    ax.set_xlim([xdata - cur_xrange*scale_factor,
-                 xdata + cur_xrange*scale_factor])
-    ax.set_ylim([ydata - cur_yrange*scale_factor,
-                 ydata + cur_yrange*scale_factor])
-    canvas.draw()
-
-
 def ppd(*args):
     ''' Get point-to-point distance.
 
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+##################
+# Dependancies
+##################
+#Native
+import os, shutil, tempfile, argparse
+from datetime import datetime
+#Packages
+from prettytable import PrettyTable
+#Internal
+import lib.benchmark
+import lib.synthetic
+
+###############################################################################
+## Settings
+###############################################################################
+results_folder = 'output'
+
+###############################################################################
+## Core
+###############################################################################
+def printRun(run, speedups=None):
+    ''' Print the results of a benchmark run (see lib.benchmark.describeRun). '''
+    t = PrettyTable()
+    t.title = 'Benchmark ('+', '.join(key+': '+str(value) for key, value in sorted(run['config'].items()))+')'
+    t.field_names = ['Suite','Best','Mean','CPU','Points/s','Files/s']+(['Speed-up'] if speedups is not None else [])
+    for suite in run['suites']:
+        row = [suite['name'], str(round(suite['seconds']*1000.0, 2))+' ms', str(round(suite['mean']*1000.0, 2))+' ms', str(round(suite['cpu']*1000.0, 2))+' ms',
+               str(int(suite['pointsPerSecond'])) if suite['pointsPerSecond'] else '-',
+               str(round(suite['filesPerSecond'], 1)) if suite['filesPerSecond'] else '-']
+        if(speedups is not None): row.append('x'+str(round(speedups[suite['name']], 2)) if speedups[suite['name']] else '-')
+        t.add_row(row)
+    print(t)
+    ## One figure for the whole process: the suites run one after the other in it
+    if(run.get('peakRSS')): print('    Peak RSS of the benchmark process (all suites): '+str(round(run['peakRSS']/1024.0/1024.0, 1))+' MB')
+
+def main():
+    try:
+        #########################
+        ## Parse arguments
+        #########################
+        parser = argparse.ArgumentParser(description='Time parsing, projection, aggregation and map queries over synthetic activities.')
+        parser.add_argument('-f',     '--files',               type=int,   dest='files',                   default=20,   help='[int]  Number of synthetic activities (alternately TCX and GPX).')
+        parser.add_argument('-p',     '--points',              type=int,   dest='points',                  default=3600, help='[int]  Trackpoints per activity.')
+        parser.add_argument('-l',     '--laps',                type=int,   dest='laps',                    default=1,    help='[int]  Laps (TCX) or track segments (GPX) per activity.')
+        parser.add_argument('-s',     '--sensors',             type=str,   dest='sensors',                 default='',   help='[str]  Comma separated sensor channels to record ('+','.join(lib.synthetic.sensorChannels)+').')
+        parser.add_argument('-r',     '--repeat',              type=int,   dest='repeat',                  default=3,    help='[int]  Runs of each suite; the best one is reported.')
+        parser.add_argument(          '--clicks',              type=int,   dest='clicks',                  default=100,  help='[int]  Map clicks of the findNearestActivity suites.')
+        parser.add_argument(          '--minidom',             action='store_true', dest='minidom',        default=False, help='       Also time the minidom XML engine.')
+        parser.add_argument(          '--seed',                type=int,   dest='seed',                    default=0,    help='[int]  Seed of the synthetic activities.')
+        parser.add_argument(          '--data',                type=str,   dest='data',                    default='',   help='[dir]  Write the synthetic activities here and keep them (default: a temporary folder).')
+        parser.add_argument('-o',     '--output',              type=str,   dest='output',                  default='',   help='[file] Write the results here (default: '+os.path.join(results_folder, 'benchmark-<time>.json')+').')
+        parser.add_argument('-c',     '--compare',             type=str,   dest='compare',                 default='',   help='[file] Results of a previous run to compare with.')
+        commands = parser.parse_args()
+        sensors  = [sensor for sensor in commands.sensors.split(',') if sensor]
+        for sensor in sensors:
+            if(sensor not in lib.synthetic.sensorChannels): raise Exception([2, 'Unknown sensor channel: '+sensor])
+
+        #########################
+        ## Run
+        #########################
+        folder = commands.data or tempfile.mkdtemp(prefix='tcx-bench-')
+        print('Benchmarking '+str(commands.files)+' activities of '+str(commands.points)+' points in '+folder+'....')
+        try:
+            run = lib.benchmark.benchmark(folder, commands.files, commands.points, commands.laps, sensors, commands.repeat, commands.clicks,
+                                          ('iterparse', 'minidom') if commands.minidom else ('iterparse',), commands.seed)
+        finally:
+            if(not commands.data): shutil.rmtree(folder)
+
+        output = commands.output or os.path.join(results_folder, 'benchmark-'+datetime.now().strftime('%Y%m%d-%H%M%S')+'.json')
+        lib.benchmark.saveRun(output, run)
+        printRun(run, lib.benchmark.compareRuns(lib.benchmark.loadRun(commands.compare), run) if commands.compare else None)
+        print('    Results written to '+output)
+
+
+    ###################
+    # Error and exit handling
+    ###################
+    ## User interruption
+    except KeyboardInterrupt: print('==User exited== [0000]')
+    ## Raised error handling
+    except Exception as e:
+        import sys
+        if(e.args and isinstance(e.args[0], list)): print('==Runtime error== ['+str(e.args[0][0]).zfill(4)+'] '+str(e.args[0][1]))
+        else:
+            from traceback import print_exc as traceback_print_exc
+            traceback_print_exc()
+        sys.exit(1)
+###################
+# Launch main
+###################
+if __name__ == '__main__':
+    main()
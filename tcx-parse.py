@@ -4,15 +4,25 @@
 # Dependancies
 ##################
 #Native
-import os, logging, argparse
+import os, time, logging, argparse
 from datetime import datetime
 import yaml
 #Packages
-import matplotlib.pyplot as plt
+import numpy as np
 from prettytable import PrettyTable
 #Internal
 import lib.tools
-import lib.interface
+import lib.cache
+import lib.loader
+import lib.scanner
+import lib.export
+import lib.store
+import lib.server
+import lib.analytics
+import lib.spatial
+import lib.aggregate
+import lib.routes
+import lib.timings
 
 ###############################################################################
 ## Settings
@@ -20,25 +30,234 @@ import lib.interface
 path = 'data'
 linewidth = 1
 results_folder = 'output'
+cache_folder = 'cache'
 
 ###############################################################################
 ## Core
 ###############################################################################
+def printStatistics(title, stats):
+    ''' Print one statistics table (see lib.aggregate.ActivityTable). '''
+    t = PrettyTable()
+    t.title = title
+    t.field_names = ['Stat','Value']
+    t.add_row(['Number:',str(stats['count'])])
+    t.add_row(['Distance:',str(round(stats['distance']/1000.0,1))+' km'])
+    if(stats['speed'] is not None): t.add_row(['Avg. speed:',str(round(stats['speed']*3.6, 1))+' km/h'])
+    else:                           t.add_row(['Avg. speed:','- km/h'])
+    if(stats['movingSpeed'] is not None): t.add_row(['Moving avg. speed:',str(round(stats['movingSpeed']*3.6, 1))+' km/h'])
+    else:                                 t.add_row(['Moving avg. speed:','- km/h'])
+    t.add_row(['Calories:',str(int(stats['calories']))])
+    t.add_row(['Total time:',str(round(stats['duration']/3600.0, 2))+' h'])
+    t.add_row(['Moving time:',str(round(stats['movingTime']/3600.0, 2))+' h'])
+    if(stats['count']): t.add_row(['Avg. time:',str(round(stats['durationMean']/60.0, 1))+' min'])
+    else:               t.add_row(['Avg. time:','- min'])
+    if(stats['count']):
+        t.add_row(['Median distance:',str(round(stats['distanceP50']/1000.0,1))+' km'])
+        t.add_row(['90th pct. distance:',str(round(stats['distanceP90']/1000.0,1))+' km'])
+        t.add_row(['Median time:',str(round(stats['durationP50']/60.0, 1))+' min'])
+        t.add_row(['90th pct. time:',str(round(stats['durationP90']/60.0, 1))+' min'])
+    print(t)
+
+def printLaps(activity):
+    ''' Print the per-lap table of one activity (see Activity.getLaps). '''
+    laps = activity.getLaps()
+    t = PrettyTable()
+    t.title = 'Laps of '+os.path.basename(activity.getName())+' ('+activity.getStartTime().strftime('%Y-%m-%d %H:%M')+')'
+    t.field_names = ['Lap','Start','Time','Distance','Avg. speed','Calories','Points']
+    for ix in range(activity.getLapCount()):
+        speed = str(round(laps['distance'][ix]/laps['duration'][ix]*3.6, 1))+' km/h' if laps['duration'][ix] > 0 else '- km/h'
+        t.add_row([str(ix+1), str(round(laps['startTime'][ix]/60.0, 1))+' min', str(round(laps['duration'][ix]/60.0, 1))+' min',
+                   str(round(laps['distance'][ix]/1000.0, 2))+' km', speed, str(int(laps['calories'][ix])), str(laps['offsets'][ix+1]-laps['offsets'][ix])])
+    print(t)
+
+def printTraining(title, stats):
+    ''' Print one sensor table (see lib.analytics.combineSummaries). '''
+    t = PrettyTable()
+    t.title = title
+    t.field_names = ['Stat','Value']
+    if(stats['heartRateCount']):
+        t.add_row(['With heart rate:',str(stats['heartRateCount'])])
+        t.add_row(['Avg. heart rate:',str(int(round(stats['heartRate'])))+' bpm'])
+        t.add_row(['TRIMP:',str(int(round(stats['trimp'])))])
+        for ix, seconds in enumerate(stats['heartRateZones']): t.add_row(['HR zone '+str(ix)+':',str(round(seconds/3600.0, 2))+' h'])
+    if(stats['powerCount']):
+        t.add_row(['With power:',str(stats['powerCount'])])
+        t.add_row(['Avg. power:',str(int(round(stats['power'])))+' W'])
+        t.add_row(['Avg. normalized power:',str(int(round(stats['normalizedPower'])))+' W'])
+        t.add_row(['Training stress:',str(int(round(stats['trainingStress'])))])
+        for ix, seconds in enumerate(stats['powerZones']): t.add_row(['Power zone '+str(ix)+':',str(round(seconds/3600.0, 2))+' h'])
+    if(stats['cadenceCount']):
+        t.add_row(['Avg. cadence:',str(int(round(stats['cadence'])))+' rpm'])
+    print(t)
+
+def saveMonthlyPlot(counts, filename):
+    ''' Save the histogram of activities by month. Drawn on a standalone Agg
+        canvas: matplotlib is only imported here, and no display is needed. '''
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax  = fig.add_subplot(111)
+    ax.bar([x-0.5 for x in range(12)], counts, width=1)
+    ax.set_xticks(range(12))
+    ax.set_xticklabels([datetime(2000,x,1).strftime("%B") for x in range(1,13)])
+    fig.savefig(filename)
+
+def printTables(activities, regions, activityTypes, athlete=None, timings=None, monthlyPlot=True):
+    ''' Print the monthly, region and activity type tables and, with
+        monthlyPlot, save the monthly histogram. Regions to plot are bound to
+        their activities. Each step is timed as a stage of timings (see
+        lib.timings.Timings). '''
+    if(timings is None): timings = lib.timings.Timings()
+    #########################
+    ## Activities by time.
+    #########################
+    with timings.stage('aggregate', files=len(activities)):
+        index = lib.spatial.ActivityIndex(activities)
+        table = lib.aggregate.ActivityTable(activities, index)
+        years, monthly_statistics = table.monthlyCounts()
+
+    with timings.stage('monthly tables'):
+        if(datetime.now().year in years):
+            t = PrettyTable()
+            t.title = 'Activities this year'
+            t.field_names = [datetime(2000,x,1).strftime("%B") for x in range(1,13)]
+            t.add_row([str(x) for x in monthly_statistics[list(years).index(datetime.now().year)]])
+            print(t)
+
+        t = PrettyTable()
+        t.title = 'Activities all time'
+        t.field_names = [datetime(2000,x,1).strftime("%B") for x in range(1,13)]
+        t.add_row([str(x) for x in monthly_statistics.sum(axis=0)])
+        print(t)
+
+    if(monthlyPlot):
+        with timings.stage('monthly plot'):
+            if(not os.path.exists(results_folder)): os.mkdir(results_folder)
+            saveMonthlyPlot(monthly_statistics.sum(axis=0), os.path.join(results_folder,'monthly.png'))
+
+    #########################
+    ## Activities by region
+    #########################
+    with timings.stage('bindActivities'):
+        for region_name in regions:
+            if(regions[region_name].plot): regions[region_name].bindActivities(activities, index)
+    with timings.stage('region tables'):
+        for region_name in regions:
+            printStatistics('Stats for region: '+regions[region_name].name, table.statistics(table.regionMask(regions[region_name])))
+
+
+    #########################
+    ## Activities by type
+    #########################
+    with timings.stage('type tables', files=len(activities)):
+        for activity_name in activityTypes:
+            mask = table.typeMask(activity_name)
+            printStatistics('Stats for activity: '+activityTypes[activity_name].name, table.statistics(mask))
+            stats = lib.analytics.combineSummaries([lib.analytics.summarizeActivity(activities[ix], athlete) for ix in np.flatnonzero(mask)])
+            if(stats['heartRateCount'] or stats['powerCount'] or stats['cadenceCount']): printTraining('Training for activity: '+activityTypes[activity_name].name, stats)
+
+def printRoutes(activities, segments, count=10):
+    ''' Print the count most frequent routes (see lib.routes.findRoutes) and
+        the efforts on each user-defined segment. '''
+    routes = lib.routes.findRoutes(activities)
+    t = PrettyTable()
+    t.title = 'Most frequent routes ('+str(len(routes))+' followed more than once)'
+    t.field_names = ['Route','Activities','Distance','Best time','Avg. time','Best moving time','Fastest']
+    for ix, route in enumerate(routes[:count]):
+        stats = route.getStatistics(activities)
+        t.add_row([str(ix+1), str(stats['count']), str(round(stats['distance']/1000.0, 2))+' km', str(round(stats['best']/60.0, 1))+' min',
+                   str(round(stats['mean']/60.0, 1))+' min', str(round(stats['bestMoving']/60.0, 1))+' min', activities[stats['fastest']].getStartTime().strftime('%Y-%m-%d')])
+    print(t)
+    if(not segments): return
+    t = PrettyTable()
+    t.title = 'Segments'
+    t.field_names = ['Segment','Efforts','Distance','Best time','Avg. time','Fastest']
+    for segment in segments:
+        stats = segment.getStatistics(activities)
+        if(stats['count']): t.add_row([segment.name, str(stats['count']), str(round(stats['distance']/1000.0, 2))+' km', str(round(stats['best']/60.0, 2))+' min',
+                                       str(round(stats['mean']/60.0, 2))+' min', activities[stats['fastest']].getStartTime().strftime('%Y-%m-%d')])
+        else:               t.add_row([segment.name, '0', '-', '-', '-', '-'])
+    print(t)
+
+def printTimings(timings, count=10):
+    ''' Print the stage and slowest file tables of a run (see
+        lib.timings.Timings) and write them to results_folder as JSON and as a
+        Chrome trace. '''
+    mb = lambda value: str(round(value/1024.0/1024.0, 1))+' MB' if value else '-'
+    t = PrettyTable()
+    t.title = 'Timings by stage'
+    t.field_names = ['Stage','Wall','CPU','Files','Points','Points/s','Peak RSS']
+    for stage in timings.getStageTotals():
+        t.add_row([stage['name'], str(round(stage['wall'], 3))+' s', str(round(stage['cpu'], 3))+' s' if stage['cpu'] is not None else '-',
+                   str(stage['files']) if stage['files'] else '-', str(stage['points']) if stage['points'] else '-',
+                   str(int(stage['points']/stage['wall'])) if stage['points'] and stage['wall'] > 0 else '-', mb(stage['peakRSS'])])
+    print(t)
+    if(timings.files):
+        t = PrettyTable()
+        t.title = 'Slowest '+str(min(count, len(timings.files)))+' of '+str(len(timings.files))+' parsed files'
+        t.field_names = ['File','Wall','CPU','Points','XML','Projection','Peak RSS']
+        for record in timings.slowestFiles(count):
+            t.add_row([os.path.basename(record['file']), str(round(record['wall']*1000.0, 1))+' ms', str(round(record['cpu']*1000.0, 1))+' ms', str(record['points']),
+                       str(round(record['sections'].get('xml', 0.0)*1000.0, 1))+' ms', str(round(record['sections'].get('projection', 0.0)*1000.0, 1))+' ms', mb(record['peakRSS'])])
+        print(t)
+    if(not os.path.exists(results_folder)): os.mkdir(results_folder)
+    timings.save(os.path.join(results_folder, 'timings.json'), count)
+    timings.saveTrace(os.path.join(results_folder, 'timings.trace.json'))
+    print('    Timings written to '+os.path.join(results_folder, 'timings.json')+' and '+os.path.join(results_folder, 'timings.trace.json')+' (chrome://tracing)')
+
+def inWindow(activity, since=None, until=None):
+    ''' Whether activity overlaps the time window (see
+        lib.store.TrackpointStore.window). '''
+    start = np.datetime64(activity.getStartTime(), 'ms')
+    if(since is not None and start+np.timedelta64(int(activity.getDuration().total_seconds()*1000), 'ms') < lib.store.toMilliseconds(since)): return False
+    if(until is not None and start >= lib.store.toMilliseconds(until)): return False
+    return True
+
+def printReport(summary):
+    ''' Print the summary of a batch run (see lib.loader.ErrorReport). '''
+    print('    '+str(summary['quarantined'])+' of '+str(summary['files'])+' files quarantined ('+str(round(100*summary['failureRate'], 2))+' %'+''.join(', '+str(count)+' '+code for code, count in sorted(summary['codes'].items()))+'), report in '+os.path.join(results_folder, 'ingest-report.json'))
+
+
 def main():
+    commands = None
     try:
         #########################
         ## Parse arguments
         #########################
         parser = argparse.ArgumentParser()
         parser.add_argument('-a'      '--max-activities',      type=int,   dest='max_activities',          default=0,    help='[int]  Maximum number of activities to load.')
+        parser.add_argument('-j',     '--jobs',                type=int,   dest='jobs',                    default=1,    help='[int]  Number of processes used to parse activities (0: one per CPU).')
+        parser.add_argument(          '--no-cache',            action='store_true', dest='no_cache',       default=False, help='       Parse every activity without reading or writing the cache.')
+        parser.add_argument(          '--rebuild-cache',       action='store_true', dest='rebuild_cache',  default=False, help='       Drop the cache and parse every activity again.')
+        parser.add_argument(          '--watch',               type=float, dest='watch',                   default=0,    nargs='?', const=10.0, help='[sec]  Keep running, polling for new or modified activities every few seconds (default: 10).')
+        parser.add_argument(          '--export',              type=str,   dest='export',                  default='',   help='[dir]  Write the loaded activities to a columnar dataset (Parquet with pyarrow, NumPy column files otherwise).')
+        parser.add_argument(          '--packed',              action='store_true', dest='packed',         default=False, help='       With --export, write a packed trackpoint store (one memory mapped file per column for the whole archive) for archive-wide queries.')
+        parser.add_argument(          '--dataset',             type=str,   dest='dataset',                 default='',   help='[dir]  Load activities from a dataset written by --export instead of parsing files.')
+        parser.add_argument(          '--since',               type=str,   dest='since',                   default=None, help='[date] Only keep activities ending on or after this date (YYYY-MM-DD, UTC). Packed datasets are filtered before any activity is built.')
+        parser.add_argument(          '--until',               type=str,   dest='until',                   default=None, help='[date] Only keep activities starting before this date (YYYY-MM-DD, UTC).')
+        parser.add_argument(          '--laps',                type=str,   dest='laps',                    default=None, nargs='?', const='', help='[str]  Print the per-lap table of the multi-lap activities whose filename contains this text (default: all).')
+        parser.add_argument(          '--routes',              type=int,   dest='routes',                  default=0,    nargs='?', const=10, help='[int]  Group activities into routes and print the most frequent ones (default: 10) and the configured segments.')
+        parser.add_argument(          '--trim-idle',           action='store_true', dest='trim_idle',      default=False, help='       Drop idle stretches at the beginning and end of each activity (watch left running) when parsing.')
+        parser.add_argument(          '--timings',             type=int,   dest='timings',                 default=0,    nargs='?', const=10, help='[int]  Print the wall time, CPU time, files, points and peak memory of each stage and of the slowest files (default: 10), also written to '+os.path.join(results_folder, 'timings.json')+' and as a Chrome trace.')
+        parser.add_argument(          '--profile',             type=str,   dest='profile',                 default='',   help='[str]  Run this stage (such as load, aggregate or type tables; see --timings) under cProfile and dump it to '+results_folder+'. Only the main process is profiled.')
+        parser.add_argument(          '--serve',               type=int,   dest='serve',                   default=0,    nargs='?', const=lib.server.port, help='[port] Keep the activities loaded and answer JSON queries on http://'+lib.server.host+':<port> (default: '+str(lib.server.port)+'), loading new files in the background (see --watch for the interval).')
+        parser.add_argument(          '--batch',               action='store_true', dest='batch',          default=False, help='       Unattended run: quarantine malformed, empty or oversized files into '+os.path.join(results_folder, 'ingest-report.json')+' instead of stopping, and skip the map interface.')
+        parser.add_argument(          '--no-png',              action='store_false', dest='png',           default=True, help='       Do not save '+os.path.join(results_folder, 'monthly.png')+' (matplotlib is then not imported unless a region is plotted).')
+        parser.add_argument(          '--max-file-size',       type=float, dest='max_file_size',           default=0,    help='[MB]   In batch mode, quarantine files larger than this (0: no limit).')
         commands = parser.parse_args()
+        if(commands.dataset): commands.watch = 0     ## Datasets are not watched
+        lib.tools.trimIdle = commands.trim_idle
+        timings     = lib.timings.Timings(profile=commands.profile or None, profileFolder=results_folder)
+        report      = lib.loader.ErrorReport() if commands.batch else None
+        maxFileSize = int(commands.max_file_size*1024*1024)
 
         #########################
         ## Config
         #########################
         try:
             with open('tcx_parse.yml', 'r') as stream:
-                config = yaml.load(stream)
+                config = yaml.safe_load(stream)
         except:
             with open('tcx_parse.yml', 'w') as stream:
                 config = {'regions':
@@ -50,131 +269,119 @@ def main():
                                  'plot':  False
                                 }
                             },
-                          'activityTypes': ['running', 'cycling', 'cross country skiing', 'ice skating', 'paddle boating']
+                          'activityTypes': ['running', 'cycling', 'cross country skiing', 'ice skating', 'paddle boating'],
+                          'athlete': {'maxHeartRate': 190, 'restHeartRate': 60, 'ftp': 250}
                          }
                 yaml.dump(config, stream, default_flow_style=False, allow_unicode=True)
 
         regions = {label: lib.tools.Region(label, latLim=[config['regions'][label]['lat1'], config['regions'][label]['lat2']], longLim=[config['regions'][label]['long1'], config['regions'][label]['long2']], plot=config['regions'][label]['plot']) for label in config['regions']}
         activityTypes = {label: lib.tools.ActivityType(label) for label in config['activityTypes']}
+        segments = [lib.routes.Segment(label, (config['segments'][label]['lat1'], config['segments'][label]['long1']), (config['segments'][label]['lat2'], config['segments'][label]['long2']), config['segments'][label].get('radius', 25.0)) for label in (config.get('segments') or {})]
 
 
         #########################
         ## Load activities
         #########################
-        ## Startup code, predetermine calculation time
-        print('Parsing activities....')
-        if(commands.max_activities): count = commands.max_activities
+        if(commands.no_cache): cache = None
+        else:                  cache = lib.cache.ActivityCache(cache_folder, rebuild=commands.rebuild_cache)
+        manifest = lib.scanner.FileManifest(os.path.join(cache_folder, 'files.json') if cache is not None else None)
+
+        ## Collect activity files
+        if(commands.dataset):
+            print('Loading dataset '+commands.dataset+'....')
+            with timings.stage('load') as stage:
+                dataset = lib.export.Dataset(commands.dataset)
+                if(dataset.packed):
+                    dataset    = lib.store.TrackpointStore(commands.dataset)
+                    activities = dataset.loadActivities(config['activityTypes'], subset=dataset.window(commands.since, commands.until))
+                else:
+                    activities = dataset.loadActivities(config['activityTypes'])
+                if(commands.max_activities): activities = activities[:commands.max_activities]
+                stage['files'] = len(activities)
+            print('    '+str(len(activities))+' activities loaded.')
         else:
-            count = 0
-            for root, dirs, files in os.walk(path):
-                for filename in files:
-                    if(os.path.splitext(filename)[1].lower() == '.tcx'): count+=1
-            if(count < 1):        print('    No activities found.')
-            elif(count < 100):    print('    '+str(count)+' activities found. Parsing may take several seconds...')
-            elif(count < 1000):   print('    '+str(count)+' activities found. Parsing may take several minutes...')
-            elif(count < 10000):  print('    '+str(count)+' activities found. Parsing may take up to an hour...')
-            elif(count < 100000): print('    '+str(count)+' activities found. Parsing may take several hours...')
-
-        ## Load activities into memory
-        activities = []
-        for root, dirs, files in os.walk(path):
-            for filename in files:
-                if(len(activities) > count): break
-                if(os.path.splitext(filename)[1].lower() == '.tcx'):
-                    activity = lib.tools.ActivityTCX(os.path.join(path,filename))
-                    if(activity.getActivityType().lower().replace('_',' ') not in config['activityTypes']): continue
-                    activities.append(activity)
-                if(os.path.splitext(filename)[1].lower() == '.gpx'):
-                    activity = lib.tools.ActivityGPX(os.path.join(path,filename))
-                    if(activity.getActivityType().lower().replace('_',' ') not in config['activityTypes']): continue
-                    activities.append(activity)
+            print('Parsing activities....')
+            with timings.stage('scan') as stage:
+                files = lib.scanner.scanFiles(path, lib.tools.activityFormats)
+                added, changed, removed = manifest.diff(files)
+                stage['files'] = len(files)
+            if(len(files) < 1): print('    No activities found.')
+            else:               print('    '+str(len(files))+' activities found ('+str(len(added))+' new, '+str(len(changed))+' modified, '+str(len(removed))+' removed since the last scan).')
 
+            ## Load activities into memory, parsing only new or modified files
+            with timings.stage('load') as stage:
+                ## Columns are only dropped when the cache can give them back;
+                ## without it each reload would parse the file again
+                activities = lib.loader.loadActivities(sorted(files), config['activityTypes'], jobs=commands.jobs, limit=commands.max_activities, cache=cache, lazy=cache is not None, report=report, maxFileSize=maxFileSize, timings=timings)
+                stage['files'], stage['points'] = len(activities), sum(len(activity) for activity in activities)
+            manifest.update(files)
+            if(report is not None): printReport(report.save(results_folder))
 
-        #########################
-        ## Activities by time.
-        #########################
-        monthly_statistics = {}
-        for activity in activities:
-            if(activity.getStartTime().year not in monthly_statistics):  monthly_statistics[activity.getStartTime().year] = [0 for x in range(12)]
-            monthly_statistics[activity.getStartTime().year][activity.getStartTime().month-1] += 1
+        ## Time window
+        if(commands.since is not None or commands.until is not None):
+            activities = [activity for activity in activities if inWindow(activity, commands.since, commands.until)]
+            print('    '+str(len(activities))+' activities in the time window.')
 
-        if(datetime.now().year in monthly_statistics):
-            t = PrettyTable()
-            t.title = 'Activities this year'
-            t.field_names = [datetime(2000,x,1).strftime("%B") for x in range(1,13)]
-            t.add_row([str(x) for x in monthly_statistics[datetime.now().year]])
-            print(t)
+        ## Export
+        if(commands.export):
+            print('Exporting '+str(len(activities))+' activities to '+commands.export+'....')
+            with timings.stage('export', files=len(activities)):
+                lib.export.exportActivities(activities, commands.export, engine='numpy' if commands.packed else None, packed=commands.packed)
 
-        t = PrettyTable()
-        t.title = 'Activities all time'
-        t.field_names = [datetime(2000,x,1).strftime("%B") for x in range(1,13)]
-        t.add_row([str(sum([monthly_statistics[year][month] for year in monthly_statistics])) for month in range(12)])
-        print(t)
+        printTables(activities, regions, activityTypes, config.get('athlete'), timings, commands.png)
+        if(commands.laps is not None):
+            with timings.stage('laps'):
+                for activity in activities:
+                    if(activity.getLapCount() > 1 and commands.laps in activity.getName()): printLaps(activity)
+        if(commands.routes):
+            with timings.stage('routes', files=len(activities)): printRoutes(activities, segments, commands.routes)
+        if(commands.timings): printTimings(timings, commands.timings)
+        for profile in timings.profiles: lib.timings.printProfile(profile)
 
-        fig = plt.figure('Activities by month')
-        plt.bar([x-0.5 for x in range(12)], [sum([monthly_statistics[year][month] for year in monthly_statistics]) for month in range(12)], width=1)
-        ax = plt.gca()
-        ax.set_xticks(range(12))
-        ax.set_xticklabels([datetime(2000,x,1).strftime("%B") for x in range(1,13)])
-        if(not os.path.exists(results_folder)): os.mkdir(results_folder)
-        fig.savefig(os.path.join(results_folder,'monthly.png'))
-        plt.close()
 
         #########################
-        ## Activities by region
+        ## Map interface
         #########################
-        ## Prepare and dump region statistics
-        for region_name in regions:
-            regions[region_name].bindActivities(activities)
-
-            t = PrettyTable()
-            t.title = 'Stats for region: '+regions[region_name].name
-            t.field_names = ['Stat','Value']
-            t.add_row(['Number:',str(len(regions[region_name].activities))])
-            t.add_row(['Distance:',str(round(sum([activity.getDistance() for activity in regions[region_name].activities])/1000.0,1))+' km'])
-            try:    t.add_row(['Avg. speed:',str(round(sum([activity.getDistance() for activity in regions[region_name].activities])/sum([activity.getDuration().seconds for activity in regions[region_name].activities])*3.6, 1))+' km/h'])
-            except: t.add_row(['Avg. speed:','- km/h'])
-            t.add_row(['Calories:',str(sum([activity.getCalories() for activity in regions[region_name].activities]))])
-            t.add_row(['Total time:',str(round(sum([activity.getDuration().seconds for activity in regions[region_name].activities])/3600.0, 2))+' h'])
-            try:    t.add_row(['Avg. time:',str(round(sum([activity.getDuration().seconds for activity in regions[region_name].activities])/60.0/float(len(regions[region_name].activities)), 1))+' min'])
-            except: t.add_row(['Avg. time:','- min'])
-            print(t)
-
-        if([True for label in regions if regions[label].plot]):
+        if(not commands.watch and not commands.batch and not commands.serve and [True for label in regions if regions[label].plot]):
             print('    Preparing map interface...')
-            lib.interface.Interface(regions, linewidth=linewidth)
-
-            '''
-            fig = plt.figure(regions[region_name].name)
-            #for mapName in bitmapMaps:
-            #    if(bitmapMaps[mapName].region == region_name): bitmapMaps[mapName].plot()
-            for activity in regions[region_name].activities:
-                activity.plot, = plt.plot(activity.getPositionsUTMX(), activity.getPositionsUTMY(), color='C0', linewidth=linewidth)
-            activeElements = lib.tools.Persistant()
-            plt.axis('equal')
-            fig.canvas.mpl_connect('button_press_event', lambda event: lib.tools.mapClickCallback(event, fig, regions[region_name].activities, activeElements, linewidth))
-            fig.canvas.mpl_connect('scroll_event', lambda event: lib.tools.mapZoom(event, fig))
-            plt.show()'''
+            from lib.interface import Interface
+            Interface(regions, linewidth=linewidth, tileFolder=os.path.join(cache_folder, 'tiles') if cache is not None else None)
 
 
         #########################
-        ## Activities by type
+        ## Watch for new files
         #########################
-        for activity_name in activityTypes:
-            activityTypes[activity_name].bindActivities(activities)
+        def refresh(activities):
+            ''' activities updated with the files added, modified or removed
+                since the last scan, or None if none were. '''
+            files = lib.scanner.scanFiles(path, lib.tools.activityFormats)
+            added, changed, removed = manifest.diff(files)
+            if(not (added or changed or removed)): return None
+            print('    '+str(len(added))+' new, '+str(len(changed))+' modified, '+str(len(removed))+' removed activities.')
+            stale      = set(changed) | set(removed)
+            activities = [activity for activity in activities if activity.getName() not in stale]
+            limit      = commands.max_activities-len(activities) if commands.max_activities else 0
+            passReport = lib.loader.ErrorReport() if report is not None else None
+            if(not commands.max_activities or limit > 0):
+                activities += [activity for activity in lib.loader.loadActivities(added+changed, config['activityTypes'], jobs=commands.jobs, limit=limit, cache=cache, lazy=cache is not None, report=passReport, maxFileSize=maxFileSize, timings=timings)
+                               if inWindow(activity, commands.since, commands.until)]
+                activities.sort(key=lambda activity: activity.getName())
+            manifest.update(files)
+            if(passReport is not None): printReport(passReport.save(results_folder))
+            return activities
 
-            t = PrettyTable()
-            t.title = 'Stats for activity: '+activityTypes[activity_name].name
-            t.field_names = ['Stat','Value']
-            t.add_row(['Number:',str(len(activityTypes[activity_name].activities))])
-            t.add_row(['Distance:',str(round(sum([activity.getDistance() for activity in activityTypes[activity_name].activities])/1000.0,1))+' km'])
-            try:    t.add_row(['Avg. speed:',str(round(sum([activity.getDistance() for activity in activityTypes[activity_name].activities])/sum([activity.getDuration().seconds for activity in activityTypes[activity_name].activities])*3.6, 1))+' km/h'])
-            except: t.add_row(['Avg. speed:','- km/h'])
-            t.add_row(['Calories:',str(sum([activity.getCalories() for activity in activityTypes[activity_name].activities]))])
-            t.add_row(['Total time:',str(round(sum([activity.getDuration().seconds for activity in activityTypes[activity_name].activities])/3600.0, 2))+' h'])
-            try:    t.add_row(['Avg. time:',str(round(sum([activity.getDuration().seconds for activity in activityTypes[activity_name].activities])/60.0/float(len(activityTypes[activity_name].activities)), 1))+' min'])
-            except: t.add_row(['Avg. time:','- min'])
-            print(t)
+        if(commands.serve):
+            print('Serving '+str(len(activities))+' activities on http://'+lib.server.host+':'+str(commands.serve)+' (Ctrl+C to stop)...')
+            lib.server.Server(activities, regions, refresh=refresh if not commands.dataset else None, interval=commands.watch or 10.0).run(port=commands.serve)
+
+        if(commands.watch): print('Watching '+path+' for new activities (Ctrl+C to stop)...')
+        while(commands.watch):
+            time.sleep(commands.watch)
+            updated = refresh(activities)
+            if(updated is None): continue
+            activities = updated
+            printTables(activities, regions, activityTypes, config.get('athlete'), timings, commands.png)
+            if(commands.timings): printTimings(timings, commands.timings)
 
 
     ###################
@@ -183,20 +390,20 @@ def main():
     ## User interruption
     except KeyboardInterrupt: print('==User exited== [0000]')
     ## Normal program exit
-    except SystemExit, e: print('==Execution finished== [0001]')
+    except SystemExit as e: print('==Execution finished== [0001]')
     ## Raised error handling or uncaught exception handling with PDB traceback
-    except Exception, e:
-        try:
-            if(isinstance(e, Exception) and str(e) and isinstance(e[0], list)): print('==Runtime error== ['+str(e[0][0]).zfill(4)+'] '+e[0][1])
-            else:
-                import sys
-                from pdb       import post_mortem as pdb_post_mortem
-                from traceback import print_exc   as traceback_print_exc
-                _, _, tb = sys.exc_info()
-                traceback_print_exc()
-                pdb_post_mortem(tb)
-                logging.exception(e)
-        except UnboundLocalError: pass
+    ## (never in batch mode, where the run must not wait for a user)
+    except Exception as e:
+        import sys
+        if(e.args and isinstance(e.args[0], list)): print('==Runtime error== ['+str(e.args[0][0]).zfill(4)+'] '+str(e.args[0][1]))
+        else:
+            from traceback import print_exc   as traceback_print_exc
+            traceback_print_exc()
+            logging.exception(e)
+            if(commands is not None and not commands.batch and sys.stdin.isatty()):
+                from pdb import post_mortem as pdb_post_mortem
+                pdb_post_mortem(sys.exc_info()[2])
+        sys.exit(1)
 ###################
 # Launch main
 ###################